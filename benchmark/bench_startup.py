@@ -0,0 +1,75 @@
+"""
+冷启动基准：在全新子进程中分别测量导入处理函数、导入入口模块与构建界面的耗时，
+用于发现启动时间回退。
+
+用法（在仓库根目录执行）：
+    python -m benchmark.bench_startup --runs 5 --output startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# 每个场景在新进程中执行，输出自身耗时（秒）与是否加载了重量级依赖
+SCENARIOS = {
+    "import_handlers": "import tool.handlers",
+    "import_index": "import index",
+    "create_app": "import index; index.create_app()",
+}
+
+_TEMPLATE = """
+import json, sys, time
+start = time.perf_counter()
+{code}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "heavy": sorted(m for m in ("gradio", "openai", "httpx") if m in sys.modules)}}))
+"""
+
+
+def measure(code: str, runs: int) -> dict:
+    """
+    在 `runs` 个新进程中执行代码并汇总耗时。
+
+    Args:
+        code (str): 待测量的 Python 代码。
+        runs (int): 重复次数。
+
+    Returns:
+        dict: 中位数、最小值、最大值（秒）与加载的重量级依赖。
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    samples: list[float] = []
+    heavy: list[str] = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", _TEMPLATE.format(code=code)],
+            cwd=root, capture_output=True, text=True, check=True,
+        ).stdout.strip().splitlines()[-1]
+        result = json.loads(output)
+        samples.append(result["seconds"])
+        heavy = result["heavy"]
+    return {
+        "median": round(statistics.median(samples), 4),
+        "min": round(min(samples), 4),
+        "max": round(max(samples), 4),
+        "heavy_modules": heavy,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="冷启动耗时基准")
+    parser.add_argument("--runs", type=int, default=5, help="每个场景的重复次数")
+    parser.add_argument("--output", default=None, help="结果 JSON 输出路径")
+    args = parser.parse_args()
+
+    results = {name: measure(code, args.runs) for name, code in SCENARIOS.items()}
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+文本切分基准：对比旧版 `text_split`（逐段拼接字符串、反复切片剩余文本）与流式
+`iter_text_split`（偏移量推进、惰性产出）在 10–100 MB 输入上的耗时。
+
+用法（在仓库根目录执行）：
+    python -m benchmark.bench_text_split --sizes 10 50 100 --legacy-max-mb 50
+"""
+import argparse
+import json
+import mmap
+import os
+import random
+import re
+import tempfile
+import time
+from typing import Callable, Iterator
+
+from tool.text_process import iter_text_split
+
+SENTENCES = [
+    "深度学习模型在自然语言处理任务中表现出色。",
+    "实验结果表明，该方法显著提升了检索效率？",
+    "The proposed framework reduces latency by a wide margin. ",
+    "We evaluate the approach on three public benchmarks! ",
+    "数据预处理阶段包括清洗、分词与去重",
+]
+
+
+def legacy_text_split(text: str, max_length: int = 10240) -> list[str]:
+    """旧版实现（按字符计量），仅用于基准对比。"""
+    max_length = max_length * 0.9
+    paragraphs = text.split('\n')
+    chunks = []
+    current_chunk = ""
+
+    for paragraph in paragraphs:
+        if not paragraph.strip():
+            continue
+        potential_chunk = current_chunk + ('\n' if current_chunk else '') + paragraph
+        if len(potential_chunk) <= max_length:
+            current_chunk = potential_chunk
+        else:
+            if current_chunk:
+                chunks.append(current_chunk)
+            if len(paragraph) <= max_length:
+                current_chunk = paragraph
+            else:
+                sub_chunks = _legacy_split_long_paragraph(paragraph, int(max_length))
+                if len(sub_chunks) > 1:
+                    chunks.extend(sub_chunks[:-1])
+                current_chunk = sub_chunks[-1] if sub_chunks else ""
+
+    if current_chunk:
+        chunks.append(current_chunk)
+    return chunks
+
+
+def _legacy_split_long_paragraph(paragraph: str, max_length: int) -> list[str]:
+    """旧版长段落切分，仅用于基准对比。"""
+    chunks = []
+    remaining = paragraph
+    while len(remaining) > max_length:
+        search_text = remaining[:max_length]
+        matches = list(re.finditer(r'[。？！.?!]', search_text))
+        split_pos = 0
+        if matches:
+            split_pos_candidate = matches[-1].end()
+            if split_pos_candidate <= max_length:
+                split_pos = split_pos_candidate
+        if split_pos == 0:
+            split_pos = max_length
+        chunks.append(remaining[:split_pos])
+        remaining = remaining[split_pos:]
+    if remaining:
+        chunks.append(remaining)
+    return chunks
+
+
+def make_document(size_mb: float, seed: int = 0) -> str:
+    """
+    生成指定大小的中英混合测试文档：多数为普通段落，夹杂少量超长段落与空行。
+
+    Args:
+        size_mb (float): 目标大小（按字符数计，单位 MB）。
+        seed (int): 随机种子，保证各次运行输入一致。
+
+    Returns:
+        str: 测试文档。
+    """
+    rng = random.Random(seed)
+    target = int(size_mb * 1024 * 1024)
+    paragraphs: list[str] = []
+    length = 0
+    while length < target:
+        roll = rng.random()
+        if roll < 0.05:
+            paragraph = ""
+        elif roll < 0.08:
+            # 超长段落（约 50k–200k 字符），触发句界切分
+            paragraph = "".join(rng.choice(SENTENCES) for _ in range(rng.randint(2000, 8000)))
+        else:
+            paragraph = "".join(rng.choice(SENTENCES) for _ in range(rng.randint(1, 40)))
+        paragraphs.append(paragraph)
+        length += len(paragraph) + 1
+    return "\n".join(paragraphs)
+
+
+def _timed(fn: Callable[[], Iterator[str] | list[str]]) -> tuple[float, int]:
+    """执行切分并返回 (耗时秒数, 块数)。"""
+    start = time.perf_counter()
+    count = sum(1 for _ in fn())
+    return time.perf_counter() - start, count
+
+
+def run(sizes: list[float], max_length: int, legacy_max_mb: float) -> list[dict]:
+    """
+    运行基准并返回每个输入规模的结果。
+
+    Args:
+        sizes (list[float]): 输入规模列表（MB）。
+        max_length (int): 切分长度上限（字符）。
+        legacy_max_mb (float): 旧版实现参与对比的最大输入规模，超过则跳过。
+
+    Returns:
+        list[dict]: 每个规模的耗时与块数。
+    """
+    results = []
+    for size in sizes:
+        text = make_document(size)
+        row: dict = {"size_mb": size, "max_length": max_length}
+
+        row["stream_seconds"], row["chunks"] = _timed(lambda text=text: iter_text_split(text, max_length))
+
+        # 文件 + mmap 输入：验证无需整体载入内存也能得到相同结果
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".txt") as f:
+            f.write(text.encode("utf-8"))
+            path = f.name
+        try:
+            with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                row["mmap_seconds"], _ = _timed(lambda mm=mm: iter_text_split(mm, max_length))
+        finally:
+            os.remove(path)
+
+        if size <= legacy_max_mb:
+            row["legacy_seconds"], legacy_chunks = _timed(lambda text=text: legacy_text_split(text, max_length))
+            row["speedup"] = round(row["legacy_seconds"] / max(row["stream_seconds"], 1e-9), 2)
+            row["same_chunk_count"] = legacy_chunks == row["chunks"]
+
+        results.append(row)
+        print(json.dumps(row, ensure_ascii=False))
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="text_split 基准测试")
+    parser.add_argument("--sizes", type=float, nargs="+", default=[10, 50, 100], help="输入规模（MB）")
+    parser.add_argument("--max-length", type=int, default=10240, help="切分长度上限（字符）")
+    parser.add_argument("--legacy-max-mb", type=float, default=100, help="旧版实现参与对比的最大规模（MB）")
+    parser.add_argument("--output", default=None, help="结果 JSON 输出路径")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.max_length, args.legacy_max_mb)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
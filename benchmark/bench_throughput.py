@@ -0,0 +1,346 @@
+"""
+吞吐基准：在本地模拟服务（`benchmark.mock_server`）上测量批量引擎、批量流式处理函数（`BA_respond`）
+与文本切分在不同输入规模与并发度下的请求速率、总耗时、p95 延迟、CPU 时间与峰值内存，结果输出为 JSON，
+便于在不同提交之间对比回归。`dispatch` 场景以少量大项排在末尾的偏斜输入比较各派发策略的总耗时（`vs_fifo`），
+其模拟服务的输出长度与输入成正比（`--output-ratio`，未设置时取 1）。
+
+模拟服务与每个场景各在独立子进程中运行，CPU 与峰值 RSS 只统计该场景的客户端进程。
+
+用法（在仓库根目录执行）：
+    python -m benchmark.bench_throughput --items 100 1000 --concurrency 10 50 --output bench.json
+    python -m benchmark.bench_throughput --suites batch --throttle-rate 0.05 --baseline bench.json
+    python -m benchmark.bench_throughput --suites split --sizes 1 10
+    python -m benchmark.bench_throughput --suites dispatch --engines thread --items 200 --concurrency 10
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from benchmark.mock_server import DEFAULTS
+
+# 场景使用的模型，其供应商在子进程中被改指向模拟服务
+MODEL = "deepseek-chat"
+PROMPT = "请将下面的内容改写得更通顺。"
+
+
+def _peak_rss_mb() -> Optional[float]:
+    """当前进程的峰值常驻内存（MB），平台不支持时为 None。"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 计，macOS 以字节计
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _configure(url: str, concurrency: int) -> None:
+    """将所有供应商指向模拟服务，关闭缓存与任务日志，并以场景并发度作为模型并发上限。"""
+    from config.model_config import model_dict, supplier_dict
+    from config.runtime_config import cache_config, dispatch_config, journal_config, metrics_config
+
+    for supplier in supplier_dict:
+        supplier_dict[supplier] = {"api": "bench", "url": url}
+    for config in model_dict.values():
+        for key in ("endpoints", "rpm", "tpm"):
+            config.pop(key, None)
+        config["max_concurrent"] = concurrency
+    cache_config["enabled"] = False
+    journal_config["enabled"] = False
+    # 不读取也不写入输出长度统计，各次运行相互独立
+    dispatch_config["learn"] = False
+    # 保留全部样本，p95 覆盖整个场景
+    metrics_config["reservoir"] = 1 << 20
+
+
+def _make_items(count: int) -> List[str]:
+    """生成列表任务的输入项。"""
+    return [f"第 {i} 条：深度学习模型在自然语言处理任务中表现出色，实验结果表明该方法显著提升了检索效率。"
+            for i in range(count)]
+
+
+def _make_skewed_items(count: int, long_factor: int) -> List[str]:
+    """生成偏斜输入：约 1% 为普通项 `long_factor` 倍长的大项，全部排在末尾（按顺序派发的最坏情况）。"""
+    items = _make_items(count)
+    long_count = max(count // 100, 1)
+    for i in range(count - long_count, count):
+        items[i] = items[i] * long_factor
+    return items
+
+
+def _mark(spec: Dict[str, Any]) -> None:
+    """记录计时起点（墙钟与 CPU 时间），场景准备完成后可再次调用以排除准备耗时。"""
+    spec["_start"] = time.perf_counter()
+    spec["_cpu"] = time.process_time()
+
+
+def _run_batch(spec: Dict[str, Any]) -> Dict[str, Any]:
+    """批量引擎场景：直接调用 `chat_llm_batch` 或 `chat_llm_batch_asyncio`。"""
+    from tool.chat_batch import chat_llm_batch, chat_llm_batch_asyncio
+
+    batch_fn = chat_llm_batch_asyncio if spec["engine"] == "async" else chat_llm_batch
+    status: Dict[str, Any] = {}
+    batch_fn(_make_items(spec["items"]), MODEL, PROMPT, on_progress=status.update, use_cache=False)
+    return {
+        "failures": sum(status.get("failures", {}).values()),
+        "retries": sum(status.get("retries", {}).values()),
+        "final_concurrency": status.get("concurrency"),
+    }
+
+
+def _run_handler(spec: Dict[str, Any]) -> Dict[str, Any]:
+    """流式处理函数场景：完整消费 `BA_respond` 的列表任务输出，统计产出次数与首次产出输出的时间。"""
+    from tool.handlers import BA_respond
+
+    start = time.perf_counter()
+    yields = 0
+    first_output: Optional[float] = None
+    for output, _ in BA_respond(PROMPT, "\n".join(_make_items(spec["items"])), "列表任务", MODEL,
+                                engine="异步" if spec["engine"] == "async" else "线程", use_cache=False):
+        yields += 1
+        if output and first_output is None:
+            first_output = time.perf_counter() - start
+    return {"yields": yields, "first_output_seconds": round(first_output, 3) if first_output else None}
+
+
+def _run_split(spec: Dict[str, Any]) -> Dict[str, Any]:
+    """文本切分场景：`iter_text_split` 切分生成的测试文档（不计文档生成耗时）。"""
+    from benchmark.bench_text_split import make_document
+    from tool.text_process import iter_text_split
+
+    text = make_document(spec["size_mb"])
+    _mark(spec)
+    return {"chunks": sum(1 for _ in iter_text_split(text, spec.get("max_length", 10240)))}
+
+
+def _run_dispatch(spec: Dict[str, Any]) -> Dict[str, Any]:
+    """派发策略场景：以指定策略对偏斜输入执行批量引擎。"""
+    from tool.chat_batch import chat_llm_batch, chat_llm_batch_asyncio
+
+    batch_fn = chat_llm_batch_asyncio if spec["engine"] == "async" else chat_llm_batch
+    status: Dict[str, Any] = {}
+    batch_fn(_make_skewed_items(spec["items"], spec["long_factor"]), MODEL, PROMPT, on_progress=status.update,
+             use_cache=False, policy=spec["policy"])
+    return {"failures": sum(status.get("failures", {}).values())}
+
+
+_RUNNERS = {"batch": _run_batch, "handler": _run_handler, "split": _run_split, "dispatch": _run_dispatch}
+
+
+def run_worker(spec: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    在当前（子）进程中执行单个场景。
+
+    Args:
+        spec (Dict[str, Any]): 场景描述，包含 `kind`，以及批量类场景的 `url`、`engine`、`items`、`concurrency`
+            或切分场景的 `size_mb`。
+
+    Returns:
+        Dict[str, Any]: 场景指标：总耗时、CPU 时间、峰值内存，批量类场景另含请求速率与延迟分位数。
+    """
+    if spec["kind"] != "split":
+        _configure(spec["url"], spec["concurrency"])
+        # 预先导入，避免把模块加载计入耗时
+        import tool.chat_batch  # noqa: F401
+        if spec["kind"] == "handler":
+            import tool.handlers  # noqa: F401
+    rss_before = _peak_rss_mb()
+    _mark(spec)
+    row = _RUNNERS[spec["kind"]](spec)
+    makespan = time.perf_counter() - spec["_start"]
+    row.update({
+        "makespan": round(makespan, 3),
+        "cpu_seconds": round(time.process_time() - spec["_cpu"], 3),
+        "rss_before_mb": rss_before,
+        "peak_rss_mb": _peak_rss_mb(),
+    })
+    if spec["kind"] != "split":
+        from tool.metrics import get_metrics
+
+        metrics = get_metrics()
+        p95 = metrics.quantile("llm_request_duration_seconds", MODEL, 0.95)
+        ttft_p95 = metrics.quantile("llm_ttft_seconds", MODEL, 0.95)
+        row.update({
+            "requests_per_sec": round(spec["items"] / makespan, 2),
+            "latency_p95": round(p95, 3) if p95 is not None else None,
+            "ttft_p95": round(ttft_p95, 3) if ttft_p95 is not None else None,
+        })
+    else:
+        row["mb_per_sec"] = round(spec["size_mb"] / makespan, 2)
+    return row
+
+
+def _start_server(settings: Dict[str, Any]) -> tuple[subprocess.Popen, str]:
+    """以子进程启动模拟服务，返回进程与其 base URL。"""
+    cmd = [sys.executable, "-m", "benchmark.mock_server", "--port", "0"]
+    for key, value in settings.items():
+        if value is not None:
+            cmd += [f"--{key.replace('_', '-')}", str(value)]
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    return process, line.split(": ", 1)[1].strip()
+
+
+def _server_stats(url: str) -> Dict[str, Any]:
+    """读取模拟服务的累计统计。"""
+    import urllib.request
+
+    with urllib.request.urlopen(f"{url}/_stats", timeout=5) as response:
+        return json.loads(response.read())
+
+
+def _run_scenario(spec: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+    """在独立子进程中执行一个场景并解析其 JSON 结果。"""
+    try:
+        completed = subprocess.run(
+            [sys.executable, "-m", "benchmark.bench_throughput", "--worker", json.dumps(spec)],
+            capture_output=True, text=True, timeout=timeout,
+        )
+    except subprocess.TimeoutExpired:
+        return {"error": f"超时（{timeout:g}s）"}
+    if completed.returncode != 0:
+        return {"error": completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "未知错误"}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def _scenarios(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    """按命令行参数展开场景列表。"""
+    specs: List[Dict[str, Any]] = []
+    for kind in args.suites:
+        if kind == "split":
+            specs.extend({"kind": kind, "name": f"split/{size:g}MB", "size_mb": size} for size in args.sizes)
+            continue
+        for engine in args.engines:
+            for items in args.items:
+                for concurrency in args.concurrency:
+                    if kind == "dispatch":
+                        specs.extend({
+                            "kind": kind, "name": f"{kind}/{engine}/{policy}/items={items}/c={concurrency}",
+                            "engine": engine, "items": items, "concurrency": concurrency, "policy": policy,
+                            "long_factor": args.long_factor,
+                        } for policy in args.policies)
+                        continue
+                    specs.append({
+                        "kind": kind, "name": f"{kind}/{engine}/items={items}/c={concurrency}",
+                        "engine": engine, "items": items, "concurrency": concurrency,
+                    })
+    return specs
+
+
+def _suite_settings(settings: Dict[str, Any], kind: str) -> Dict[str, Any]:
+    """场景使用的模拟服务参数：派发策略场景需要输出长度随输入变化。"""
+    if kind == "dispatch" and not settings["output_ratio"]:
+        return {**settings, "output_ratio": 1.0}
+    return settings
+
+
+def _commit() -> Optional[str]:
+    """当前 git 提交，用于在结果中标注版本。"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    运行全部场景。
+
+    Args:
+        args (argparse.Namespace): 命令行参数。
+
+    Returns:
+        Dict[str, Any]: `meta`（提交、Python 版本、模拟服务参数）与 `results`（每个场景一行）。
+    """
+    settings = {key: getattr(args, key) for key in DEFAULTS}
+    baseline: Dict[str, Dict[str, Any]] = {}
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = {row["name"]: row for row in json.load(f)["results"]}
+
+    specs = _scenarios(args)
+    # 按模拟服务参数分别启动服务，参数相同的场景共用
+    servers: Dict[str, tuple[subprocess.Popen, str]] = {}
+    fifo_makespans: Dict[str, float] = {}
+    results = []
+    try:
+        for spec in specs:
+            url = None
+            if spec["kind"] != "split":
+                suite_settings = _suite_settings(settings, spec["kind"])
+                key = json.dumps(suite_settings, sort_keys=True)
+                if key not in servers:
+                    servers[key] = _start_server(suite_settings)
+                url = servers[key][1]
+                spec["url"] = url
+            before = _server_stats(url) if url else None
+            row = {"name": spec.pop("name"), **{k: v for k, v in spec.items() if k not in ("kind", "url")}}
+            row.update(_run_scenario(spec, args.timeout))
+            if before is not None:
+                after = _server_stats(url)
+                row["server"] = {key: after[key] - before[key] for key in after}
+            if spec["kind"] == "dispatch" and row.get("makespan"):
+                # 与同一引擎、规模、并发下按顺序派发的总耗时之比
+                group = row["name"].replace(f"/{spec['policy']}/", "/")
+                if spec["policy"] == "fifo":
+                    fifo_makespans[group] = row["makespan"]
+                elif group in fifo_makespans:
+                    row["vs_fifo"] = round(row["makespan"] / fifo_makespans[group], 3)
+            previous = baseline.get(row["name"])
+            if previous and previous.get("makespan") and row.get("makespan"):
+                row["vs_baseline"] = round(row["makespan"] / previous["makespan"], 3)
+            results.append(row)
+            print(json.dumps(row, ensure_ascii=False), flush=True)
+    finally:
+        for server, _ in servers.values():
+            server.terminate()
+            server.wait()
+
+    return {
+        "meta": {
+            "commit": _commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "mock_server": settings,
+        },
+        "results": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="批量引擎、流式处理函数与文本切分的吞吐基准")
+    parser.add_argument("--worker", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--suites", nargs="+", choices=list(_RUNNERS), default=list(_RUNNERS), help="运行的场景类别")
+    parser.add_argument("--engines", nargs="+", choices=["thread", "async"], default=["thread", "async"],
+                        help="批量执行引擎")
+    parser.add_argument("--items", type=int, nargs="+", default=[100, 500], help="批量项数")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 50], help="模型并发上限")
+    parser.add_argument("--sizes", type=float, nargs="+", default=[1, 10], help="切分场景输入规模（MB）")
+    parser.add_argument("--policies", nargs="+", choices=["fifo", "ljf", "sjf"], default=["fifo", "ljf", "sjf"],
+                        help="派发策略场景比较的策略，fifo 排在最前以计算 vs_fifo")
+    parser.add_argument("--long-factor", type=int, default=20, help="派发策略场景中大项相对普通项的长度倍数")
+    parser.add_argument("--timeout", type=float, default=600, help="单个场景的超时（秒）")
+    parser.add_argument("--baseline", default=None, help="对比的历史结果 JSON，输出总耗时比值 vs_baseline")
+    parser.add_argument("--output", default=None, help="结果 JSON 输出路径")
+    # 模拟服务行为参数，见 benchmark.mock_server.DEFAULTS
+    for key, value in DEFAULTS.items():
+        parser.add_argument(f"--{key.replace('_', '-')}", type=int if key == "seed" else type(value), default=value)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(json.loads(args.worker)), ensure_ascii=False))
+        return
+
+    report = run(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
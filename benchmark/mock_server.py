@@ -0,0 +1,232 @@
+"""
+本地 OpenAI 兼容模拟服务：实现 `/v1/chat/completions` 的流式（SSE）与非流式协议，可配置首 token 延迟、
+输出速率、抖动、错误率、429 比例与卡顿注入，用于在不消耗真实 token 的情况下测量吞吐与延迟。
+
+用法（在仓库根目录执行）：
+    python -m benchmark.mock_server --port 18000 --ttft 0.3 --tokens-per-sec 80 --throttle-rate 0.02
+    # 将 supplier_dict 中的 url 指向 http://127.0.0.1:18000/v1 即可
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict
+
+# 默认行为参数
+DEFAULTS: Dict[str, Any] = {
+    # 首 token 延迟（秒）
+    "ttft": 0.3,
+    # 输出速率（token/秒）
+    "tokens_per_sec": 80.0,
+    # 抖动比例：每个请求的首 token 延迟、速率与输出长度在 [1 - jitter, 1 + jitter] 倍内随机
+    "jitter": 0.2,
+    # 每个请求的输出 token 数
+    "output_tokens": 128,
+    # 大于 0 时输出 token 数改为用户输入 token 数（按 2 字符 1 token 估算）的该倍数，模拟改写类任务
+    "output_ratio": 0.0,
+    # 返回 500 的比例
+    "error_rate": 0.0,
+    # 返回 429 的比例，及其 Retry-After（秒）
+    "throttle_rate": 0.0,
+    "retry_after": 1.0,
+    # 输出中途卡顿的比例与卡顿时长（秒）
+    "stall_rate": 0.0,
+    "stall_seconds": 10.0,
+    # 随机种子，None 表示不固定
+    "seed": None,
+}
+
+# 每个输出 token 的文本
+_TOKEN = "token "
+
+
+class MockServer(ThreadingHTTPServer):
+    """携带行为参数与请求统计的模拟服务。"""
+
+    daemon_threads = True
+    # 高并发压测时避免监听队列溢出
+    request_queue_size = 1024
+
+    def __init__(self, address: tuple[str, int], settings: Dict[str, Any]):
+        super().__init__(address, _MockHandler)
+        self.settings = {**DEFAULTS, **settings}
+        self.rng = random.Random(self.settings["seed"])
+        self.stats = {"requests": 0, "errors": 0, "throttled": 0, "stalled": 0, "tokens": 0}
+        self.lock = threading.Lock()
+
+    def draw(self, input_tokens: int = 0) -> Dict[str, Any]:
+        """为一次请求抽取行为：结果类型、首 token 延迟、速率、输出长度与卡顿位置；`input_tokens` 为用户输入 token 数。"""
+        s = self.settings
+        with self.lock:
+            self.stats["requests"] += 1
+            roll = self.rng.random()
+            jitter = [self.rng.uniform(1 - s["jitter"], 1 + s["jitter"]) for _ in range(3)]
+            stall = self.rng.random() < s["stall_rate"]
+            stall_at = self.rng.random()
+            if roll < s["error_rate"]:
+                outcome = "error"
+                self.stats["errors"] += 1
+            elif roll < s["error_rate"] + s["throttle_rate"]:
+                outcome = "throttle"
+                self.stats["throttled"] += 1
+            else:
+                outcome = "ok"
+                self.stats["stalled"] += int(stall)
+        base = input_tokens * s["output_ratio"] if s["output_ratio"] > 0 else s["output_tokens"]
+        tokens = max(int(base * jitter[2]), 1)
+        with self.lock:
+            if outcome == "ok":
+                self.stats["tokens"] += tokens
+        return {
+            "outcome": outcome,
+            "ttft": s["ttft"] * jitter[0],
+            "interval": 1.0 / max(s["tokens_per_sec"] * jitter[1], 1e-6),
+            "tokens": tokens,
+            "stall_at": int(tokens * stall_at) if stall else -1,
+        }
+
+
+class _MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: MockServer
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+    def _send_json(self, status: int, payload: Dict[str, Any], headers: Dict[str, str] | None = None) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_HEAD(self) -> None:
+        # 预连接使用
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self) -> None:
+        if self.path.rstrip("/").endswith("/_stats"):
+            with self.server.lock:
+                self._send_json(200, dict(self.server.stats))
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self) -> None:
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        messages = body.get("messages", [])
+        plan = self.server.draw(len(str(messages[-1].get("content", ""))) // 2 if messages else 0)
+        if plan["outcome"] == "error":
+            self._send_json(500, {"error": {"message": "mock server error", "type": "server_error"}})
+            return
+        if plan["outcome"] == "throttle":
+            self._send_json(429, {"error": {"message": "mock rate limit", "type": "rate_limit"}},
+                            {"Retry-After": f"{self.server.settings['retry_after']:g}"})
+            return
+
+        model = body.get("model", "mock")
+        prompt_tokens = sum(len(str(m.get("content", ""))) for m in messages) // 2
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": plan["tokens"],
+                 "total_tokens": prompt_tokens + plan["tokens"]}
+
+        if not body.get("stream"):
+            time.sleep(plan["ttft"] + plan["interval"] * plan["tokens"])
+            self._send_json(200, {
+                "id": "mock", "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": _TOKEN * plan["tokens"]},
+                             "finish_reason": "stop"}],
+                "usage": usage,
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            time.sleep(plan["ttft"])
+            next_at = time.monotonic()
+            for i in range(plan["tokens"]):
+                if i == plan["stall_at"]:
+                    time.sleep(self.server.settings["stall_seconds"])
+                    next_at = time.monotonic()
+                # 按目标速率对齐发送时刻，避免逐次 sleep 的误差累积
+                next_at += plan["interval"]
+                delay = next_at - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                self._send_event(_chunk(model, {"content": _TOKEN}))
+            self._send_event(_chunk(model, {}, finish_reason="stop"))
+            if (body.get("stream_options") or {}).get("include_usage"):
+                self._send_event({"id": "mock", "object": "chat.completion.chunk", "created": 0, "model": model,
+                                  "choices": [], "usage": usage})
+            self._send_event("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # 客户端提前关闭流（如对冲落败、截止时间）
+            pass
+
+    def _send_event(self, payload: Any) -> None:
+        """以分块编码发送一条 SSE 事件。"""
+        data = payload if isinstance(payload, str) else json.dumps(payload, ensure_ascii=False)
+        frame = f"data: {data}\n\n".encode("utf-8")
+        self.wfile.write(f"{len(frame):x}\r\n".encode("ascii") + frame + b"\r\n")
+        self.wfile.flush()
+
+
+def _chunk(model: str, delta: Dict[str, Any], finish_reason: str | None = None) -> Dict[str, Any]:
+    """构造一个流式增量块。"""
+    return {
+        "id": "mock", "object": "chat.completion.chunk", "created": 0, "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+
+
+def start_mock_server(host: str = "127.0.0.1", port: int = 0, **settings: Any) -> MockServer:
+    """
+    在守护线程中启动模拟服务。
+
+    Args:
+        host (str): 监听地址。
+        port (int): 监听端口，0 表示随机分配（从 `server.server_address` 读取）。
+        **settings: 覆盖 `DEFAULTS` 的行为参数。
+
+    Returns:
+        MockServer: 已启动的服务，可调用 `shutdown()` 停止。
+    """
+    server = MockServer((host, port), settings)
+    threading.Thread(target=server.serve_forever, name="mock-server", daemon=True).start()
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="本地 OpenAI 兼容模拟服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18000)
+    for key, value in DEFAULTS.items():
+        if key == "seed":
+            parser.add_argument("--seed", type=int, default=None)
+        else:
+            parser.add_argument(f"--{key.replace('_', '-')}", type=type(value), default=value)
+    args = parser.parse_args()
+
+    settings = {key: getattr(args, key) for key in DEFAULTS}
+    server = MockServer((args.host, args.port), settings)
+    print(f"模拟服务: http://{args.host}:{server.server_address[1]}/v1", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+命令行批量处理入口（不依赖 Gradio）：从文件或标准输入流式读取，按输入顺序流式写出结果。
+
+示例：
+    python cli.py thesis.txt --mode long --model deepseek-chat --function 中文润色 -o out.txt
+    cat items.jsonl | python cli.py --input-format jsonl --mode list --output-format jsonl
+"""
+import argparse
+import json
+import sys
+from typing import IO, Iterator, Optional
+
+from config.function_config import function_dict
+from config.model_config import model_dict
+from tool.chat_batch import iter_chat_llm_batch
+from tool.concurrency import get_limiter
+from tool.dispatch import POLICIES
+from tool.hedge import HedgeStats
+from tool.metrics import start_metrics_server
+from tool.retry import RetryStats, format_error_counts
+from tool.text_process import iter_text_split
+from tool.token_count import chunk_token_budget, get_token_counter
+
+MODES = {"list": "列表任务", "long": "长任务"}
+
+
+def _open_inputs(paths: list[str]) -> Iterator[IO[str]]:
+    """逐个打开输入文件，`-` 表示标准输入。"""
+    for path in paths:
+        if path == "-":
+            yield sys.stdin
+        else:
+            with open(path, "r", encoding="utf-8") as f:
+                yield f
+
+
+def _iter_records(stream: IO[str], input_format: str, field: str) -> Iterator[str]:
+    """
+    从单个输入流读取记录：text 格式每行一条，jsonl 格式每行一个 JSON（字符串或含 `field` 的对象）。
+
+    Args:
+        stream (IO[str]): 输入流。
+        input_format (str): 输入格式，`text` 或 `jsonl`。
+        field (str): jsonl 对象中的文本字段名。
+
+    Yields:
+        str: 单条记录文本。
+    """
+    for line in stream:
+        line = line.rstrip("\r\n")
+        if input_format == "jsonl":
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            yield record if isinstance(record, str) else str(record[field])
+        else:
+            yield line
+
+
+def iter_items(paths: list[str], mode: str, input_format: str, field: str,
+               input_model: str, prompt: str) -> Iterator[str]:
+    """
+    将输入惰性转换为批量项：列表任务每条非空记录为一项，长任务按 token 预算流式切分。
+
+    Args:
+        paths (list[str]): 输入文件路径列表。
+        mode (str): `list` 或 `long`。
+        input_format (str): 输入格式，`text` 或 `jsonl`。
+        field (str): jsonl 对象中的文本字段名。
+        input_model (str): 模型名称，用于长任务的 token 预算。
+        prompt (str): 系统提示词，用于长任务的 token 预算。
+
+    Yields:
+        str: 单个批量项的输入文本。
+    """
+    budget = chunk_token_budget(input_model, prompt)
+    counter = get_token_counter(input_model)
+
+    for stream in _open_inputs(paths):
+        if mode == "list":
+            for record in _iter_records(stream, input_format, field):
+                if record.strip():
+                    yield record.strip()
+        elif input_format == "text":
+            # 纯文本长任务直接从文件流切分，无需整体读入
+            yield from iter_text_split(stream, budget, counter)
+        else:
+            for record in _iter_records(stream, input_format, field):
+                yield from iter_text_split(record, budget, counter)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="MyPrivateGPT 命令行批量处理")
+    parser.add_argument("inputs", nargs="*", default=["-"], help="输入文件，缺省或 - 表示标准输入")
+    parser.add_argument("--mode", choices=list(MODES), default="long", help="list: 列表任务；long: 长任务")
+    parser.add_argument("--input-format", choices=["text", "jsonl"], default="text", help="输入格式")
+    parser.add_argument("--field", default="text", help="jsonl 输入中的文本字段名")
+    parser.add_argument("--model", choices=list(model_dict), default=next(iter(model_dict)), help="模型名称")
+    parser.add_argument("--function", choices=list(function_dict), default="NONE", help="预设功能提示词")
+    parser.add_argument("--prompt", default=None, help="自定义系统提示词，优先于 --function")
+    parser.add_argument("--top-p", type=float, default=0.7)
+    parser.add_argument("--temperature", type=float, default=0.9)
+    parser.add_argument("--max-concurrent", type=int, default=None, help="并发数，以模型配置为上限，默认取配置值")
+    parser.add_argument("--item-timeout", type=float, default=None, help="单项总时限（秒，含重试），默认取配置值")
+    parser.add_argument("--job-timeout", type=float, default=None, help="整体时限（秒），默认取配置值")
+    parser.add_argument("--hedge", action="store_true", default=None, help="对首 token 超时或生成过慢的项发起对冲请求")
+    parser.add_argument("--hedge-model", choices=list(model_dict), default=None, help="对冲请求使用的备用模型")
+    parser.add_argument("--policy", choices=list(POLICIES), default=None,
+                        help="派发策略：fifo 按顺序；ljf 预估开销大的先派发，缩短总耗时；sjf 小项优先。默认取配置值")
+    parser.add_argument("--pack", action="store_true", help="将短条目按 token 预算打包为一次请求（适合 list 模式）")
+    parser.add_argument("--no-cache", action="store_true", help="跳过响应缓存读取")
+    parser.add_argument("-o", "--output", default="-", help="输出文件，- 表示标准输出")
+    parser.add_argument("--output-format", choices=["text", "jsonl"], default="text", help="输出格式")
+    parser.add_argument("--metrics-port", type=int, default=None, help="在该端口提供 Prometheus /metrics")
+    parser.add_argument("-q", "--quiet", action="store_true", help="不在标准错误输出进度")
+    args = parser.parse_args(argv)
+
+    prompt = args.prompt or function_dict[args.function]
+    if args.metrics_port:
+        start_metrics_server(port=args.metrics_port)
+    items = iter_items(args.inputs, args.mode, args.input_format, args.field, args.model, prompt)
+
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    failed_count = 0
+    processed = 0
+    stats = RetryStats()
+    hedge_stats = HedgeStats()
+    try:
+        results = iter_chat_llm_batch(
+            items,
+            args.model,
+            prompt,
+            args.top_p,
+            args.temperature,
+            max_concurrent=args.max_concurrent,
+            use_cache=not args.no_cache,
+            item_timeout=args.item_timeout,
+            job_timeout=args.job_timeout,
+            stats=stats,
+            hedge=args.hedge,
+            hedge_model=args.hedge_model,
+            hedge_stats=hedge_stats,
+            pack=args.pack,
+            policy=args.policy,
+        )
+        for index, text, failed in results:
+            processed += 1
+            failed_count += int(failed)
+            if args.output_format == "jsonl":
+                out.write(json.dumps({"index": index, "output": text, "error": failed}, ensure_ascii=False) + "\n")
+            else:
+                out.write(("\n\n" if index else "") + text)
+            out.flush()
+            if not args.quiet:
+                retries = format_error_counts(stats.snapshot()["retries"])
+                print(f"\r已完成 {processed}，失败 {failed_count}，当前并发 {get_limiter(args.model).limit}"
+                      + (f"，重试 {retries}" if retries else ""),
+                      end="", file=sys.stderr, flush=True)
+        if args.output_format == "text" and processed:
+            out.write("\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    if not args.quiet:
+        print(file=sys.stderr)
+        hedges = hedge_stats.snapshot()["hedges"]
+        if hedges["launched"]:
+            print(f"对冲 {hedges['launched']} 次，胜出 {hedges['wins']} 次，约节省 {hedges['saved']:.1f}s", file=sys.stderr)
+    return 1 if failed_count else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,9 @@
 from typing import Any, Dict
 
 # 供应商配置 - 包含API密钥和基础URL
-supplier_dict: Dict[str, Dict[str, str]] = {
+# 可选 `rpm`/`tpm`：账号级每分钟请求数与 token 数限额，同一 API 密钥的所有请求共享；模型级限额可在 model_dict 中配置
+# `api` 也可以是密钥列表（密钥池）：每个密钥各自计算限额，请求在密钥间分流
+supplier_dict: Dict[str, Dict[str, Any]] = {
     "aliai": {
         "api": "<YOUR_API_KEY>",
         "url": "https://dashscope.aliyuncs.com/compatible-mode/v1"
@@ -22,32 +24,44 @@ supplier_dict: Dict[str, Dict[str, str]] = {
 }
 
 # 模型配置 - 映射模型名称到供应商
+# 可选 `endpoints`：由多个供应商（兼容同一模型的不同地址）共同服务，元素为供应商名或
+# {"supplier": 供应商名, "weight": 权重}，如 "endpoints": [{"supplier": "deepseek", "weight": 2}, "deepseek-backup"]；
+# 未配置时仅使用 `supplier`，`supplier` 同时用于全局调度的分组
 model_dict: Dict[str, Dict[str, Any]] = {
     "glm-4.5": {
         "supplier": "zhipuai",
         "max_tokens": 8192,
         "max_concurrent": 10,
+        "context_window": 128000,
     },
     "qwen3-max": {
         "supplier": "aliai",
         "max_tokens": 8192,
         "max_concurrent": 10,
+        "context_window": 262144,
 
     },
     "kimi-k2-0905-preview": {
         "supplier": "kimiai",
         "max_tokens": 8192,
         "max_concurrent": 10,
+        "context_window": 262144,
 
     },
     "deepseek-chat": {
         "supplier": "deepseek",
         "max_tokens": 4096,
         "max_concurrent": 100,
+        "context_window": 131072,
+        # 官方换算：1 个中文字符约 0.6 token，1 个英文字符约 0.3 token
+        "tokenizer": {"type": "estimate", "cjk_ratio": 0.6, "other_ratio": 0.3},
     },
     "deepseek-reasoner": {
         "supplier": "deepseek",
         "max_tokens": 8192,
         "max_concurrent": 100,
+        "context_window": 131072,
+        # 官方换算：1 个中文字符约 0.6 token，1 个英文字符约 0.3 token
+        "tokenizer": {"type": "estimate", "cjk_ratio": 0.6, "other_ratio": 0.3},
     },
 }
@@ -0,0 +1,192 @@
+from typing import Any, Dict
+
+# 客户端连接池配置 - 每个供应商共享一个长连接 HTTP 池
+client_config: Dict[str, Any] = {
+    # 启动时是否预先建立到各供应商的连接（TLS 握手前置）
+    "preconnect": True,
+    # 空闲长连接保活时间（秒）
+    "keepalive_expiry": 60.0,
+    # 单次请求超时（秒）
+    "timeout": 300.0,
+    # 建立连接超时（秒）
+    "connect_timeout": 10.0,
+    # SDK 内部重试次数；置 0 由调用方按 `retry_config` 统一重试，使 429/5xx 能被自适应并发控制感知
+    "max_retries": 0,
+    # 流式请求是否附带 `stream_options.include_usage`，以获取实际 token 用量
+    "stream_usage": True,
+}
+
+# 流式界面刷新配置 - 合并高频增量，按固定节拍推送到前端
+stream_config: Dict[str, Any] = {
+    # 最小刷新间隔（秒），0.05 即约 20 Hz
+    "flush_interval": 0.05,
+    # 待刷新字符数达到该值时立即刷新，0 表示仅按时间刷新
+    "flush_chars": 2048,
+}
+
+# 响应缓存配置 - 以 (模型, 提示词, 输入, top_p, temperature) 的哈希为键持久化到本地
+cache_config: Dict[str, Any] = {
+    "enabled": True,
+    # SQLite 缓存文件路径
+    "path": ".cache/responses.sqlite3",
+    # 最大条目数与最大总字节数，超出后按最近最少使用淘汰
+    "max_entries": 50000,
+    "max_bytes": 512 * 1024 * 1024,
+    # 条目有效期（秒），0 表示永不过期
+    "ttl": 30 * 24 * 3600,
+    # 命中时以流式回放的单块字符数
+    "replay_chunk_chars": 64,
+}
+
+# 批量任务日志配置 - 逐项记录批量任务状态，进程中断后可续跑
+journal_config: Dict[str, Any] = {
+    "enabled": True,
+    # SQLite 日志文件路径
+    "path": ".cache/jobs.sqlite3",
+    # 已完成任务的保留时间（秒），超期后自动清理
+    "retention": 7 * 24 * 3600,
+}
+
+# 自适应并发配置 - 按 (供应商, 模型) 加性增、乘性减（AIMD），`model_dict` 中的 max_concurrent 为上限
+concurrency_config: Dict[str, Any] = {
+    # 初始并发占上限的比例
+    "initial_ratio": 0.5,
+    # 并发下限
+    "min_limit": 1,
+    # 每完成约一轮（当前并发数个）请求时增加的并发数
+    "increase": 1.0,
+    # 遇到 429、5xx、超时或延迟突增时的乘性缩减系数
+    "decrease": 0.5,
+    # 首 token 延迟超过平滑基线的倍数时视为延迟突增
+    "latency_factor": 2.0,
+    # 基线平滑系数（指数移动平均）
+    "ewma_alpha": 0.2,
+    # 建立基线所需的最少样本数
+    "min_samples": 5,
+    # 两次缩减的最小间隔（秒），同一次拥塞内的并发失败只缩减一次
+    "cooldown": 1.0,
+}
+
+# 速率限制配置 - RPM/TPM 限额本身在 `supplier_dict`（账号级）与 `model_dict`（模型级）中以 `rpm`/`tpm` 键配置
+rate_limit_config: Dict[str, Any] = {
+    # 预估输出 token 的下限；输出按输入长度预估，并受模型 max_tokens 约束
+    "min_output_tokens": 256,
+}
+
+# 全局调度配置 - 所有会话与批量任务的上游请求按供应商排队，交互请求优先于批量请求
+scheduler_config: Dict[str, Any] = {
+    # 供应商 -> 同时在途请求数上限；未配置的供应商取其下所有模型 max_concurrent 之和
+    "supplier_capacity": {},
+    # 排队时长统计的平滑系数（指数移动平均）
+    "ewma_alpha": 0.2,
+}
+
+# 重试与截止时间配置 - 鉴权与请求无效错误不重试，429 遵循 Retry-After，其余错误按去相关抖动退避
+retry_config: Dict[str, Any] = {
+    # 单项最大尝试次数（含首次）
+    "max_attempts": 4,
+    # 退避基准与单次退避上限（秒）
+    "base_delay": 1.0,
+    "max_delay": 30.0,
+    # 批量任务单项总时限（秒，含排队、重试与等待），0 表示不限
+    "item_timeout": 900,
+    # 批量任务整体时限（秒），0 表示不限；超时后未完成的项记为失败，可续跑
+    "job_timeout": 0,
+}
+
+# 对冲请求配置 - 批量任务中首 token 迟迟未到或生成明显偏慢的项再发一份副本，先完成者胜出
+hedge_config: Dict[str, Any] = {
+    # 默认是否启用，批量函数的 hedge 参数可覆盖
+    "enabled": False,
+    # 等待首 token 超过本任务 TTFT 样本的该分位数时发起对冲
+    "ttft_percentile": 0.95,
+    # 对冲等待下限（秒），避免样本偏快时过早对冲
+    "min_delay": 2.0,
+    # 开始生成后持续该时长（秒）且速率低于中位速率的该比例时发起对冲
+    "slow_after": 3.0,
+    "slow_ratio": 0.3,
+    # 开始判断前所需的最少完成样本数
+    "min_samples": 8,
+    # 对冲预算：对冲次数不超过已开始项数的该比例（至少 1 次）
+    "budget_ratio": 0.1,
+    # 对冲请求使用的备用模型，留空则使用原模型
+    "alternate_model": "",
+    # 检查对冲条件的间隔（秒）
+    "poll_interval": 0.25,
+}
+
+# 端点池配置 - 模型可由多个端点（多个 API 密钥或多个兼容地址）共同服务，见 `model_dict` 的 `endpoints`
+endpoint_config: Dict[str, Any] = {
+    # 路由策略："least_outstanding" 按权重折算的最少在途请求，"weighted" 平滑加权轮询
+    "routing": "least_outstanding",
+    # 连续失败（鉴权、限流、5xx、网络错误）达到该次数后熔断
+    "failure_threshold": 3,
+    # 熔断持续时间（秒），到期后放行一个探测请求
+    "open_seconds": 30.0,
+}
+
+# 指标配置 - 按模型与供应商统计排队、首 token 延迟、token 间隔、输出速率、时长、重试与错误
+metrics_config: Dict[str, Any] = {
+    # 启动界面时是否同时启动 Prometheus 指标服务（/metrics）
+    "enabled": True,
+    "host": "127.0.0.1",
+    "port": 7862,
+    # 每个直方图保留的最近样本数，用于实时分位数
+    "reservoir": 512,
+    # 聚合输出速率的统计窗口（秒）
+    "rate_window": 30.0,
+}
+
+# 模型对比配置 - ModelComparison 标签页的并行对比路数，每一路可选择不同模型或参数
+compare_config: Dict[str, Any] = {
+    "panels": 3,
+}
+
+# 在途请求合并配置 - (模型, 提示词, 输入, top_p, temperature) 相同且同时在途的流式请求共享一个上游流
+coalesce_config: Dict[str, Any] = {
+    "enabled": True,
+}
+
+# 打包配置 - 列表任务可选将多条短条目以编号分隔合并为一次请求，减少重复的系统提示词与逐请求开销
+packing_config: Dict[str, Any] = {
+    # 单个打包请求中条目的输入 token 上限；另受模型 `max_tokens` 约束，以免合并输出被截断
+    "max_pack_tokens": 1500,
+    # 单个打包请求的最大条目数
+    "max_items": 30,
+    # 超过该 token 数的条目不参与打包，单独请求
+    "max_item_tokens": 200,
+}
+
+# 派发策略配置 - 批量任务按预估开销（输入 token + 预测输出 token）排序派发，结果顺序不变
+dispatch_config: Dict[str, Any] = {
+    # "fifo" 按输入顺序；"ljf" 开销大的项先派发，避免大项排在末尾拖长总耗时；"sjf" 小项先派发，适合交互预览
+    "policy": "fifo",
+    # 是否从完成的项学习各 (模型, 提示词) 的输出长度，并持久化供后续任务预测
+    "learn": True,
+    # SQLite 统计文件路径
+    "path": ".cache/dispatch.sqlite3",
+    # 无足够样本时，预测输出 token 数与输入 token 数之比
+    "default_output_ratio": 1.0,
+    # 开始使用学习结果所需的最少样本数
+    "min_samples": 5,
+    # 样本权重上限，超出后旧样本按比例衰减
+    "max_samples": 1000,
+}
+
+# 多轮对话配置 - MultiFunctionGPT 按界面会话保留对话历史，历史受 token 预算约束，较早的轮次在后台增量摘要
+conversation_config: Dict[str, Any] = {
+    # 界面中 `连续对话` 的默认值（默认关闭，按需勾选）；关闭时每次提问均为单轮对话
+    "enabled": False,
+    # 历史可占用的上下文比例（上下文窗口扣除输出 `max_tokens` 后的部分），超出时淘汰最早的轮次
+    "history_ratio": 0.5,
+    # 淘汰后历史降至上限的该比例，留出余量，避免每轮都触发淘汰与摘要
+    "low_water_ratio": 0.6,
+    # 是否在后台将淘汰的轮次并入摘要；关闭时直接丢弃
+    "summarize": True,
+    # 摘要的 token 上限
+    "summary_max_tokens": 512,
+    # 最多保留的会话数，超出时淘汰最久未使用的会话
+    "max_sessions": 256,
+    # 会话闲置超过该秒数后被清除
+    "idle_ttl": 3600.0,
+}
@@ -0,0 +1,99 @@
+"""
+参数扫描评测入口（不依赖 Gradio）：对数据集并发执行 模型 × top_p × temperature × 提示词 的全部组合，
+记录每个组合的延迟、生成速率、token 用量、错误率与质量得分，逐项输出写入结果文件，并打印汇总表。
+
+示例：
+    python evaluate.py questions.txt --models deepseek-chat glm-4.5 --top-p 0.7 1.0 --temperature 0.3 0.9 -o eval.csv
+    python evaluate.py qa.jsonl --input-format jsonl --functions 中文润色 --scorer similarity --quality-threshold 0.8
+"""
+import argparse
+import json
+import sys
+from typing import Optional
+
+from config.function_config import function_dict
+from config.model_config import model_dict
+from tool.evaluation import (
+    RANK_METRICS,
+    SCORERS,
+    format_summary_table,
+    get_scorer,
+    load_dataset,
+    make_grid,
+    pick_best,
+    run_evaluation,
+    write_results,
+)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="MyPrivateGPT 参数扫描评测")
+    parser.add_argument("dataset", help="数据集文件，- 表示标准输入")
+    parser.add_argument("--input-format", choices=["text", "jsonl"], default="text", help="数据集格式")
+    parser.add_argument("--field", default="text", help="jsonl 数据集中的输入字段名")
+    parser.add_argument("--reference-field", default="reference", help="jsonl 数据集中的参考答案字段名")
+    parser.add_argument("--models", nargs="+", choices=list(model_dict), default=[next(iter(model_dict))])
+    parser.add_argument("--top-p", type=float, nargs="+", default=[0.7])
+    parser.add_argument("--temperature", type=float, nargs="+", default=[0.9])
+    parser.add_argument("--functions", nargs="+", choices=list(function_dict), default=["NONE"], help="预设功能提示词")
+    parser.add_argument("--prompt", default=None, help="额外加入网格的自定义系统提示词（名称为 custom）")
+    parser.add_argument("--scorer", default="similarity",
+                        help=f"质量评分函数：{'/'.join(SCORERS)} 或 模块:函数，需数据集提供参考答案")
+    parser.add_argument("--quality-threshold", type=float, default=None, help="挑选最佳配置时的最低平均得分")
+    parser.add_argument("--max-error-rate", type=float, default=0.0, help="挑选最佳配置时允许的最大错误率")
+    parser.add_argument("--rank-by", choices=list(RANK_METRICS), default="latency_p50", help="挑选最快配置的指标")
+    parser.add_argument("--max-concurrent", type=int, default=None, help="每个组合的并发数，以模型配置为上限")
+    parser.add_argument("--max-cells", type=int, default=None, help="同时执行的组合数，默认全部同时执行")
+    parser.add_argument("--mix-suppliers", action="store_true",
+                        help="同一供应商的组合也同时执行（默认依次执行，避免相互排队使延迟失真）")
+    parser.add_argument("--use-cache", action="store_true", help="读取响应缓存（默认关闭，以测得真实延迟）")
+    parser.add_argument("-o", "--output", default="eval_results.csv",
+                        help="逐项结果文件，按扩展名写出 .csv/.jsonl/.parquet")
+    parser.add_argument("--summary", default=None, help="汇总 JSON 输出路径")
+    parser.add_argument("-q", "--quiet", action="store_true", help="不在标准错误输出进度")
+    args = parser.parse_args(argv)
+
+    if args.dataset == "-":
+        dataset = load_dataset(sys.stdin, args.input_format, args.field, args.reference_field)
+    else:
+        with open(args.dataset, "r", encoding="utf-8") as f:
+            dataset = load_dataset(f, args.input_format, args.field, args.reference_field)
+    if not dataset:
+        print("数据集为空", file=sys.stderr)
+        return 1
+
+    functions = list(args.functions) + (["custom"] if args.prompt else [])
+    cells = make_grid(args.models, args.top_p, args.temperature, functions,
+                      {"custom": args.prompt} if args.prompt else None)
+    scorer = get_scorer(args.scorer) if args.scorer else None
+
+    done = 0
+
+    def on_cell(summary: dict) -> None:
+        nonlocal done
+        done += 1
+        if not args.quiet:
+            print(f"\r已完成组合 {done}/{len(cells)}", end="", file=sys.stderr, flush=True)
+
+    rows, summaries = run_evaluation(dataset, cells, scorer, use_cache=args.use_cache,
+                                     max_concurrent=args.max_concurrent, max_cells=args.max_cells, on_cell=on_cell,
+                                     isolate_suppliers=not args.mix_suppliers)
+    if not args.quiet:
+        print(file=sys.stderr)
+
+    write_results(rows, args.output)
+    best = pick_best(summaries, args.quality_threshold, args.max_error_rate, args.rank_by)
+    print(format_summary_table(summaries, best))
+    if best is not None:
+        print(f"\n最佳配置（按 {args.rank_by}）：#{best['cell']} {best['model']} top_p={best['top_p']} "
+              f"temperature={best['temperature']} 提示词={best['function']}")
+    else:
+        print("\n没有满足质量阈值与错误率上限的配置")
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as f:
+            json.dump({"cells": summaries, "best": best}, f, ensure_ascii=False, indent=2)
+    return 0 if best is not None else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
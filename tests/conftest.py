@@ -0,0 +1,43 @@
+"""
+测试夹具：在本地模拟服务（`benchmark.mock_server`）上运行批量引擎，不消耗真实 token。
+
+与吞吐基准的 `_configure` 相同，所有供应商被改指向模拟服务，缓存、任务日志与输出长度学习默认关闭，
+需要时由各测试以临时路径单独开启。
+"""
+import pytest
+
+from benchmark.mock_server import start_mock_server
+from config.model_config import model_dict, supplier_dict
+from config.runtime_config import cache_config, dispatch_config, journal_config
+
+# 测试使用的模型，其供应商被改指向模拟服务
+MODEL = "deepseek-chat"
+PROMPT = "请将下面的内容改写得更通顺。"
+
+
+@pytest.fixture(scope="session", autouse=True)
+def mock_server():
+    """启动快速、无抖动的模拟服务，并将全部供应商指向它。"""
+    server = start_mock_server(ttft=0.01, tokens_per_sec=2000.0, jitter=0.0, output_tokens=8, seed=0)
+    url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    for supplier in supplier_dict:
+        supplier_dict[supplier] = {"api": "test", "url": url}
+    for config in model_dict.values():
+        for key in ("endpoints", "rpm", "tpm"):
+            config.pop(key, None)
+    cache_config["enabled"] = False
+    journal_config["enabled"] = False
+    dispatch_config["learn"] = False
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def request_count(mock_server):
+    """返回读取模拟服务累计请求数的函数，用于断言实际发出的请求数。"""
+    def count() -> int:
+        with mock_server.lock:
+            return mock_server.stats["requests"]
+
+    return count
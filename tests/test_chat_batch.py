@@ -0,0 +1,57 @@
+import threading
+import time
+
+import pytest
+
+import tool.chat_batch as chat_batch
+from tests.conftest import MODEL, PROMPT
+from tool.chat_batch import iter_chat_llm_batch
+
+
+@pytest.fixture
+def uneven_latency(monkeypatch):
+    """使索引越小的项完成越晚，令完成顺序与输入顺序相反。"""
+    original = chat_batch._stream_item_with_retry
+    count = 8
+
+    def delayed(item, index, *args, **kwargs):
+        time.sleep(0.02 * (count - index))
+        return original(item, index, *args, **kwargs)
+
+    monkeypatch.setattr(chat_batch, "_stream_item_with_retry", delayed)
+    return [f"第 {i} 条" for i in range(count)]
+
+
+def test_ordered_yields_in_input_order(uneven_latency):
+    results = list(iter_chat_llm_batch(uneven_latency, MODEL, PROMPT, max_concurrent=8, use_cache=False))
+
+    assert [index for index, _, _ in results] == list(range(len(uneven_latency)))
+    assert not any(failed for _, _, failed in results)
+    assert all(text.startswith("token") for _, text, _ in results)
+
+
+def test_unordered_yields_in_completion_order(uneven_latency):
+    results = list(iter_chat_llm_batch(
+        uneven_latency, MODEL, PROMPT, ordered=False, max_concurrent=8, use_cache=False))
+
+    indices = [index for index, _, _ in results]
+    assert sorted(indices) == list(range(len(uneven_latency)))
+    assert indices != sorted(indices)
+
+
+def test_input_is_consumed_lazily_within_window():
+    consumed = []
+    lock = threading.Lock()
+
+    def items():
+        for i in range(40):
+            with lock:
+                consumed.append(i)
+            yield f"第 {i} 条"
+
+    iterator = iter_chat_llm_batch(items(), MODEL, PROMPT, max_concurrent=2, window=4, use_cache=False)
+    index, _, _ = next(iterator)
+    assert index == 0
+    # 首项产出时至多读取了窗口内的项（外加触发阻塞的一项）
+    assert len(consumed) <= 5
+    assert [index for index, _, _ in iterator] == list(range(1, 40))
@@ -0,0 +1,56 @@
+import pytest
+
+import tool.job_journal as job_journal
+from config.runtime_config import journal_config
+from tests.conftest import MODEL, PROMPT
+from tool.chat_batch import chat_llm_batch, resume_batch_job
+from tool.job_journal import STATUS_DONE, STATUS_FAILED, JobJournal, make_job_id
+
+
+@pytest.fixture
+def journal(tmp_path, monkeypatch):
+    """以临时文件启用进程级任务日志。"""
+    journal = JobJournal(str(tmp_path / "jobs.db"))
+    monkeypatch.setitem(journal_config, "enabled", True)
+    monkeypatch.setattr(job_journal, "_journal", journal)
+    return journal
+
+
+def test_restore_item_returns_only_completed_unchanged_items(tmp_path):
+    journal = JobJournal(str(tmp_path / "jobs.db"))
+    job_id = make_job_id()
+    journal.begin_job(job_id, MODEL, PROMPT, 0.7, 0.9)
+    for index, text in enumerate(["甲", "乙", "丙"]):
+        assert journal.restore_item(job_id, index, text) is None
+    journal.complete_item(job_id, 0, "A")
+    journal.complete_item(job_id, 1, "B")
+    journal.fail_item(job_id, 2, "错误: boom")
+    assert journal.finish_job(job_id, 3) == STATUS_FAILED
+    assert [job["job_id"] for job in journal.list_resumable()] == [job_id]
+
+    journal.begin_job(job_id, MODEL, PROMPT, 0.7, 0.9)
+    assert journal.restore_item(job_id, 0, "甲") == "A"
+    # 输入变化的项与失败的项需重新调度
+    assert journal.restore_item(job_id, 1, "乙乙") is None
+    assert journal.restore_item(job_id, 2, "丙") is None
+
+
+def test_make_job_id_is_unique_per_submission():
+    assert make_job_id() != make_job_id()
+
+
+def test_resume_reschedules_only_failed_items(journal, request_count):
+    job_id = make_job_id()
+    items = [f"第 {i} 条" for i in range(6)]
+    first = chat_llm_batch(items, MODEL, PROMPT, job_id=job_id, use_cache=False)
+    assert journal.get_job(job_id)["status"] == STATUS_DONE
+
+    journal.fail_item(job_id, 2, "错误: boom")
+    journal.fail_item(job_id, 4, "错误: boom")
+    before = request_count()
+    resumed = resume_batch_job(job_id)
+
+    assert request_count() - before == 2
+    assert resumed == first
+    assert journal.get_job(job_id)["status"] == STATUS_DONE
+    assert [index for index, _ in journal.load_results(job_id)] == list(range(6))
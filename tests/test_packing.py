@@ -0,0 +1,33 @@
+from tool.packing import PackDemux, pack_items, parse_packed
+
+
+def test_parse_packed_round_trip():
+    text = pack_items(["甲", "乙", "丙"])
+    assert parse_packed(text, 3) == {0: "甲", 1: "乙", 2: "丙"}
+
+
+def test_parse_packed_drops_missing_duplicated_and_out_of_range():
+    text = "前言\n<<<1>>>\n一\n<<<2>>>\n\n<<<3>>>\n三\n<<<3>>>\n又三\n<<<9>>>\n越界\n<<< 4 >>>\n四"
+    # 2 为空、3 重复均视为缺失；9 越界忽略；首个标记之前的内容忽略
+    assert parse_packed(text, 4) == {0: "一", 3: "四"}
+
+
+def test_pack_demux_splits_stream_across_chunk_boundaries():
+    text = "<<<1>>>\n第一行\n第二行\n<<<2>>>\n结果二\n"
+    demux = PackDemux(2)
+    deltas = []
+    for i in range(0, len(text), 3):
+        deltas.extend(demux.feed(text[i:i + 3]))
+
+    merged = {}
+    for position, delta in deltas:
+        merged[position] = merged.get(position, "") + delta
+    assert merged == {0: "第一行\n第二行\n", 1: "结果二\n"}
+
+
+def test_pack_demux_reset_discards_pending_state():
+    demux = PackDemux(2)
+    assert demux.feed("<<<1>>>\n半") == []
+    demux.reset()
+    # 重置后未出现标记前的内容不归属任何条目
+    assert demux.feed("行\n<<<2>>>\n二\n") == [(1, "二\n")]
@@ -0,0 +1,70 @@
+import pytest
+
+import tool.response_cache as response_cache
+from tool.response_cache import ResponseCache
+
+
+class _Clock:
+    """可手动推进的时钟，替换缓存模块中的 `time`。"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(response_cache, "time", clock)
+    return clock
+
+
+def test_lru_evicts_least_recently_accessed(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / "cache.db"), max_entries=2)
+    cache.put("a", "A")
+    clock.now += 1
+    cache.put("b", "B")
+    clock.now += 1
+    assert cache.get("a") == "A"
+    clock.now += 1
+    cache.put("c", "C")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "A"
+    assert cache.get("c") == "C"
+    cache.close()
+
+
+def test_evicts_by_total_bytes(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / "cache.db"), max_bytes=10)
+    cache.put("a", "x" * 6)
+    clock.now += 1
+    cache.put("b", "y" * 6)
+
+    assert cache.get("a") is None
+    assert cache.get("b") == "y" * 6
+    cache.close()
+
+
+def test_ttl_expires_entries(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / "cache.db"), ttl=10)
+    cache.put("a", "A")
+    clock.now += 5
+    assert cache.get("a") == "A"
+    # 访问不延长有效期，过期按写入时间计算
+    clock.now += 6
+    assert cache.get("a") is None
+    cache.close()
+
+
+def test_entries_persist_across_instances(tmp_path, clock):
+    path = str(tmp_path / "cache.db")
+    cache = ResponseCache(path)
+    cache.put("a", "A")
+    cache.close()
+
+    reopened = ResponseCache(path)
+    assert reopened.get("a") == "A"
+    reopened.close()
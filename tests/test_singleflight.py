@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+from tests.conftest import MODEL
+from tool.singleflight import SingleFlight
+
+
+def _failing_upstream(calls: list):
+    calls.append(1)
+    yield "a"
+    raise RuntimeError("upstream broke")
+
+
+def test_error_reaches_every_subscriber():
+    flights = SingleFlight()
+    calls = []
+    first = flights.stream("key", MODEL, None, lambda: _failing_upstream(calls))
+    assert next(first) == "a"
+
+    # 后加入者先回放已缓存的前缀
+    second = flights.stream("key", MODEL, None, lambda: _failing_upstream(calls))
+    assert next(second) == "a"
+
+    with pytest.raises(RuntimeError, match="upstream broke"):
+        next(first)
+    with pytest.raises(RuntimeError, match="upstream broke"):
+        next(second)
+    assert len(calls) == 1
+
+
+def test_failed_flight_is_not_reused():
+    flights = SingleFlight()
+    calls = []
+    with pytest.raises(RuntimeError):
+        list(flights.stream("key", MODEL, None, lambda: _failing_upstream(calls)))
+
+    retry = flights.stream("key", MODEL, None, lambda: _failing_upstream(calls))
+    assert next(retry) == "a"
+    assert len(calls) == 2
+    retry.close()
+
+
+def test_async_error_reaches_every_subscriber():
+    async def upstream():
+        yield "a"
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream broke")
+
+    async def consume(flights: SingleFlight) -> list:
+        chunks = []
+        async for chunk in flights.stream_async("key", MODEL, None, upstream):
+            chunks.append(chunk)
+        return chunks
+
+    async def main():
+        flights = SingleFlight()
+        return await asyncio.gather(consume(flights), consume(flights), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, RuntimeError) for result in results)
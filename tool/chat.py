@@ -1,6 +1,310 @@
-from typing import Iterator, Optional
-from openai import OpenAI
-from config.model_config import supplier_dict, model_dict
+import asyncio
+import socket
+import threading
+import time
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Set
+from config.model_config import model_dict
+from config.runtime_config import client_config
+from tool.client_pool import get_endpoint_async_client, get_endpoint_client
+from tool.endpoint_pool import Endpoint, EndpointPool, get_endpoint_pool
+from tool.metrics import get_metrics
+from tool.rate_limit import estimate_request_tokens, reserve_request
+from tool.response_cache import get_response_cache, make_cache_key, replay_stream
+from tool.retry import RetryState, remaining
+from tool.scheduler import LANE_INTERACTIVE, get_scheduler
+from tool.singleflight import get_singleflight
+from tool.token_count import count_tokens
+
+
+class StreamCancelled(BaseException):
+    """
+    流式请求经 `StreamHandle.cancel` 被中止。
+
+    与 `asyncio.CancelledError` 一样继承 BaseException，熔断器、自适应限制器与错误指标均不将其计为失败。
+    """
+
+
+class StreamHandle:
+    """可从其他线程中止的流式请求句柄：中止时关闭底层响应，使阻塞中的读取立即返回并释放槽位与连接。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._response: Any = None
+        self.cancelled = False
+
+    def attach(self, response: Any) -> None:
+        """
+        登记当前请求的响应流；句柄已被中止时抛出 `StreamCancelled`。
+
+        Args:
+            response (Any): 可 `close()` 的响应流，如 OpenAI SDK 的 `Stream`。
+        """
+        with self._lock:
+            cancelled = self.cancelled
+            if not cancelled:
+                self._response = response
+        if cancelled:
+            raise StreamCancelled()
+
+    def cancel(self) -> None:
+        """
+        中止请求：关闭已登记响应流的底层连接，之后登记的响应流立即中止。
+
+        阻塞在读取上的线程不会因另一线程调用 `close()` 而返回，故优先直接关闭套接字，取不到时再关闭响应流。
+        """
+        # 持锁关闭：响应流一旦解除登记，其连接可能已归还连接池并被其他请求复用，不能再关闭
+        with self._lock:
+            self.cancelled = True
+            response = self._response
+            if response is None:
+                return
+            http_response = getattr(response, "response", response)
+            network_stream = getattr(http_response, "extensions", {}).get("network_stream")
+            sock = network_stream.get_extra_info("socket") if network_stream else None
+            try:
+                if sock is not None:
+                    sock.shutdown(socket.SHUT_RDWR)
+                else:
+                    response.close()
+            except Exception:
+                pass
+
+    def detach(self) -> None:
+        """解除登记，须在响应流关闭（连接归还连接池）之前调用。"""
+        with self._lock:
+            self._response = None
+
+
+def _stream_kwargs() -> Dict[str, Any]:
+    """流式请求的附加参数：按配置请求在末尾返回实际 token 用量。"""
+    if client_config["stream_usage"]:
+        return {"stream_options": {"include_usage": True}}
+    return {}
+
+
+def _deadline_kwargs(deadline: Optional[float]) -> Dict[str, Any]:
+    """按剩余时间设置单次请求超时；不限时沿用客户端默认超时。"""
+    left = remaining(deadline)
+    return {"timeout": left} if left is not None else {}
+
+
+def _actual_tokens(usage: Any, input_tokens: int, output: str, input_model: str) -> int:
+    """实际 token 用量：优先取接口返回的 usage，缺失时以输入预估加输出计数代替。"""
+    total = getattr(usage, "total_tokens", None)
+    if total is not None:
+        return int(total)
+    return input_tokens + count_tokens(output, input_model)
+
+
+def _output_tokens(usage: Any, output: str, input_model: str) -> int:
+    """输出 token 数：优先取接口返回的 usage，缺失时按输出文本计数。"""
+    completion_tokens = getattr(usage, "completion_tokens", None)
+    if completion_tokens is not None:
+        return int(completion_tokens)
+    return count_tokens(output, input_model)
+
+
+def _next_attempt(pool: EndpointPool, exc: BaseException, tried: Set[str],
+                  retry: Optional[RetryState]) -> Optional[float]:
+    """
+    尚未产出内容的请求失败后决定下一次尝试：仍有未尝试的健康端点时立即改投；
+    各端点均已尝试时按 `retry` 的策略退避后重新选择端点。
+
+    Returns:
+        Optional[float]: 重试前的等待秒数（改投为 0），None 表示不再尝试。
+    """
+    if pool.can_failover(exc, tried):
+        return 0.0
+    delay = retry.next_delay(exc) if retry else None
+    if delay is not None:
+        tried.clear()
+    return delay
+
+
+def _messages(prompt: str, input_text: str,
+              history: Optional[List[Dict[str, str]]] = None) -> List[Dict[str, str]]:
+    """组装对话消息：系统提示词、历史消息（多轮对话时）与本轮输入。"""
+    return [
+        {"role": "system", "content": prompt},
+        *(history or ()),
+        {"role": "user", "content": input_text},
+    ]
+
+
+def _complete_from(
+        endpoint: Endpoint,
+        input_text: str,
+        input_model: str,
+        prompt: str,
+        input_top_p: float,
+        input_temperature: float,
+        lane: str,
+        session: Optional[str],
+        deadline: Optional[float],
+) -> str:
+    """经指定端点发起一次非流式请求：按该端点的限额排队放行，再经全局调度器派发。"""
+    client = get_endpoint_client(endpoint)
+    # 先按账号与模型的 RPM/TPM 限额排队放行，再经全局调度器派发（含自适应并发限制）
+    input_tokens, estimate = estimate_request_tokens(input_model, prompt, input_text)
+    reservation = reserve_request(input_model, estimate, endpoint)
+    reservation.wait(deadline)
+    recorder = get_metrics().request(input_model, endpoint.supplier)
+    completion = None
+    try:
+        with get_scheduler().slot(input_model, lane, session, deadline) as probe:
+            recorder.dispatch(probe.queue_wait)
+            completion = client.chat.completions.create(
+                model=input_model,
+                messages=_messages(prompt, input_text),
+                top_p=input_top_p,
+                temperature=input_temperature,
+                max_tokens=model_dict[input_model]["max_tokens"],
+                stream=False,
+                **_deadline_kwargs(deadline),
+            )
+    except Exception as e:
+        recorder.fail(e)
+        raise
+    finally:
+        if completion is None:
+            reservation.settle(input_tokens)
+
+    result = str(completion.choices[0].message.content)
+    reservation.settle(_actual_tokens(completion.usage, input_tokens, result, input_model))
+    recorder.finish(_output_tokens(completion.usage, result, input_model), streamed=False)
+    return result
+
+
+def _stream_from(
+        endpoint: Endpoint,
+        input_text: str,
+        input_model: str,
+        prompt: str,
+        input_top_p: float,
+        input_temperature: float,
+        lane: str,
+        session: Optional[str],
+        deadline: Optional[float],
+        parts: List[str],
+        history: Optional[List[Dict[str, str]]] = None,
+        history_tokens: int = 0,
+        handle: Optional[StreamHandle] = None,
+) -> Iterator[str]:
+    """经指定端点发起一次流式请求并逐块产出，输出同时追加到 `parts`；`handle` 被中止时抛出 `StreamCancelled`。"""
+    client = get_endpoint_client(endpoint)
+    # 先按账号与模型的 RPM/TPM 限额排队放行，结束后（含失败与中断）按实际用量修正
+    input_tokens, estimate = estimate_request_tokens(input_model, prompt, input_text, history_tokens)
+    reservation = reserve_request(input_model, estimate, endpoint)
+    reservation.wait(deadline)
+
+    recorder = get_metrics().request(input_model, endpoint.supplier)
+    usage = None
+    try:
+        # 整个流式过程占用一个调度槽位，首 token 延迟作为自适应限制器的延迟样本
+        with get_scheduler().slot(input_model, lane, session, deadline) as probe:
+            recorder.dispatch(probe.queue_wait)
+            # 排队期间已被中止（如对冲已决出胜者）时不再发起请求
+            if handle and handle.cancelled:
+                raise StreamCancelled()
+            completion = client.chat.completions.create(
+                model=input_model,
+                messages=_messages(prompt, input_text, history),
+                top_p=input_top_p,
+                temperature=input_temperature,
+                max_tokens=model_dict[input_model]["max_tokens"],
+                stream=True,
+                **_stream_kwargs(),
+                **_deadline_kwargs(deadline),
+            )
+
+            # 异常、超时或调用方提前关闭时随之关闭响应流，及时归还连接
+            with completion:
+                if handle:
+                    handle.attach(completion)
+                try:
+                    for chunk in completion:
+                        probe.first_token()
+                        remaining(deadline)
+                        usage = getattr(chunk, "usage", None) or usage
+                        # 用量块不含 choices
+                        if not chunk.choices:
+                            continue
+                        content = chunk.choices[0].delta.content or ""
+                        if content:
+                            recorder.chunk()
+                        parts.append(content)
+                        yield content
+                except Exception as e:
+                    # 响应流被句柄关闭引起的读取错误按中止处理，不计为失败
+                    if handle and handle.cancelled:
+                        raise StreamCancelled() from e
+                    raise
+                finally:
+                    if handle:
+                        handle.detach()
+                if handle and handle.cancelled:
+                    raise StreamCancelled()
+        recorder.finish(_output_tokens(usage, "".join(parts), input_model))
+    except Exception as e:
+        recorder.fail(e)
+        raise
+    finally:
+        reservation.settle(_actual_tokens(usage, input_tokens, "".join(parts), input_model))
+
+
+async def _stream_from_async(
+        endpoint: Endpoint,
+        input_text: str,
+        input_model: str,
+        prompt: str,
+        input_top_p: float,
+        input_temperature: float,
+        lane: str,
+        session: Optional[str],
+        deadline: Optional[float],
+        parts: List[str],
+) -> AsyncIterator[str]:
+    """`_stream_from` 的异步版本。"""
+    client = get_endpoint_async_client(endpoint)
+    input_tokens, estimate = estimate_request_tokens(input_model, prompt, input_text)
+    reservation = reserve_request(input_model, estimate, endpoint)
+    await reservation.wait_async(deadline)
+
+    recorder = get_metrics().request(input_model, endpoint.supplier)
+    usage = None
+    try:
+        async with get_scheduler().slot_async(input_model, lane, session, deadline) as probe:
+            recorder.dispatch(probe.queue_wait)
+            completion = await client.chat.completions.create(
+                model=input_model,
+                messages=_messages(prompt, input_text),
+                top_p=input_top_p,
+                temperature=input_temperature,
+                max_tokens=model_dict[input_model]["max_tokens"],
+                stream=True,
+                **_stream_kwargs(),
+                **_deadline_kwargs(deadline),
+            )
+
+            async with completion:
+                async for chunk in completion:
+                    probe.first_token()
+                    remaining(deadline)
+                    usage = getattr(chunk, "usage", None) or usage
+                    if not chunk.choices:
+                        continue
+                    content = chunk.choices[0].delta.content or ""
+                    if content:
+                        recorder.chunk()
+                    parts.append(content)
+                    yield content
+        recorder.finish(_output_tokens(usage, "".join(parts), input_model))
+    except Exception as e:
+        recorder.fail(e)
+        raise
+    finally:
+        reservation.settle(_actual_tokens(usage, input_tokens, "".join(parts), input_model))
 
 
 def chat_llm(
@@ -9,43 +313,64 @@ def chat_llm(
         prompt: Optional[str],
         input_top_p: float = 0.7,
         input_temperature: float = 0.9,
+        use_cache: bool = False,
+        lane: str = LANE_INTERACTIVE,
+        session: Optional[str] = None,
+        deadline: Optional[float] = None,
+        retry: bool = True,
 ) -> str:
     """
     非流式单次对话接口：与 OpenAI 兼容服务交互，返回完整文本。
 
+    请求经模型的端点池路由（见 `tool.endpoint_pool`）；端点因鉴权、限流、5xx 或网络错误失败时，
+    立即改投其他健康端点，各端点均失败时按 `retry_config` 退避重试。
+
     Args:
         input_text (str): 用户输入文本。
         input_model (str): 模型名称，对应 `model_dict` 的键。
         prompt (Optional[str]): 系统提示词；若为空则使用默认助手提示词。
         input_top_p (float): nucleus sampling 参数，范围 [0, 1]。
         input_temperature (float): 输出多样性温度，范围 [0, 1]。
+        use_cache (bool): 是否读取响应缓存；默认 False，交互请求每次重新采样，批量路径显式开启。
+            为 False 时强制请求上游并以新结果刷新缓存。
+        lane (str): 调度优先级通道，交互请求为 `LANE_INTERACTIVE`，批量请求为 `LANE_BATCH`。
+        session (Optional[str]): 会话标识，同一通道内各会话轮转派发。
+        deadline (Optional[float]): 截止时间（`time.monotonic()`），覆盖限额等待、排队与请求全过程；
+            超时抛出 `DeadlineExceeded`。
+        retry (bool): 是否按 `retry_config` 重试可重试错误（SDK 内部重试已关闭）；自带重试循环的批量路径置为 False。
 
     Returns:
         str: 模型返回的完整文本内容。
     """
-    model_supplier = model_dict[input_model]["supplier"]
-
-    client = OpenAI(
-        api_key=supplier_dict[model_supplier]["api"],
-        base_url=supplier_dict[model_supplier]["url"],
-    )
+    cache = get_response_cache()
+    cache_key = make_cache_key(input_model, prompt, input_text, input_top_p, input_temperature)
+    if cache and use_cache:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
 
     if not prompt:
         prompt = "You are a helpful assistant."
 
-    completion = client.chat.completions.create(
-        model=input_model,
-        messages=[
-            {"role": "system", "content": prompt},
-            {"role": "user", "content": input_text},
-        ],
-        top_p=input_top_p,
-        temperature=input_temperature,
-        max_tokens=model_dict[input_model]["max_tokens"],
-        stream=False,
-    )
+    pool = get_endpoint_pool(input_model)
+    tried: Set[str] = set()
+    state = RetryState(deadline) if retry else None
+    while True:
+        try:
+            with pool.use(tried) as endpoint:
+                tried.add(endpoint.id)
+                result = _complete_from(endpoint, input_text, input_model, prompt, input_top_p,
+                                        input_temperature, lane, session, deadline)
+            break
+        except Exception as e:
+            delay = _next_attempt(pool, e, tried, state)
+            if delay is None:
+                raise
+            time.sleep(delay)
 
-    return str(completion.choices[0].message.content)
+    if cache:
+        cache.put(cache_key, result)
+    return result
 
 
 def chat_llm_stream(
@@ -54,41 +379,196 @@ def chat_llm_stream(
         prompt: Optional[str],
         input_top_p: float = 0.7,
         input_temperature: float = 0.9,
+        use_cache: bool = False,
+        lane: str = LANE_INTERACTIVE,
+        session: Optional[str] = None,
+        deadline: Optional[float] = None,
+        coalesce: bool = True,
+        history: Optional[List[Dict[str, str]]] = None,
+        history_tokens: int = 0,
+        handle: Optional[StreamHandle] = None,
+        retry: bool = True,
 ) -> Iterator[str]:
     """
     流式对话接口：以增量方式返回模型输出，适合 UI 实时展示。
 
+    请求经模型的端点池路由；尚未产出内容前端点失败时改投其他健康端点，各端点均失败时按 `retry_config`
+    退避重试，已开始输出后的失败直接抛出。
+    未命中缓存且相同请求正在进行时，加入该请求共享其输出（先回放已产出的部分），不再单独请求上游。
+
     Args:
         input_text (str): 用户输入文本。
         input_model (str): 模型名称。
         prompt (Optional[str]): 系统提示词；若为空则使用默认助手提示词。
         input_top_p (float): nucleus sampling 参数。
         input_temperature (float): 输出多样性温度。
+        use_cache (bool): 是否读取响应缓存；命中时以小块快速回放。默认 False，交互请求每次重新采样，
+            批量路径显式开启。
+        lane (str): 调度优先级通道。
+        session (Optional[str]): 会话标识。
+        deadline (Optional[float]): 截止时间，流式输出过程中超时同样中止。
+        coalesce (bool): 是否与在途的相同请求合并；对冲副本需独立请求上游，应置为 False。
+        history (Optional[List[Dict[str, str]]]): 多轮对话的历史消息，置于系统提示词与本轮输入之间，
+            见 `tool.conversation`。
+        history_tokens (int): 历史消息的 token 数，由调用方按轮缓存提供，用于限额预估而无需重新计数。
+        handle (Optional[StreamHandle]): 中止句柄，供其他线程关闭进行中的请求（如对冲的落败一路）；
+            提供时不与在途请求合并，中止后抛出 `StreamCancelled`。
+        retry (bool): 尚未产出内容前是否重试，语义同 `chat_llm`。
 
     Yields:
         str: 模型返回的增量文本内容。
     """
-    model_supplier = model_dict[input_model]["supplier"]
+    cache = get_response_cache()
+    cache_key = make_cache_key(input_model, prompt, input_text, input_top_p, input_temperature, history)
+    if cache and use_cache:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            yield from replay_stream(cached)
+            return
+
+    if not prompt:
+        prompt = "You are a helpful assistant."
 
-    client = OpenAI(
-        api_key=supplier_dict[model_supplier]["api"],
-        base_url=supplier_dict[model_supplier]["url"],
-    )
+    def upstream() -> Iterator[str]:
+        return _stream_upstream(cache_key, input_text, input_model, prompt, input_top_p, input_temperature,
+                                lane, session, deadline, history, history_tokens, handle, retry)
+
+    # 相同请求同时在途时共享同一个上游流，见 `tool.singleflight`
+    singleflight = get_singleflight() if coalesce and handle is None else None
+    if singleflight:
+        yield from singleflight.stream(cache_key, input_model, deadline, upstream)
+    else:
+        yield from upstream()
+
+
+def _stream_upstream(
+        cache_key: str,
+        input_text: str,
+        input_model: str,
+        prompt: str,
+        input_top_p: float,
+        input_temperature: float,
+        lane: str,
+        session: Optional[str],
+        deadline: Optional[float],
+        history: Optional[List[Dict[str, str]]] = None,
+        history_tokens: int = 0,
+        handle: Optional[StreamHandle] = None,
+        retry: bool = True,
+) -> Iterator[str]:
+    """经端点池发起流式请求：尚未产出内容前失败时改投其他端点或退避重试，完整结束后写入缓存。"""
+    pool = get_endpoint_pool(input_model)
+    tried: Set[str] = set()
+    state = RetryState(deadline) if retry else None
+    parts: List[str] = []
+    while True:
+        try:
+            with pool.use(tried) as endpoint:
+                tried.add(endpoint.id)
+                yield from _stream_from(endpoint, input_text, input_model, prompt, input_top_p,
+                                        input_temperature, lane, session, deadline, parts,
+                                        history, history_tokens, handle)
+            break
+        except Exception as e:
+            delay = None if parts else _next_attempt(pool, e, tried, state)
+            if delay is None:
+                raise
+            time.sleep(delay)
+
+    # 仅在流完整结束后写入缓存，中途失败或被中断的输出不会被缓存
+    cache = get_response_cache()
+    if cache:
+        cache.put(cache_key, "".join(parts))
+
+
+async def chat_llm_stream_async(
+        input_text: str,
+        input_model: str,
+        prompt: Optional[str],
+        input_top_p: float = 0.7,
+        input_temperature: float = 0.9,
+        use_cache: bool = False,
+        lane: str = LANE_INTERACTIVE,
+        session: Optional[str] = None,
+        deadline: Optional[float] = None,
+        coalesce: bool = True,
+        retry: bool = True,
+) -> AsyncIterator[str]:
+    """
+    异步流式对话接口：与 `chat_llm_stream` 语义一致，需在异步引擎的事件循环中调用。
+
+    Args:
+        input_text (str): 用户输入文本。
+        input_model (str): 模型名称。
+        prompt (Optional[str]): 系统提示词；若为空则使用默认助手提示词。
+        input_top_p (float): nucleus sampling 参数。
+        input_temperature (float): 输出多样性温度。
+        use_cache (bool): 是否读取响应缓存，语义同 `chat_llm_stream`。
+        lane (str): 调度优先级通道。
+        session (Optional[str]): 会话标识。
+        deadline (Optional[float]): 截止时间，流式输出过程中超时同样中止。
+        coalesce (bool): 是否与在途的相同请求合并；对冲副本需独立请求上游，应置为 False。
+        retry (bool): 尚未产出内容前是否重试，语义同 `chat_llm`。
+
+    Yields:
+        str: 模型返回的增量文本内容。
+    """
+    cache = get_response_cache()
+    cache_key = make_cache_key(input_model, prompt, input_text, input_top_p, input_temperature)
+    if cache and use_cache:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            for piece in replay_stream(cached):
+                yield piece
+            return
 
     if not prompt:
         prompt = "You are a helpful assistant."
 
-    completion = client.chat.completions.create(
-        model=input_model,
-        messages=[
-            {"role": "system", "content": prompt},
-            {"role": "user", "content": input_text},
-        ],
-        top_p=input_top_p,
-        temperature=input_temperature,
-        max_tokens=model_dict[input_model]["max_tokens"],
-        stream=True,
-    )
-
-    for chunk in completion:
-        yield chunk.choices[0].delta.content or ""
+    def upstream() -> AsyncIterator[str]:
+        return _stream_upstream_async(cache_key, input_text, input_model, prompt, input_top_p,
+                                      input_temperature, lane, session, deadline, retry)
+
+    singleflight = get_singleflight() if coalesce else None
+    stream = singleflight.stream_async(cache_key, input_model, deadline, upstream) if singleflight else upstream()
+    async with aclosing(stream):
+        async for content in stream:
+            yield content
+
+
+async def _stream_upstream_async(
+        cache_key: str,
+        input_text: str,
+        input_model: str,
+        prompt: str,
+        input_top_p: float,
+        input_temperature: float,
+        lane: str,
+        session: Optional[str],
+        deadline: Optional[float],
+        retry: bool = True,
+) -> AsyncIterator[str]:
+    """`_stream_upstream` 的异步版本。"""
+    pool = get_endpoint_pool(input_model)
+    tried: Set[str] = set()
+    state = RetryState(deadline) if retry else None
+    parts: List[str] = []
+    while True:
+        try:
+            with pool.use(tried) as endpoint:
+                tried.add(endpoint.id)
+                # 显式关闭内层生成器，确保取消或提前退出时及时归还槽位与连接
+                async with aclosing(_stream_from_async(endpoint, input_text, input_model, prompt, input_top_p,
+                                                       input_temperature, lane, session, deadline, parts)) as stream:
+                    async for content in stream:
+                        yield content
+            break
+        except Exception as e:
+            delay = None if parts else _next_attempt(pool, e, tried, state)
+            if delay is None:
+                raise
+            await asyncio.sleep(delay)
+
+    cache = get_response_cache()
+    if cache:
+        cache.put(cache_key, "".join(parts))
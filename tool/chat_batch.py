@@ -1,132 +1,961 @@
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import inspect
 import queue
+import threading
 import time
-from typing import Callable, Dict, Optional
+from contextlib import nullcontext
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, Optional, Sized
+
 from config.model_config import model_dict
+from config.runtime_config import packing_config, retry_config
+from tool.chat import StreamHandle, chat_llm_stream, chat_llm_stream_async
+from tool.client_pool import run_coroutine
+from tool.concurrency import get_limiter, resolve_max_concurrent
+from tool.dispatch import POLICY_FIFO, CostEstimator, DispatchQueue, order_items, resolve_policy
+from tool.hedge import Hedger, HedgeStats, make_hedger
+from tool.packing import PackDemux, Packer, make_packer, pack_items, parse_packed
+from tool.retry import RetryState, RetryStats, item_deadline
+from tool.scheduler import LANE_BATCH, get_scheduler
+from tool.job_journal import JobJournal, get_job_journal
+from tool.metrics import get_metrics
+
+
+def _progress_payload(total: int, processed: int, runtime: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """构造进度负载；`runtime` 为运行时状态（如当前并发 `concurrency` 与平均排队时长 `queue_wait`），可省略。"""
+    payload = {
+        "total": total,
+        "processed": processed,
+    }
+    if runtime:
+        payload.update(runtime)
+    return payload
+
+
+def _runtime_status(input_model: str, max_concurrent: int, stats: Optional[RetryStats] = None,
+                    hedger: Optional[Hedger] = None, packer: Optional[Packer] = None) -> Dict[str, Any]:
+    """
+    批量任务的运行时状态。
+
+    Args:
+        input_model (str): 模型名称。
+        max_concurrent (int): 本任务的并发数。
+        stats (Optional[RetryStats]): 本任务的重试统计。
+        hedger (Optional[Hedger]): 本任务的对冲器。
+        packer (Optional[Packer]): 本任务的打包器。
+
+    Returns:
+        Dict[str, Any]: `concurrency` 为共享自适应上限与任务并发数的较小者，`queue_wait` 为批量通道平均排队时长（秒），
+        `retries`/`failures` 为按错误类别的重试与最终失败次数，启用对冲时 `hedges` 为对冲统计，
+        启用打包时 `packing` 为打包统计，`metrics` 为该模型最近请求的 TTFT p50/p95 与聚合输出速率。
+    """
+    status = {
+        "concurrency": min(get_limiter(input_model).limit, max_concurrent),
+        "queue_wait": get_scheduler().queue_wait(input_model, LANE_BATCH),
+        "metrics": get_metrics().summary(input_model),
+    }
+    if stats:
+        status.update(stats.snapshot())
+    if hedger:
+        status.update(hedger.stats.snapshot())
+    if packer:
+        status.update(packer.stats.snapshot())
+    return status
 
-from tool.chat import chat_llm_stream
 
+def _job_deadline(job_timeout: Optional[float]) -> Optional[float]:
+    """任务截止时间（`time.monotonic()`）；`job_timeout` 为 None 时取 `retry_config`，0 表示不限。"""
+    if job_timeout is None:
+        job_timeout = retry_config["job_timeout"]
+    return time.monotonic() + job_timeout if job_timeout else None
 
-def _notify_progress(on_progress: Optional[Callable[[Dict[str, int]], None]],
-                     total: int, processed: int) -> None:
+
+def _item_timeout(item_timeout: Optional[float]) -> Optional[float]:
+    """单项总时限；为 None 时取 `retry_config`，0 表示不限。"""
+    return retry_config["item_timeout"] if item_timeout is None else item_timeout
+
+
+def _notify_progress(on_progress: Optional[Callable[[Dict[str, Any]], None]],
+                     total: int, processed: int, runtime: Optional[Dict[str, Any]] = None) -> None:
     """集中式进度通知：统一格式减少重复代码。"""
     if on_progress:
-        on_progress({
-            "total": total,
-            "processed": processed,
-        })
+        on_progress(_progress_payload(total, processed, runtime))
+
+
+def _item_payload(index: int, text: str, flag: bool, replace: bool, elapsed: Optional[float]) -> Dict[str, object]:
+    """构造单项回调负载；`elapsed` 仅在完成态通知中提供。"""
+    payload: Dict[str, object] = {
+        "index": index,
+        "text": text,
+        "flag": flag,
+        "replace": replace,
+    }
+    if elapsed is not None:
+        payload["elapsed"] = elapsed
+    return payload
 
 
 def _notify_item(on_item: Optional[Callable[[Dict[str, object]], None]],
-                 index: int, text: str, flag: bool = False) -> None:
-    """集中式单项通知：统一回调负载减少重复代码。"""
+                 index: int, text: str, flag: bool = False, replace: bool = True,
+                 elapsed: Optional[float] = None) -> None:
+    """
+    集中式单项通知：统一回调负载减少重复代码。
+
+    `replace` 为 False 时 `text` 仅为本次新增的增量，调用方自行追加；
+    为 True 时 `text` 为该项的完整内容（完成、失败或重试重置）。
+    完成态通知附带 `elapsed`：该项自开始处理至完成的秒数（含重试与等待），从日志恢复的项为 0。
+    """
+    if on_item:
+        on_item(_item_payload(index, text, flag, replace, elapsed))
+
+
+async def _maybe_await(result: Any) -> None:
+    """兼容同步与异步回调：若回调返回可等待对象则等待其完成。"""
+    if inspect.isawaitable(result):
+        await result
+
+
+async def _notify_progress_async(on_progress: Optional[Callable[[Dict[str, Any]], Any]],
+                                 total: int, processed: int, runtime: Optional[Dict[str, Any]] = None) -> None:
+    """异步版进度通知，负载格式与 `_notify_progress` 一致。"""
+    if on_progress:
+        await _maybe_await(on_progress(_progress_payload(total, processed, runtime)))
+
+
+async def _notify_item_async(on_item: Optional[Callable[[Dict[str, object]], Any]],
+                             index: int, text: str, flag: bool = False, replace: bool = True,
+                             elapsed: Optional[float] = None) -> None:
+    """异步版单项通知，负载格式与 `_notify_item` 一致。"""
     if on_item:
-        on_item({
-            "index": index,
-            "text": text,
-            "flag": flag,
-        })
+        await _maybe_await(on_item(_item_payload(index, text, flag, replace, elapsed)))
+
+
+def clean_result(text: str) -> str:
+    """
+    清理单项结果：去除空行。
+
+    Args:
+        text (str): 单项输出文本。
+
+    Returns:
+        str: 去除空行后的文本。
+    """
+    return '\n'.join(line for line in text.split('\n') if line.strip())
+
+
+def _merge_results(results: list[tuple[int, str]]) -> str:
+    """
+    按索引排序并合并结果：各项在完成时已去除空行，此处只以双换行连接。
+
+    Args:
+        results (list[tuple[int, str]]): (索引, 文本) 结果列表，顺序任意。
+
+    Returns:
+        str: 按原始顺序合并的结果文本。
+    """
+    results.sort(key=lambda x: x[0])
+    return "\n\n".join(result[1] for result in results)
+
+
+def _record_retry(input_model: str, retry: RetryState) -> None:
+    """将一次重试计入进程级指标。"""
+    get_metrics().record_retry(input_model, model_dict[input_model]["supplier"], retry.kind)
+
+
+def _stream_item_with_retry(
+        item: str,
+        index: int,
+        input_model: str,
+        prompt: str,
+        input_top_p: float,
+        input_temperature: float,
+        on_item: Optional[Callable[[Dict[str, object]], None]] = None,
+        use_cache: bool = True,
+        session: Optional[str] = None,
+        item_timeout: Optional[float] = None,
+        job_deadline: Optional[float] = None,
+        stats: Optional[RetryStats] = None,
+        hedger: Optional[Hedger] = None,
+) -> tuple[str, bool]:
+    """
+    带重试机制的单个文本处理函数（流式），过程中通过 `on_item` 推送增量。
+
+    重试按错误类别决定（见 `tool.retry.RetryState`）：鉴权与请求无效错误立即失败，429 遵循 Retry-After，
+    其余错误去相关抖动退避；单项自开始处理起受 `item_timeout` 与任务截止时间共同约束。
+
+    Args:
+        item (str): 单条文本输入。
+        index (int): 文本在原始列表中的索引，用于回调定位。
+        input_model (str): 模型名称。
+        prompt (str): 系统提示词。
+        input_top_p (float): nucleus sampling 参数。
+        input_temperature (float): 输出多样性温度。
+        on_item (Optional[Callable[[Dict[str, object]], None]]): 单项回调。
+        use_cache (bool): 是否读取响应缓存。
+        session (Optional[str]): 发起任务的会话标识，用于调度器的会话间公平轮转。
+        item_timeout (Optional[float]): 单项总时限（秒，含排队、重试与等待），None 或 0 表示不限。
+        job_deadline (Optional[float]): 任务截止时间（`time.monotonic()`），None 表示不限。
+        stats (Optional[RetryStats]): 任务级重试统计。
+        hedger (Optional[Hedger]): 任务级对冲器；提供时每次尝试以对冲方式执行。
+
+    Returns:
+        tuple[str, bool]: (输出文本或错误信息, 是否最终失败)。
+    """
+    deadline = item_deadline(item_timeout, job_deadline)
+    retry = RetryState(deadline, stats)
+
+    def start_stream(model: str, handle: Optional[StreamHandle] = None) -> Iterator[str]:
+        return chat_llm_stream(
+            item,
+            model,
+            prompt,
+            input_top_p,
+            input_temperature,
+            use_cache=use_cache,
+            lane=LANE_BATCH,
+            session=session,
+            deadline=deadline,
+            # 对冲的两路需各自请求上游，不能合并为同一个流
+            coalesce=hedger is None,
+            handle=handle,
+            # 由本函数统一重试
+            retry=False,
+        )
+
+    def push(chunk: str) -> None:
+        # 仅推送本次增量，避免重复发送全文
+        _notify_item(on_item, index, chunk, flag=False, replace=False)
+
+    if hedger:
+        hedger.begin_item()
+    while True:
+        try:
+            if retry.attempt > 0:
+                # 丢弃上一次失败尝试已推送的部分输出
+                _notify_item(on_item, index, "", flag=False)
+            if hedger:
+                return hedger.run(start_stream, on_delta=push), False
+            parts: list[str] = []
+            for chunk in start_stream(input_model):
+                if chunk:
+                    parts.append(chunk)
+                    push(chunk)
+            return "".join(parts), False
+        except Exception as e:
+            delay = retry.next_delay(e)
+            if delay is None:
+                return f"错误: {str(e)}", True
+            _record_retry(input_model, retry)
+            time.sleep(delay)
+
+
+async def _stream_item_with_retry_async(
+        item: str,
+        index: int,
+        input_model: str,
+        prompt: str,
+        input_top_p: float,
+        input_temperature: float,
+        on_item: Optional[Callable[[Dict[str, object]], Any]] = None,
+        use_cache: bool = True,
+        session: Optional[str] = None,
+        item_timeout: Optional[float] = None,
+        job_deadline: Optional[float] = None,
+        stats: Optional[RetryStats] = None,
+        hedger: Optional[Hedger] = None,
+) -> tuple[str, bool]:
+    """`_stream_item_with_retry` 的协程版本，参数与重试策略相同。"""
+    deadline = item_deadline(item_timeout, job_deadline)
+    retry = RetryState(deadline, stats)
+
+    def start_stream(model: str) -> AsyncIterator[str]:
+        return chat_llm_stream_async(
+            item,
+            model,
+            prompt,
+            input_top_p,
+            input_temperature,
+            use_cache=use_cache,
+            lane=LANE_BATCH,
+            session=session,
+            deadline=deadline,
+            coalesce=hedger is None,
+            retry=False,
+        )
+
+    async def push(chunk: str) -> None:
+        await _notify_item_async(on_item, index, chunk, flag=False, replace=False)
+
+    if hedger:
+        hedger.begin_item()
+    while True:
+        try:
+            if retry.attempt > 0:
+                await _notify_item_async(on_item, index, "", flag=False)
+            if hedger:
+                return await hedger.run_async(start_stream, on_delta=push), False
+            parts: list[str] = []
+            async for chunk in start_stream(input_model):
+                if chunk:
+                    parts.append(chunk)
+                    await push(chunk)
+            return "".join(parts), False
+        except Exception as e:
+            delay = retry.next_delay(e)
+            if delay is None:
+                return f"错误: {str(e)}", True
+            _record_retry(input_model, retry)
+            await asyncio.sleep(delay)
+
+
+def _begin_journal(job_id: Optional[str], input_model: str, prompt: str,
+                   input_top_p: float, input_temperature: float) -> Optional[JobJournal]:
+    """登记任务并返回任务日志；未提供任务 ID 或日志未启用时返回 None。"""
+    journal = get_job_journal() if job_id else None
+    if journal:
+        journal.begin_job(job_id, input_model, prompt, input_top_p, input_temperature)
+    return journal
 
 
 def chat_llm_batch(
-        text_list: list[str],
+        text_list: Iterable[str],
         input_model: str,
         prompt: str,
         input_top_p: float = 0.7,
         input_temperature: float = 0.9,
         on_progress: Optional[Callable[[Dict[str, int]], None]] = None,
         on_item: Optional[Callable[[Dict[str, object]], None]] = None,
-        max_concurrent: int = 10,
+        max_concurrent: Optional[int] = None,
+        use_cache: bool = True,
+        job_id: Optional[str] = None,
+        session: Optional[str] = None,
+        item_timeout: Optional[float] = None,
+        job_timeout: Optional[float] = None,
+        hedge: Optional[bool] = None,
+        hedge_model: Optional[str] = None,
+        pack: bool = False,
+        policy: Optional[str] = None,
 ) -> str:
     """
     并发批量对话，将多条文本输入分别与模型交互并汇总结果。
 
     Args:
-        text_list (list[str]): 需要处理的文本列表，每项作为一次对话的输入。
+        text_list (Iterable[str]): 需要处理的文本列表，每项作为一次对话的输入；也可为生成器
+            （如 `iter_text_split`），边产出边提交，此时进度中的总数随提交逐步增长。
         input_model (str): 模型名称，需存在于 `model_dict` 中。
         prompt (str): 系统提示词，用于指导模型行为。
         input_top_p (float): nucleus sampling 参数，范围 [0, 1]。
         input_temperature (float): 输出多样性温度，范围 [0, 1]。
-        on_progress (Optional[Callable[[Dict[str, int]], None]]): 进度回调，仅包含总数与已处理。
-        on_item (Optional[Callable[[Dict[str, object]], None]]): 单项回调，包含索引、文本、标记 `flag`。
-        max_concurrent (int): 并发线程数量上限（将进行有效性与上限校验）。
+        on_progress (Optional[Callable[[Dict[str, int]], None]]): 进度回调，包含总数、已处理、当前自适应
+            并发上限 `concurrency`、批量通道平均排队时长 `queue_wait`（秒），以及按错误类别的重试次数
+            `retries` 与最终失败次数 `failures`。
+        on_item (Optional[Callable[[Dict[str, object]], None]]): 单项回调，包含索引、文本、标记 `flag`
+            与 `replace`；流式过程中仅推送增量（`replace=False`），完成时推送去除空行后的完整文本及该项耗时 `elapsed`（秒）。
+        max_concurrent (Optional[int]): 本任务的并发线程数，以模型配置的 `max_concurrent` 为上限，默认取配置值；
+            实际同时进行的请求数还受 (供应商, 模型) 共享的自适应限制器约束。
+        use_cache (bool): 是否读取响应缓存；命中的项以流式回放，不消耗 token。
+        job_id (Optional[str]): 任务 ID；提供时逐项写入任务日志，日志中已完成的项直接恢复而不再调度
+            （`use_cache` 为 False 时重新请求），
+            最终结果从日志按序重建。
+        session (Optional[str]): 发起任务的会话标识；各项以批量优先级经全局调度器派发，同优先级的会话间轮转。
+        item_timeout (Optional[float]): 单项总时限（秒，含排队、重试与等待），默认取 `retry_config`，0 表示不限。
+        job_timeout (Optional[float]): 任务整体时限（秒），默认取 `retry_config`，0 表示不限；
+            到期后未完成的项记为失败，可续跑。
+        hedge (Optional[bool]): 是否对长尾项发起对冲请求（见 `tool.hedge.Hedger`），默认取 `hedge_config`；
+            对冲统计以 `hedges` 随进度推送。
+        hedge_model (Optional[str]): 对冲请求使用的备用模型，默认取 `hedge_config`，均未设置时使用原模型。
+        pack (bool): 是否将连续的短条目按 token 预算打包为一次请求（见 `tool.packing`），适合大量单行的列表任务；
+            输出按编号拆回各项，缺失或格式错误的项回退为单独请求，`on_item` 与进度仍逐项推送，打包统计以 `packing` 随进度推送。
+        policy (Optional[str]): 派发策略（见 `tool.dispatch`），默认取 `dispatch_config`："fifo" 按输入顺序，
+            "ljf" 按预估开销（输入 token + 从以往运行学到的预测输出 token）从大到小派发以缩短总耗时，
+            "sjf" 从小到大派发；结果顺序不受影响。列表输入整体排序，生成器输入在窗口内排序。
 
     Returns:
-        str: 按原始顺序合并的所有结果文本，使用双换行分隔。
+        str: 按原始顺序合并的所有结果文本，使用双换行分隔；需要边完成边消费时使用 `iter_chat_llm_batch`。
     """
-    result_queue: queue.Queue[tuple[int, str]] = queue.Queue()
-    completed_count = 0
-    failed_count = 0
-    total_tasks = len(text_list)
-    max_concurrent = model_dict.get(input_model).get("max_concurrent")
+    results: Dict[int, str] = {}
+    for index, text, _ in _iter_batch_results(
+            text_list,
+            input_model,
+            prompt,
+            input_top_p,
+            input_temperature,
+            on_progress=on_progress,
+            on_item=on_item,
+            max_concurrent=max_concurrent,
+            use_cache=use_cache,
+            job_id=job_id,
+            session=session,
+            item_timeout=item_timeout,
+            job_timeout=job_timeout,
+            hedge=hedge,
+            hedge_model=hedge_model,
+            pack=pack,
+            policy=policy,
+            ordered=False,
+    ):
+        results[index] = text
+    return _merge_results(list(results.items()))
 
-    def process_item_with_retry(item: str, index: int, max_retries: int = 3, retry_delay: int = 1) -> None:
-        """
-        带重试机制的单个文本处理函数（流式）。
 
-        Args:
-            item (str): 单条文本输入。
-            index (int): 文本在原始列表中的索引，用于结果排序。
-            max_retries (int): 最大重试次数。
-            retry_delay (int): 初始重试延迟（秒），采用指数退避。
-        """
+def iter_chat_llm_batch(
+        text_list: Iterable[str],
+        input_model: str,
+        prompt: str,
+        input_top_p: float = 0.7,
+        input_temperature: float = 0.9,
+        ordered: bool = True,
+        on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+        on_item: Optional[Callable[[Dict[str, object]], None]] = None,
+        max_concurrent: Optional[int] = None,
+        use_cache: bool = True,
+        window: Optional[int] = None,
+        job_id: Optional[str] = None,
+        session: Optional[str] = None,
+        item_timeout: Optional[float] = None,
+        job_timeout: Optional[float] = None,
+        stats: Optional[RetryStats] = None,
+        hedge: Optional[bool] = None,
+        hedge_model: Optional[str] = None,
+        hedge_stats: Optional[HedgeStats] = None,
+        pack: bool = False,
+        policy: Optional[str] = None,
+) -> Iterator[tuple[int, str, bool]]:
+    """
+    流式批量对话：与 `chat_llm_batch` 相同的执行方式，但每项完成即产出，无需等待整个任务结束。
 
-        nonlocal completed_count, failed_count
+    默认按输入顺序产出，已完成的有序前缀立即产出；`ordered=False` 时按完成顺序产出。
+    已提交未产出的项不超过 `window`，调用方可边消费边写出，内存占用由并发度而非输入规模决定。
 
-        for attempt in range(max_retries):
-            try:
-                accum_text = ""
-                # 流式获取增量内容，并实时刷新输出/回调
-                for chunk in chat_llm_stream(
-                        item,
-                        input_model,
-                        prompt,
-                        input_top_p,
-                        input_temperature,
-                ):
-                    if chunk:
-                        accum_text += chunk
-                        _notify_item(on_item, index, accum_text, flag=False)
-
-                # 单项完成，入队并刷新进度
-                result_queue.put((index, accum_text))
+    Args:
+        text_list (Iterable[str]): 输入文本序列，可为生成器。
+        input_model (str): 模型名称，需存在于 `model_dict` 中。
+        prompt (str): 系统提示词。
+        input_top_p (float): nucleus sampling 参数，范围 [0, 1]。
+        input_temperature (float): 输出多样性温度，范围 [0, 1]。
+        ordered (bool): 是否按输入顺序产出。
+        on_progress (Optional[Callable[[Dict[str, Any]], None]]): 进度回调，负载同 `chat_llm_batch`。
+        on_item (Optional[Callable[[Dict[str, object]], None]]): 单项回调，负载同 `chat_llm_batch`。
+        max_concurrent (Optional[int]): 本任务的并发线程数，语义同 `chat_llm_batch`。
+        use_cache (bool): 是否读取响应缓存。
+        window (Optional[int]): 已提交未产出项的上限，默认并发数的 2 倍。
+        job_id (Optional[str]): 任务 ID，语义同 `chat_llm_batch`；日志中已完成的项直接产出。
+        session (Optional[str]): 会话标识，语义同 `chat_llm_batch`。
+        item_timeout (Optional[float]): 单项总时限，语义同 `chat_llm_batch`。
+        job_timeout (Optional[float]): 整体时限，自开始迭代起计，语义同 `chat_llm_batch`。
+        stats (Optional[RetryStats]): 重试统计，调用方传入以在迭代期间读取按错误类别的重试与失败次数。
+        hedge (Optional[bool]): 是否启用对冲，语义同 `chat_llm_batch`。
+        hedge_model (Optional[str]): 对冲使用的备用模型，语义同 `chat_llm_batch`。
+        hedge_stats (Optional[HedgeStats]): 对冲统计，调用方传入以在结束后读取对冲次数与估算节省的时长。
+        pack (bool): 是否打包短条目，语义同 `chat_llm_batch`。
+        policy (Optional[str]): 派发策略，语义同 `chat_llm_batch`；按输入顺序产出时，大项优先会推迟首项产出。
+
+    Yields:
+        tuple[int, str, bool]: (索引, 去除空行后的输出文本或错误信息, 是否失败)。
+    """
+    yield from _iter_batch_results(
+            text_list,
+            input_model,
+            prompt,
+            input_top_p,
+            input_temperature,
+            on_progress=on_progress,
+            on_item=on_item,
+            max_concurrent=max_concurrent,
+            use_cache=use_cache,
+            window=window,
+            job_id=job_id,
+            session=session,
+            item_timeout=item_timeout,
+            job_timeout=job_timeout,
+            stats=stats,
+            hedge=hedge,
+            hedge_model=hedge_model,
+            hedge_stats=hedge_stats,
+            pack=pack,
+            policy=policy,
+            ordered=ordered,
+    )
+
+
+def _iter_batch_results(
+        text_list: Iterable[str],
+        input_model: str,
+        prompt: str,
+        input_top_p: float = 0.7,
+        input_temperature: float = 0.9,
+        on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+        on_item: Optional[Callable[[Dict[str, object]], None]] = None,
+        max_concurrent: Optional[int] = None,
+        use_cache: bool = True,
+        window: Optional[int] = None,
+        job_id: Optional[str] = None,
+        session: Optional[str] = None,
+        item_timeout: Optional[float] = None,
+        job_timeout: Optional[float] = None,
+        stats: Optional[RetryStats] = None,
+        hedge: Optional[bool] = None,
+        hedge_model: Optional[str] = None,
+        hedge_stats: Optional[HedgeStats] = None,
+        pack: bool = False,
+        policy: Optional[str] = None,
+        ordered: bool = True,
+) -> Iterator[tuple[int, str, bool]]:
+    """
+    线程引擎：有界内存的批量执行，每项完成时去除空行并产出，`chat_llm_batch` 与 `iter_chat_llm_batch` 均基于此实现。
+
+    输入被惰性消费，已提交但尚未产出的项不超过 `window`。按输入顺序产出时，已完成的有序前缀立即产出；
+    按完成顺序产出时 `window` 即在途项上限，慢项不会阻塞后续项的提交。
+
+    Args:
+        text_list (Iterable[str]): 输入文本序列，可为生成器。
+        input_model (str): 模型名称。
+        prompt (str): 系统提示词。
+        input_top_p (float): nucleus sampling 参数。
+        input_temperature (float): 输出多样性温度。
+        on_progress (Optional[Callable[[Dict[str, Any]], None]]): 进度回调，负载同 `chat_llm_batch`。
+        on_item (Optional[Callable[[Dict[str, object]], None]]): 单项回调，完成态通知中的文本已去除空行。
+        max_concurrent (Optional[int]): 并发线程数，以模型配置为上限，默认取配置值。
+        use_cache (bool): 是否读取响应缓存。
+        window (Optional[int]): 已提交未产出项的上限，默认并发数的 2 倍，打包时再乘以 `packing_config["max_items"]`。
+        job_id (Optional[str]): 任务 ID，语义同 `chat_llm_batch`。
+        session (Optional[str]): 会话标识，语义同 `chat_llm_batch`。
+        item_timeout (Optional[float]): 单项总时限，语义同 `chat_llm_batch`。
+        job_timeout (Optional[float]): 整体时限，自开始迭代起计，语义同 `chat_llm_batch`。
+        stats (Optional[RetryStats]): 由调用方持有的重试统计，默认新建。
+        hedge (Optional[bool]): 是否启用对冲，语义同 `chat_llm_batch`。
+        hedge_model (Optional[str]): 对冲使用的备用模型，语义同 `chat_llm_batch`。
+        hedge_stats (Optional[HedgeStats]): 由调用方持有的对冲统计。
+        pack (bool): 是否打包短条目，语义同 `chat_llm_batch`；未满的打包组在输入耗尽、窗口已满或无其他在途工作时提交。
+        policy (Optional[str]): 派发策略，语义同 `chat_llm_batch`。
+        ordered (bool): 是否按输入顺序产出，False 时按完成顺序产出。
+
+    Yields:
+        tuple[int, str, bool]: (索引, 去除空行后的输出文本或错误信息, 是否失败)。
+    """
+    max_concurrent = resolve_max_concurrent(input_model, max_concurrent)
+    packer = make_packer(input_model, prompt, pack)
+    # 打包时每个并发请求承载一组条目，窗口随之放大
+    window = window or max_concurrent * 2 * (packing_config["max_items"] if packer else 1)
+    policy = resolve_policy(policy)
+    estimator = CostEstimator(input_model, prompt)
+    if policy != POLICY_FIFO and isinstance(text_list, Sized):
+        # 排序需看到全部输入：列表输入整体纳入窗口，生成器输入只在窗口内排序
+        window = max(window, len(text_list))
+    journal = _begin_journal(job_id, input_model, prompt, input_top_p, input_temperature)
+    item_timeout = _item_timeout(item_timeout)
+    job_deadline = _job_deadline(job_timeout)
+    if stats is None:
+        stats = RetryStats()
+    hedger = make_hedger(input_model, hedge, hedge_model, hedge_stats, max_concurrent)
+    # 单项结果；None 表示一个工作单元结束、可派发下一项
+    done_queue: queue.Queue[Optional[tuple[int, str, bool]]] = queue.Queue()
+    total_tasks = len(text_list) if isinstance(text_list, Sized) else 0
+    completed_count = 0
+    count_lock = threading.Lock()
+    dispatch_queue = DispatchQueue(policy)
+    running = 0
+
+    def runtime() -> Dict[str, Any]:
+        """本任务的运行时状态，随进度一同推送。"""
+        return _runtime_status(input_model, max_concurrent, stats, hedger, packer)
+
+    def finish_item(index: int, text: str, failed: bool, elapsed: float) -> None:
+        """登记单项结果：刷新进度、完成态通知，最后交给产出端。"""
+        nonlocal completed_count
+        try:
+            with count_lock:
                 completed_count += 1
-                _notify_progress(on_progress, total_tasks, completed_count)
-                # 最终完成态通知（兼容仅在完成时更新的使用场景）
-                _notify_item(on_item, index, accum_text, flag=False)
+                total, processed = total_tasks, completed_count
+            if on_progress:
+                _notify_progress(on_progress, total, processed, runtime())
+            # 最终完成态通知（兼容仅在完成时更新的使用场景）
+            _notify_item(on_item, index, text, flag=failed, elapsed=elapsed)
+        except Exception as e:
+            print(f"任务执行异常: {e}")
+        finally:
+            # 无论回调成败都必须回报，否则产出端将永远等待
+            done_queue.put((index, text, failed))
 
-                return
-            except Exception as e:
-                if attempt < max_retries - 1:
-                    time.sleep(retry_delay * (2 ** attempt))
+    def process_item(item: str, index: int) -> None:
+        """处理单项：先落盘原始输出，再去除空行并登记。"""
+        start = time.monotonic()
+        try:
+            text, failed = _stream_item_with_retry(
+                item, index, input_model, prompt, input_top_p, input_temperature,
+                on_item=on_item, use_cache=use_cache, session=session,
+                item_timeout=item_timeout, job_deadline=job_deadline, stats=stats, hedger=hedger,
+            )
+            if journal:
+                if failed:
+                    journal.fail_item(job_id, index, text)
                 else:
-                    result_queue.put((index, f"错误: {str(e)}"))
-                    completed_count += 1
-                    failed_count += 1
-                    _notify_progress(on_progress, total_tasks, completed_count)
-                    _notify_item(on_item, index, f"错误: {str(e)}", flag=True)
+                    journal.complete_item(job_id, index, text)
+            if not failed:
+                estimator.observe(item, text)
+        except Exception as e:
+            text, failed = f"错误: {str(e)}", True
+        finish_item(index, clean_result(text), failed, time.monotonic() - start)
+
+    def process_pack(group: list[tuple[int, str]]) -> None:
+        """处理一组打包条目：按编号拆分输出逐项登记，缺失或格式错误的项回退为单独请求。"""
+        start = time.monotonic()
+        packer.stats.record_pack(len(group))
+        demux = PackDemux(len(group))
+
+        def on_pack_delta(payload: Dict[str, object]) -> None:
+            # 将打包请求的增量按编号转发为各项的增量；重试时清空各项已推送的部分输出
+            if payload["replace"]:
+                demux.reset()
+                for index, _ in group:
+                    _notify_item(on_item, index, "", flag=False)
+                return
+            for position, delta in demux.feed(str(payload["text"])):
+                _notify_item(on_item, group[position][0], delta, flag=False, replace=False)
+
+        try:
+            text, failed = _stream_item_with_retry(
+                pack_items([item for _, item in group]), group[0][0], input_model, packer.prompt,
+                input_top_p, input_temperature, on_item=on_pack_delta if on_item else None, use_cache=use_cache,
+                session=session, item_timeout=item_timeout, job_deadline=job_deadline, stats=stats,
+            )
+        except Exception as e:
+            text, failed = f"错误: {str(e)}", True
+        parsed = {} if failed else parse_packed(text, len(group))
+        elapsed = time.monotonic() - start
+        for position, (index, item) in enumerate(group):
+            result = parsed.get(position)
+            if result is None:
+                packer.stats.record_fallback()
+                _notify_item(on_item, index, "", flag=False)
+                # 与其他项一样按策略排队并计入在途名额；本组结束时的唤醒会触发派发
+                dispatch_queue.push(cost(item), process_item, item, index)
+                continue
+            if journal:
+                journal.complete_item(job_id, index, result)
+            estimator.observe(item, result)
+            finish_item(index, clean_result(result), False, elapsed)
+
+    def cost(item: str) -> float:
+        """单项的预估开销，仅在需要排序时计算。"""
+        return estimator.cost(item) if policy != POLICY_FIFO else 0.0
+
+    def enqueue_group(group: list[tuple[int, str]]) -> None:
+        """将一组打包条目加入派发队列；只有一项时按单项请求。"""
+        if len(group) == 1:
+            dispatch_queue.push(cost(group[0][1]), process_item, group[0][1], group[0][0])
+        elif group:
+            dispatch_queue.push(sum(cost(item) for _, item in group), process_pack, group)
+
+    def run_work(fn: Callable[..., None], args: tuple) -> None:
+        """执行一个工作单元，结束后归还派发名额并唤醒产出端。"""
+        nonlocal running
+        try:
+            fn(*args)
+        finally:
+            with count_lock:
+                running -= 1
+            done_queue.put(None)
+
+    def dispatch() -> None:
+        """按策略从派发队列取出工作提交执行，在途工作单元不超过并发数，使排序在派发前尽量晚地决定。"""
+        nonlocal running
+        while True:
+            with count_lock:
+                if running >= max_concurrent:
+                    return
+                work = dispatch_queue.pop()
+                if work is None:
+                    return
+                running += 1
+            executor.submit(run_work, *work)
 
     # 初始化进度
-    _notify_progress(on_progress, total_tasks, completed_count)
+    if on_progress:
+        _notify_progress(on_progress, total_tasks, completed_count, runtime())
+
+    items = enumerate(text_list)
+    exhausted = False
+    submitted = 0
+    emitted = 0
+    next_emit = 0
+    ready: dict[int, tuple[str, bool]] = {}
+
+    # 退出时先等待工作线程，再等待对冲器中各路请求的线程
+    with hedger or nullcontext(), ThreadPoolExecutor(max_workers=max_concurrent) as executor:
+        while True:
+            # 在窗口内尽量多地提交：输入为生成器时，切分与执行并行进行
+            while not exhausted and submitted - emitted < window:
+                try:
+                    index, item = next(items)
+                except StopIteration:
+                    exhausted = True
+                    break
+                submitted += 1
+                with count_lock:
+                    total_tasks = max(total_tasks, index + 1)
+                restored = journal.restore_item(job_id, index, item) if journal else None
+                # 不使用缓存时强制重新请求，不从日志恢复
+                if restored is not None and use_cache:
+                    # 日志中已完成的项直接恢复，不再调度
+                    finish_item(index, clean_result(restored), False, 0.0)
+                    continue
+                tokens = packer.accepts(item) if packer else None
+                if tokens is None:
+                    dispatch_queue.push(cost(item), process_item, item, index)
+                    continue
+                for group in packer.add(index, item, tokens):
+                    enqueue_group(group)
+
+            if packer and packer.pending:
+                with count_lock:
+                    idle = not dispatch_queue and running == 0
+                # 输入耗尽、窗口已满或已无其他工作可完成时立即提交未满的一组，否则产出端可能永远等待
+                # （已完成但在等待更早索引的项仍占用窗口）
+                if exhausted or submitted - emitted >= window or idle:
+                    enqueue_group(packer.flush())
+            dispatch()
+            if exhausted and emitted == submitted:
+                break
 
-    with ThreadPoolExecutor(max_workers=max_concurrent) as executor:
-        futures = [executor.submit(process_item_with_retry, item, i)
-                   for i, item in enumerate(text_list)]
-        for future in as_completed(futures):
+            event = done_queue.get()
+            if event is None:
+                continue
+            index, text, failed = event
+            if not ordered:
+                emitted += 1
+                yield index, text, failed
+                continue
+            ready[index] = (text, failed)
+            # 产出已完成的有序前缀
+            while next_emit in ready:
+                text, failed = ready.pop(next_emit)
+                emitted += 1
+                yield next_emit, text, failed
+                next_emit += 1
+
+    estimator.save()
+    # 结束进度
+    if on_progress:
+        _notify_progress(on_progress, total_tasks, completed_count, runtime())
+    if journal:
+        journal.finish_job(job_id, total_tasks)
+
+
+async def chat_llm_batch_async(
+        text_list: Iterable[str],
+        input_model: str,
+        prompt: str,
+        input_top_p: float = 0.7,
+        input_temperature: float = 0.9,
+        on_progress: Optional[Callable[[Dict[str, int]], Any]] = None,
+        on_item: Optional[Callable[[Dict[str, object]], Any]] = None,
+        max_concurrent: Optional[int] = None,
+        use_cache: bool = True,
+        job_id: Optional[str] = None,
+        session: Optional[str] = None,
+        item_timeout: Optional[float] = None,
+        job_timeout: Optional[float] = None,
+        hedge: Optional[bool] = None,
+        hedge_model: Optional[str] = None,
+        policy: Optional[str] = None,
+) -> str:
+    """
+    异步并发批量对话：以协程代替线程，信号量限制同时进行的流式请求数量。
+
+    输入被惰性消费，已创建未完成的任务不超过并发数的 2 倍。回调可为普通函数或协程函数；
+    结果顺序与返回格式与 `chat_llm_batch` 完全一致，单项出现任何异常均记为该项失败。
+    需在 `tool.client_pool.get_event_loop()` 的事件循环中运行，同步代码请使用
+    `chat_llm_batch_asyncio`。
+
+    Args:
+        text_list (Iterable[str]): 需要处理的文本列表或生成器，语义同 `chat_llm_batch`。
+        input_model (str): 模型名称，需存在于 `model_dict` 中。
+        prompt (str): 系统提示词，用于指导模型行为。
+        input_top_p (float): nucleus sampling 参数，范围 [0, 1]。
+        input_temperature (float): 输出多样性温度，范围 [0, 1]。
+        on_progress (Optional[Callable[[Dict[str, int]], Any]]): 进度回调，负载同 `chat_llm_batch`。
+        on_item (Optional[Callable[[Dict[str, object]], Any]]): 单项回调，负载同 `chat_llm_batch`。
+        max_concurrent (Optional[int]): 本任务的并发请求数，语义同 `chat_llm_batch`。
+        use_cache (bool): 是否读取响应缓存。
+        job_id (Optional[str]): 任务 ID，语义同 `chat_llm_batch`。
+        session (Optional[str]): 会话标识，语义同 `chat_llm_batch`。
+        item_timeout (Optional[float]): 单项总时限，语义同 `chat_llm_batch`。
+        job_timeout (Optional[float]): 任务整体时限，语义同 `chat_llm_batch`。
+        hedge (Optional[bool]): 是否启用对冲，语义同 `chat_llm_batch`。
+        hedge_model (Optional[str]): 对冲使用的备用模型，语义同 `chat_llm_batch`。
+        policy (Optional[str]): 派发策略，语义同 `chat_llm_batch`；非 FIFO 时先读入全部输入再按预估开销排序创建任务。
+
+    Returns:
+        str: 按原始顺序合并的所有结果文本，使用双换行分隔。
+    """
+    results: list[tuple[int, str]] = []
+    completed_count = 0
+    total_tasks = len(text_list) if isinstance(text_list, Sized) else 0
+    max_concurrent = resolve_max_concurrent(input_model, max_concurrent)
+    semaphore = asyncio.Semaphore(max_concurrent)
+    journal = _begin_journal(job_id, input_model, prompt, input_top_p, input_temperature)
+
+    item_timeout = _item_timeout(item_timeout)
+    job_deadline = _job_deadline(job_timeout)
+    stats = RetryStats()
+    hedger = make_hedger(input_model, hedge, hedge_model)
+    policy = resolve_policy(policy)
+    estimator = CostEstimator(input_model, prompt)
+
+    def runtime() -> Dict[str, Any]:
+        """本任务的运行时状态，随进度一同推送。"""
+        return _runtime_status(input_model, max_concurrent, stats, hedger)
+
+    async def process_item(item: str, index: int) -> None:
+        """在信号量内处理单项：先落盘原始输出，再去除空行并登记；异常记为该项失败，结果始终登记。"""
+        nonlocal completed_count
+
+        async with semaphore:
+            start = time.monotonic()
             try:
-                future.result()
+                text, failed = await _stream_item_with_retry_async(
+                    item, index, input_model, prompt, input_top_p, input_temperature,
+                    on_item=on_item, use_cache=use_cache, session=session,
+                    item_timeout=item_timeout, job_deadline=job_deadline, stats=stats, hedger=hedger,
+                )
+                if journal:
+                    if failed:
+                        journal.fail_item(job_id, index, text)
+                    else:
+                        journal.complete_item(job_id, index, text)
+                if not failed:
+                    estimator.observe(item, text)
             except Exception as e:
-                print(f"任务执行异常: {e}")
+                text, failed = f"错误: {str(e)}", True
+            elapsed = time.monotonic() - start
 
-    results = [result_queue.get() for _ in range(len(text_list))]
-    results.sort(key=lambda x: x[0])
+        # 逐项去除空行，合并时无需再整体清理
+        text = clean_result(text)
+        results.append((index, text))
+        completed_count += 1
+        try:
+            await _notify_progress_async(on_progress, total_tasks, completed_count, runtime())
+            await _notify_item_async(on_item, index, text, flag=failed, elapsed=elapsed)
+        except Exception as e:
+            print(f"任务执行异常: {e}")
 
-    cleaned_results = []
-    for result in results:
-        cleaned_result = '\n'.join(line for line in result[1].split('\n') if line.strip())
-        cleaned_results.append(cleaned_result)
+    # 初始化进度
+    await _notify_progress_async(on_progress, total_tasks, completed_count, runtime())
 
+    # 逐项创建任务并让出事件循环：输入为生成器时，切分与执行并行进行；已创建未完成的任务达到窗口时
+    # 先等待其中之一完成，内存占用由并发度而非输入规模决定。信号量按等待顺序放行，
+    # 非 FIFO 策略下按预估开销排序后再创建任务
+    entries = enumerate(text_list)
+    if policy != POLICY_FIFO:
+        entries = order_items(entries, estimator, policy)
+    window = max_concurrent * 2
+    pending: set["asyncio.Task[None]"] = set()
+    for i, item in entries:
+        total_tasks = max(total_tasks, i + 1)
+        restored = journal.restore_item(job_id, i, item) if journal else None
+        if restored is not None and use_cache:
+            restored = clean_result(restored)
+            results.append((i, restored))
+            completed_count += 1
+            await _notify_item_async(on_item, i, restored, flag=False, elapsed=0.0)
+            await _notify_progress_async(on_progress, total_tasks, completed_count, runtime())
+            continue
+        if len(pending) >= window:
+            _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        pending.add(asyncio.create_task(process_item(item, i)))
+        await asyncio.sleep(0)
+    if pending:
+        await asyncio.wait(pending)
+
+    estimator.save()
     # 结束进度
-    _notify_progress(on_progress, total_tasks, completed_count)
+    await _notify_progress_async(on_progress, total_tasks, completed_count, runtime())
+
+    if journal:
+        journal.finish_job(job_id, total_tasks)
+    return _merge_results(results)
+
+
+def chat_llm_batch_asyncio(
+        text_list: Iterable[str],
+        input_model: str,
+        prompt: str,
+        input_top_p: float = 0.7,
+        input_temperature: float = 0.9,
+        on_progress: Optional[Callable[[Dict[str, int]], Any]] = None,
+        on_item: Optional[Callable[[Dict[str, object]], Any]] = None,
+        max_concurrent: Optional[int] = None,
+        use_cache: bool = True,
+        job_id: Optional[str] = None,
+        session: Optional[str] = None,
+        item_timeout: Optional[float] = None,
+        job_timeout: Optional[float] = None,
+        hedge: Optional[bool] = None,
+        hedge_model: Optional[str] = None,
+        policy: Optional[str] = None,
+) -> str:
+    """
+    异步引擎的同步入口：在共享后台事件循环中运行 `chat_llm_batch_async` 并阻塞等待结果。
+
+    参数与返回值同 `chat_llm_batch`，可直接互换使用；回调在事件循环线程中执行。
+    """
+    return run_coroutine(chat_llm_batch_async(
+        text_list,
+        input_model,
+        prompt,
+        input_top_p,
+        input_temperature,
+        on_progress=on_progress,
+        on_item=on_item,
+        max_concurrent=max_concurrent,
+        use_cache=use_cache,
+        job_id=job_id,
+        session=session,
+        item_timeout=item_timeout,
+        job_timeout=job_timeout,
+        hedge=hedge,
+        hedge_model=hedge_model,
+        policy=policy,
+    ))
+
+
+def resume_batch_job(
+        job_id: str,
+        on_progress: Optional[Callable[[Dict[str, int]], Any]] = None,
+        on_item: Optional[Callable[[Dict[str, object]], Any]] = None,
+        batch_fn: Callable[..., str] = chat_llm_batch,
+        session: Optional[str] = None,
+) -> str:
+    """
+    续跑任务日志中的批量任务：沿用原参数与输入，仅调度未完成与失败的项。
+
+    Args:
+        job_id (str): 任务 ID。
+        on_progress (Optional[Callable[[Dict[str, int]], Any]]): 进度回调。
+        on_item (Optional[Callable[[Dict[str, object]], Any]]): 单项回调。
+        batch_fn (Callable[..., str]): 执行引擎，`chat_llm_batch` 或 `chat_llm_batch_asyncio`。
+        session (Optional[str]): 会话标识，语义同 `chat_llm_batch`。
+
+    Returns:
+        str: 按原始顺序合并的所有结果文本。
+
+    Raises:
+        KeyError: 任务日志未启用或任务不存在。
+    """
+    journal = get_job_journal()
+    job = journal.get_job(job_id) if journal else None
+    if job is None:
+        raise KeyError(f"任务不存在: {job_id}")
 
-    return "\n\n".join(cleaned_results)
+    return batch_fn(
+        journal.load_inputs(job_id),
+        job["model"],
+        job["prompt"],
+        job["top_p"],
+        job["temperature"],
+        on_progress=on_progress,
+        on_item=on_item,
+        job_id=job_id,
+        session=session,
+    )
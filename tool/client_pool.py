@@ -0,0 +1,242 @@
+import asyncio
+import atexit
+import threading
+from typing import TYPE_CHECKING, Any, Coroutine, Dict, Iterable, Optional, Tuple, TypeVar
+
+from config.model_config import supplier_dict, model_dict
+from config.runtime_config import client_config
+from tool.endpoint_pool import Endpoint, model_endpoints, supplier_keys
+
+# openai 与 httpx 导入开销较大，推迟到首次创建客户端时
+if TYPE_CHECKING:
+    import httpx
+    from openai import AsyncOpenAI, OpenAI
+
+# (供应商, API 密钥) -> 长期复用的客户端；同一供应商的各密钥共享该供应商的 keep-alive 连接池
+_clients: Dict[Tuple[str, str], "OpenAI"] = {}
+_http_clients: Dict[str, "httpx.Client"] = {}
+_lock = threading.Lock()
+
+# 异步客户端绑定在唯一的后台事件循环上，跨调用复用连接池
+_async_clients: Dict[Tuple[str, str], "AsyncOpenAI"] = {}
+_async_http_clients: Dict[str, "httpx.AsyncClient"] = {}
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_thread: Optional[threading.Thread] = None
+
+T = TypeVar("T")
+
+
+def _pool_size(supplier: str) -> int:
+    """
+    计算供应商连接池大小：为使用该供应商（含作为端点池成员）的所有模型的 `max_concurrent` 之和。
+
+    Args:
+        supplier (str): 供应商名称，对应 `supplier_dict` 的键。
+
+    Returns:
+        int: 连接池最大连接数，至少为 1。
+    """
+    total = sum(int(cfg.get("max_concurrent", 10)) for input_model, cfg in model_dict.items()
+                if any(endpoint.supplier == supplier for endpoint in model_endpoints(input_model)))
+    return max(total, 1)
+
+
+def _http_client_kwargs(supplier: str) -> Dict[str, Any]:
+    """按供应商并发上限生成 HTTP 客户端参数，同步/异步客户端共用。"""
+    import httpx
+
+    size = _pool_size(supplier)
+    return {
+        "limits": httpx.Limits(
+            max_connections=size,
+            max_keepalive_connections=size,
+            keepalive_expiry=client_config["keepalive_expiry"],
+        ),
+        "timeout": httpx.Timeout(client_config["timeout"], connect=client_config["connect_timeout"]),
+        "follow_redirects": True,
+    }
+
+
+def _build_http_client(supplier: str) -> "httpx.Client":
+    """按供应商并发上限构造共享 HTTP 客户端。"""
+    import httpx
+
+    return httpx.Client(**_http_client_kwargs(supplier))
+
+
+def get_client(supplier: str, api_key: Optional[str] = None) -> "OpenAI":
+    """
+    获取供应商与 API 密钥对应的共享 OpenAI 客户端，首次访问时创建。
+
+    Args:
+        supplier (str): 供应商名称，对应 `supplier_dict` 的键。
+        api_key (Optional[str]): 使用的 API 密钥，默认取供应商密钥池中的第一个。
+
+    Returns:
+        OpenAI: 线程安全、可复用的客户端实例。
+    """
+    key = (supplier, api_key or supplier_keys(supplier)[0])
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    from openai import OpenAI
+
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            http_client = _http_clients.get(supplier)
+            if http_client is None:
+                http_client = _build_http_client(supplier)
+                _http_clients[supplier] = http_client
+            client = OpenAI(
+                api_key=key[1],
+                base_url=supplier_dict[supplier]["url"],
+                http_client=http_client,
+                max_retries=client_config["max_retries"],
+            )
+            _clients[key] = client
+    return client
+
+
+def get_endpoint_client(endpoint: Endpoint) -> "OpenAI":
+    """
+    获取端点对应的共享客户端。
+
+    Args:
+        endpoint (Endpoint): 端点池选出的端点。
+
+    Returns:
+        OpenAI: 该端点的客户端。
+    """
+    return get_client(endpoint.supplier, endpoint.api_key)
+
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """
+    获取异步引擎使用的后台事件循环，首次访问时在守护线程中启动。
+
+    Returns:
+        asyncio.AbstractEventLoop: 常驻运行的事件循环。
+    """
+    global _loop, _loop_thread
+
+    with _lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            _loop_thread = threading.Thread(target=_loop.run_forever, name="async-engine", daemon=True)
+            _loop_thread.start()
+    return _loop
+
+
+def run_coroutine(coro: Coroutine[Any, Any, T]) -> T:
+    """
+    在后台事件循环中执行协程并阻塞等待结果，供同步代码调用异步引擎。
+
+    Args:
+        coro (Coroutine): 待执行的协程。
+
+    Returns:
+        T: 协程的返回值。
+    """
+    return asyncio.run_coroutine_threadsafe(coro, get_event_loop()).result()
+
+
+def get_async_client(supplier: str, api_key: Optional[str] = None) -> "AsyncOpenAI":
+    """
+    获取供应商与 API 密钥对应的共享异步客户端，仅可在 `get_event_loop()` 的循环中使用。
+
+    Args:
+        supplier (str): 供应商名称，对应 `supplier_dict` 的键。
+        api_key (Optional[str]): 使用的 API 密钥，默认取供应商密钥池中的第一个。
+
+    Returns:
+        AsyncOpenAI: 可复用的异步客户端实例。
+    """
+    key = (supplier, api_key or supplier_keys(supplier)[0])
+    client = _async_clients.get(key)
+    if client is None:
+        import httpx
+        from openai import AsyncOpenAI
+
+        # 仅在事件循环线程内创建与访问，无需加锁
+        http_client = _async_http_clients.get(supplier)
+        if http_client is None:
+            http_client = httpx.AsyncClient(**_http_client_kwargs(supplier))
+            _async_http_clients[supplier] = http_client
+        client = AsyncOpenAI(
+            api_key=key[1],
+            base_url=supplier_dict[supplier]["url"],
+            http_client=http_client,
+            max_retries=client_config["max_retries"],
+        )
+        _async_clients[key] = client
+    return client
+
+
+def get_endpoint_async_client(endpoint: Endpoint) -> "AsyncOpenAI":
+    """
+    获取端点对应的共享异步客户端，仅可在 `get_event_loop()` 的循环中使用。
+
+    Args:
+        endpoint (Endpoint): 端点池选出的端点。
+
+    Returns:
+        AsyncOpenAI: 该端点的异步客户端。
+    """
+    return get_async_client(endpoint.supplier, endpoint.api_key)
+
+
+async def _close_async_clients() -> None:
+    """在事件循环内关闭全部异步客户端及其共享的连接池。"""
+    for http_client in _async_http_clients.values():
+        try:
+            await http_client.aclose()
+        except Exception:
+            pass
+    _async_http_clients.clear()
+    _async_clients.clear()
+
+
+def preconnect(suppliers: Optional[Iterable[str]] = None) -> None:
+    """
+    预连接：提前完成 DNS 解析与 TLS 握手，使首个请求直接复用连接。
+
+    Args:
+        suppliers (Optional[Iterable[str]]): 需要预连接的供应商，默认为所有被模型引用的供应商（含端点池）。
+    """
+    if suppliers is None:
+        suppliers = {endpoint.supplier for input_model in model_dict for endpoint in model_endpoints(input_model)}
+
+    for supplier in suppliers:
+        get_client(supplier)
+        try:
+            # 仅用于建立连接，响应状态无关紧要
+            _http_clients[supplier].head(supplier_dict[supplier]["url"])
+        except Exception as e:
+            print(f"预连接失败 {supplier}: {e}")
+
+
+def close_all() -> None:
+    """关闭所有共享客户端（含异步客户端与后台事件循环）并释放连接池，可重复调用。"""
+    global _loop
+
+    if _loop is not None and _loop.is_running():
+        try:
+            asyncio.run_coroutine_threadsafe(_close_async_clients(), _loop).result(timeout=5)
+        except Exception:
+            pass
+        _loop.call_soon_threadsafe(_loop.stop)
+        _loop = None
+
+    with _lock:
+        for http_client in _http_clients.values():
+            try:
+                http_client.close()
+            except Exception:
+                pass
+        _clients.clear()
+        _http_clients.clear()
+
+
+atexit.register(close_all)
@@ -0,0 +1,148 @@
+import queue
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from tool.chat import chat_llm_stream
+from tool.stream_adapter import StreamCoalescer
+from tool.token_count import count_tokens
+
+# 多路事件类型
+_CHUNK = "chunk"
+_DONE = "done"
+_ERROR = "error"
+
+
+class CompareStream:
+    """一路对比流的状态：累积输出与计时，用于计算首 token 延迟、生成速率与总耗时。"""
+
+    def __init__(self, input_model: str, input_top_p: float, input_temperature: float):
+        """
+        Args:
+            input_model (str): 模型名称。
+            input_top_p (float): nucleus sampling 参数。
+            input_temperature (float): 输出多样性温度。
+        """
+        self.input_model = input_model
+        self.input_top_p = input_top_p
+        self.input_temperature = input_temperature
+        self.coalescer = StreamCoalescer()
+        self.start = time.monotonic()
+        self.first_token: Optional[float] = None
+        self.end: Optional[float] = None
+        self.tokens = 0
+        self.error: Optional[str] = None
+
+    def push(self, chunk: str, now: float) -> None:
+        """登记一段增量，按增量累计 token 数以便实时计算速率。"""
+        if self.first_token is None:
+            self.first_token = now
+        self.coalescer.push(chunk)
+        self.tokens += count_tokens(chunk, self.input_model)
+
+    def finish(self, now: float, error: Optional[str] = None) -> None:
+        """结束该路；正常结束时以完整输出重新计数，修正逐段计数的偏差。"""
+        self.end = now
+        self.error = error
+        text = self.coalescer.flush()
+        if error is None:
+            self.tokens = count_tokens(text, self.input_model)
+
+    def snapshot(self, now: float) -> Dict[str, Any]:
+        """
+        Returns:
+            Dict[str, Any]: `model`、当前文本 `text`、`ttft`（秒）、`tokens`、`tokens_per_sec`、
+            `elapsed`（秒）、`done` 与 `error`；尚无数据的指标为 None。
+        """
+        end = self.end or now
+        rate = None
+        if self.first_token is not None and end > self.first_token and self.tokens:
+            rate = self.tokens / (end - self.first_token)
+        text = self.coalescer.flush() if self.coalescer.due() or self.end else self.coalescer.text
+        return {
+            "model": self.input_model,
+            "text": f"{text}\n\n错误: {self.error}" if self.error else text,
+            "ttft": self.first_token - self.start if self.first_token is not None else None,
+            "tokens": self.tokens,
+            "tokens_per_sec": rate,
+            "elapsed": end - self.start,
+            "done": self.end is not None,
+            "error": self.error,
+        }
+
+
+def compare_stream(
+        input_text: str,
+        prompt: str,
+        configs: Sequence[Tuple[str, float, float]],
+        session: Optional[str] = None,
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    N 路并行对比：各路在独立线程中流式生成，全部事件汇入同一个带标签的队列，由调用方线程阻塞消费。
+
+    有待刷新的增量时按 `stream_config` 的节拍唤醒，否则一直阻塞等待下一事件，空闲时不占用 CPU；
+    调用方提前关闭生成器时各路在下一个增量处停止并关闭上游流。
+
+    Args:
+        input_text (str): 用户输入文本。
+        prompt (str): 系统提示词。
+        configs (Sequence[Tuple[str, float, float]]): 每一路的 (模型, top_p, temperature)，可重复同一模型以对比参数。
+        session (Optional[str]): 界面会话标识，各路以交互优先级经全局调度器派发。
+
+    Yields:
+        List[Dict[str, Any]]: 各路当前快照（见 `CompareStream.snapshot`），与 `configs` 顺序一致；结束时再产出一次最终快照。
+    """
+    streams = [CompareStream(*config) for config in configs]
+    events: "queue.Queue[Tuple[int, str, Any]]" = queue.Queue()
+    cancel = threading.Event()
+
+    def worker(index: int, stream: CompareStream) -> None:
+        try:
+            # 各路即使配置相同也应独立采样：不读取缓存（回放速度会使 TTFT 与速率失真），也不与在途的相同请求合并
+            chunks = chat_llm_stream(input_text, stream.input_model, prompt, stream.input_top_p,
+                                     stream.input_temperature, use_cache=False, session=session, coalesce=False)
+            try:
+                for chunk in chunks:
+                    if cancel.is_set():
+                        return
+                    if chunk:
+                        events.put((index, _CHUNK, chunk))
+            finally:
+                chunks.close()
+            events.put((index, _DONE, None))
+        except Exception as e:
+            events.put((index, _ERROR, str(e)))
+
+    for index, stream in enumerate(streams):
+        threading.Thread(target=worker, args=(index, stream), daemon=True).start()
+
+    remaining = len(streams)
+    try:
+        yield [stream.snapshot(time.monotonic()) for stream in streams]
+        while remaining:
+            # 仅在有待刷新内容时设置超时，以便按节拍推送
+            waits = [wait for wait in (stream.coalescer.time_until_due() for stream in streams) if wait is not None]
+            timeout = min(waits, default=None)
+            try:
+                index, kind, payload = events.get(timeout=timeout)
+            except queue.Empty:
+                pass
+            else:
+                now = time.monotonic()
+                stream = streams[index]
+                if kind == _CHUNK:
+                    stream.push(payload, now)
+                else:
+                    stream.finish(now, payload if kind == _ERROR else None)
+                    remaining -= 1
+                    if remaining:
+                        yield [stream.snapshot(now) for stream in streams]
+                    continue
+            if any(stream.coalescer.due() for stream in streams):
+                now = time.monotonic()
+                yield [stream.snapshot(now) for stream in streams]
+    finally:
+        cancel.set()
+
+    now = time.monotonic()
+    yield [stream.snapshot(now) for stream in streams]
@@ -0,0 +1,225 @@
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from config.model_config import model_dict
+from config.runtime_config import concurrency_config
+from tool.retry import ERROR_NETWORK, ERROR_SERVER, ERROR_THROTTLE
+
+# 触发乘性缩减的错误类别：与重试共用 `classify_retry` 的归类，两者对限流与拥塞的判断始终一致
+CONGESTION_ERRORS = frozenset({ERROR_THROTTLE, ERROR_SERVER, ERROR_NETWORK})
+# 首 token 延迟突增的信号
+SIGNAL_LATENCY = "latency"
+
+
+class RequestProbe:
+    """单次请求的计时探针：记录发起时间、首 token 延迟（TTFT）与派发前的排队时长。"""
+
+    def __init__(self, queue_wait: float = 0.0):
+        """
+        Args:
+            queue_wait (float): 派发前的排队时长（秒）。
+        """
+        self.start = time.monotonic()
+        self.ttft: Optional[float] = None
+        self.queue_wait = queue_wait
+
+    def first_token(self) -> None:
+        """标记收到首个 token，仅首次调用生效。"""
+        if self.ttft is None:
+            self.ttft = time.monotonic() - self.start
+
+
+class AdaptiveLimiter:
+    """
+    AIMD 自适应并发限制器：健康时加性增加并发，遇到 429、5xx、超时或首 token 延迟突增时乘性缩减。
+
+    槽位由全局调度器在派发时以 `try_acquire` 非阻塞占用、请求结束后 `release`；
+    `ceiling` 为硬上限，`limit` 为当前允许的并发数。
+    """
+
+    def __init__(
+            self,
+            ceiling: int,
+            initial: Optional[int] = None,
+            floor: int = 1,
+            increase: float = 1.0,
+            decrease: float = 0.5,
+            latency_factor: float = 2.0,
+            ewma_alpha: float = 0.2,
+            min_samples: int = 5,
+            cooldown: float = 1.0,
+    ):
+        """
+        Args:
+            ceiling (int): 并发上限。
+            initial (Optional[int]): 初始并发数，默认等于上限。
+            floor (int): 并发下限。
+            increase (float): 每完成约一轮请求增加的并发数。
+            decrease (float): 乘性缩减系数，范围 (0, 1)。
+            latency_factor (float): 首 token 延迟超过基线该倍数时视为延迟突增。
+            ewma_alpha (float): 延迟基线的指数移动平均系数。
+            min_samples (int): 开始判断延迟突增前所需的样本数。
+            cooldown (float): 两次缩减的最小间隔（秒）。
+        """
+        self.ceiling = max(int(ceiling), 1)
+        self.floor = min(max(int(floor), 1), self.ceiling)
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self.ewma_alpha = ewma_alpha
+        self.min_samples = min_samples
+        self.cooldown = cooldown
+
+        self._limit = float(min(max(initial or self.ceiling, self.floor), self.ceiling))
+        self._in_flight = 0
+        self._latency: Optional[float] = None
+        self._samples = 0
+        self._last_decrease = 0.0
+        self._signals: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def limit(self) -> int:
+        """当前允许的并发数。"""
+        return max(int(self._limit), self.floor)
+
+    @property
+    def in_flight(self) -> int:
+        """当前进行中的请求数。"""
+        return self._in_flight
+
+    def try_acquire(self) -> bool:
+        """
+        非阻塞地占用一个并发槽位，供外部调度器在派发时使用。
+
+        Returns:
+            bool: 是否成功占用。
+        """
+        with self._lock:
+            if self._in_flight < self.limit:
+                self._in_flight += 1
+                return True
+            return False
+
+    def release(self) -> None:
+        """释放一个并发槽位。"""
+        with self._lock:
+            self._in_flight -= 1
+
+    def on_success(self, latency: Optional[float] = None) -> None:
+        """
+        记录一次成功请求：延迟突增时缩减，否则在并发已被用满时加性增加。
+
+        需在 `release` 之前调用，以便按当前占用判断并发是否用满。
+
+        Args:
+            latency (Optional[float]): 首 token 延迟（秒），None 表示无延迟样本。
+        """
+        with self._lock:
+            if latency is not None:
+                spike = (self._samples >= self.min_samples
+                         and latency > self._latency * self.latency_factor)
+                self._latency = latency if self._latency is None else (
+                        self.ewma_alpha * latency + (1 - self.ewma_alpha) * self._latency)
+                self._samples += 1
+                if spike:
+                    self._decrease_locked(SIGNAL_LATENCY)
+                    return
+
+            # 仅在并发被用满时增长，避免低负载期间上限空涨到顶后突发打满
+            if self._in_flight >= self.limit and self._limit < self.ceiling:
+                # 每完成约 limit 个请求（一轮）增加 increase
+                self._limit = min(float(self.ceiling), self._limit + self.increase / self._limit)
+
+    def on_error(self, kind: str) -> None:
+        """
+        记录一次失败请求；仅拥塞类错误（限流、服务端、网络）触发缩减，客户端错误与截止时间不计。
+
+        Args:
+            kind (str): `classify_retry` 的错误类别。
+        """
+        if kind not in CONGESTION_ERRORS:
+            return
+        with self._lock:
+            self._decrease_locked(kind)
+
+    def _decrease_locked(self, signal: str) -> None:
+        """乘性缩减并发；冷却期内的并发失败视为同一次拥塞，只缩减一次。需持有锁调用。"""
+        self._signals[signal] = self._signals.get(signal, 0) + 1
+        now = time.monotonic()
+        if now - self._last_decrease < max(self.cooldown, self._latency or 0.0):
+            return
+        self._last_decrease = now
+        self._limit = max(float(self.floor), self._limit * self.decrease)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        读取限制器状态，用于进度展示与调试。
+
+        Returns:
+            Dict[str, Any]: 包含 `limit`、`ceiling`、`in_flight`、`latency`（首 token 延迟基线）与各信号计数。
+        """
+        with self._lock:
+            return {
+                "limit": self.limit,
+                "ceiling": self.ceiling,
+                "in_flight": self._in_flight,
+                "latency": self._latency,
+                "signals": dict(self._signals),
+            }
+
+
+_limiters: Dict[Tuple[str, str], AdaptiveLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(input_model: str) -> AdaptiveLimiter:
+    """
+    获取 (供应商, 模型) 共享的自适应限制器，首次访问时按 `model_dict` 的 `max_concurrent` 创建。
+
+    Args:
+        input_model (str): 模型名称，对应 `model_dict` 的键。
+
+    Returns:
+        AdaptiveLimiter: 进程内共享的限制器。
+    """
+    key = (model_dict[input_model]["supplier"], input_model)
+    limiter = _limiters.get(key)
+    if limiter is not None:
+        return limiter
+
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            ceiling = int(model_dict[input_model]["max_concurrent"])
+            limiter = AdaptiveLimiter(
+                ceiling,
+                initial=max(round(ceiling * concurrency_config["initial_ratio"]), 1),
+                floor=concurrency_config["min_limit"],
+                increase=concurrency_config["increase"],
+                decrease=concurrency_config["decrease"],
+                latency_factor=concurrency_config["latency_factor"],
+                ewma_alpha=concurrency_config["ewma_alpha"],
+                min_samples=concurrency_config["min_samples"],
+                cooldown=concurrency_config["cooldown"],
+            )
+            _limiters[key] = limiter
+    return limiter
+
+
+def resolve_max_concurrent(input_model: str, max_concurrent: Optional[int] = None) -> int:
+    """
+    计算单个批量任务的并发数：调用方给定值受模型配置的 `max_concurrent` 约束，未给定时取配置值。
+
+    Args:
+        input_model (str): 模型名称。
+        max_concurrent (Optional[int]): 调用方请求的并发数。
+
+    Returns:
+        int: 生效的并发数，至少为 1。
+    """
+    ceiling = int(model_dict[input_model]["max_concurrent"])
+    if not max_concurrent:
+        return max(ceiling, 1)
+    return max(min(int(max_concurrent), ceiling), 1)
@@ -0,0 +1,322 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from config.model_config import model_dict
+from config.runtime_config import conversation_config
+from tool.chat import chat_llm
+from tool.scheduler import LANE_BATCH
+from tool.token_count import MESSAGE_OVERHEAD_TOKENS, chunk_token_budget, count_tokens
+
+# 摘要请求的系统提示词：只输入已有摘要与新淘汰的轮次，不重发完整历史
+SUMMARY_PROMPT = (
+    "你负责维护一段对话的摘要。输入包含已有摘要（可能为空）与其后新增的若干轮对话。"
+    "请将新增内容并入摘要，保留事实、结论、约定与尚未解决的问题，删去寒暄与重复内容，"
+    "直接输出更新后的摘要，不超过 {limit} 个 token。"
+)
+
+# 摘要以一条系统消息置于历史之前
+SUMMARY_HEADER = "此前对话的摘要：\n"
+
+
+def _clip(text: str, tokens: int, limit: int) -> str:
+    """按字符比例将 `tokens` 个 token 的文本截断到约 `limit` 个 token，不重新计数。"""
+    if tokens <= limit:
+        return text
+    return text[:max(len(text) * limit // max(tokens, 1), 1)]
+
+
+class _Turn:
+    """一轮对话：预先组装好的消息与按模型缓存的 token 数，构建上下文时无需重新计数。"""
+
+    __slots__ = ("messages", "tokens")
+
+    def __init__(self, user: str, assistant: str, input_model: str):
+        self.messages = [
+            {"role": "user", "content": user},
+            {"role": "assistant", "content": assistant},
+        ]
+        self.tokens = 0
+        self.recount(input_model)
+
+    def recount(self, input_model: str) -> None:
+        """按模型的分词器重新计数（仅在会话切换模型时调用）。"""
+        self.tokens = sum(count_tokens(message["content"], input_model) for message in self.messages)
+        self.tokens += 2 * MESSAGE_OVERHEAD_TOKENS
+
+
+class Conversation:
+    """
+    单个会话的多轮对话状态，历史受 token 预算约束。
+
+    历史超过上限（`history_ratio`）时，最早的轮次移出窗口并降至 `low_water_ratio`；移出的轮次由后台线程
+    与已有摘要一起增量并入摘要，摘要完成前仍可在预算内随上下文发送。每轮的 token 数在加入时计数一次，
+    构建上下文只需计数本轮输入。
+    """
+
+    def __init__(self, session: str):
+        """
+        Args:
+            session (str): 界面会话标识。
+        """
+        self.session = session
+        self.input_model: Optional[str] = None
+        self.last_used = time.monotonic()
+        self._lock = threading.Lock()
+        self._turns: Deque[_Turn] = deque()
+        self._tokens = 0
+        # 已移出窗口、等待并入摘要的轮次
+        self._evicted: Deque[_Turn] = deque()
+        self._evicted_tokens = 0
+        self._summary = ""
+        self._summary_tokens = 0
+        self._summarizing = False
+        # 清空会话时递增，使进行中的摘要结果作废
+        self._generation = 0
+
+    @staticmethod
+    def _high_water(input_model: str) -> int:
+        """历史 token 上限：上下文窗口扣除输出 `max_tokens` 后按 `history_ratio` 折算。"""
+        config = model_dict[input_model]
+        max_tokens = int(config["max_tokens"])
+        context_window = int(config.get("context_window", max_tokens * 2))
+        return max(int((context_window - max_tokens) * conversation_config["history_ratio"]), 0)
+
+    def _use_model(self, input_model: str) -> None:
+        """切换模型时按新模型的分词器重新计数全部轮次（调用方持有锁）。"""
+        if self.input_model == input_model:
+            return
+        if self.input_model is not None:
+            for turn in (*self._turns, *self._evicted):
+                turn.recount(input_model)
+            self._tokens = sum(turn.tokens for turn in self._turns)
+            self._evicted_tokens = sum(turn.tokens for turn in self._evicted)
+            self._summary_tokens = count_tokens(self._summary, input_model)
+        self.input_model = input_model
+        self._evict()
+
+    @property
+    def turns(self) -> int:
+        """窗口内的轮数。"""
+        with self._lock:
+            return len(self._turns)
+
+    @property
+    def summary(self) -> str:
+        """当前摘要。"""
+        with self._lock:
+            return self._summary
+
+    def context(self, input_model: str, prompt: Optional[str], input_text: str) -> Tuple[List[Dict[str, str]], int]:
+        """
+        构建本轮请求的历史消息：优先放入摘要，再从最近的轮次向前放入，直到填满剩余的上下文预算。
+
+        Args:
+            input_model (str): 模型名称。
+            prompt (Optional[str]): 系统提示词。
+            input_text (str): 本轮输入。
+
+        Returns:
+            Tuple[List[Dict[str, str]], int]: (历史消息, 历史消息的 token 数)。
+        """
+        config = model_dict[input_model]
+        max_tokens = int(config["max_tokens"])
+        context_window = int(config.get("context_window", max_tokens * 2))
+        available = (context_window - max_tokens - 2 * MESSAGE_OVERHEAD_TOKENS
+                     - count_tokens(prompt or "", input_model) - count_tokens(input_text, input_model))
+
+        with self._lock:
+            self._use_model(input_model)
+            self.last_used = time.monotonic()
+            used = 0
+            head: List[Dict[str, str]] = []
+            if self._summary:
+                tokens = self._summary_tokens + MESSAGE_OVERHEAD_TOKENS
+                if tokens <= available:
+                    head = [{"role": "system", "content": SUMMARY_HEADER + self._summary}]
+                    used = tokens
+            selected: List[_Turn] = []
+            # 从最近的轮次向前，尚未并入摘要的已淘汰轮次排在窗口之前
+            for turn in (*reversed(self._turns), *reversed(self._evicted)):
+                if used + turn.tokens > available:
+                    break
+                selected.append(turn)
+                used += turn.tokens
+
+        messages = head
+        for turn in reversed(selected):
+            messages.extend(turn.messages)
+        return messages, used
+
+    def append(self, input_model: str, user: str, assistant: str) -> None:
+        """
+        记录一轮完成的对话；历史超过上限时淘汰最早的轮次，并按需在后台更新摘要。
+
+        Args:
+            input_model (str): 模型名称。
+            user (str): 本轮输入。
+            assistant (str): 模型的完整回复。
+        """
+        turn = _Turn(user, assistant, input_model)
+        with self._lock:
+            self._use_model(input_model)
+            self.last_used = time.monotonic()
+            self._turns.append(turn)
+            self._tokens += turn.tokens
+            self._evict()
+
+    def _evict(self) -> None:
+        """将历史降至上限以内，并启动后台摘要（调用方持有锁）。"""
+        high_water = self._high_water(self.input_model)
+        if self._tokens <= high_water:
+            return
+        low_water = high_water * conversation_config["low_water_ratio"]
+        while self._turns and self._tokens > low_water:
+            turn = self._turns.popleft()
+            self._tokens -= turn.tokens
+            if conversation_config["summarize"]:
+                self._evicted.append(turn)
+                self._evicted_tokens += turn.tokens
+        # 摘要跟不上时丢弃最早的待摘要轮次，单个会话的内存始终有界
+        while self._evicted and self._evicted_tokens > high_water:
+            self._evicted_tokens -= self._evicted.popleft().tokens
+        if self._evicted and not self._summarizing:
+            self._summarizing = True
+            threading.Thread(target=self._summarize, args=(self._generation,),
+                             name="conversation-summary", daemon=True).start()
+
+    def _summarize(self, generation: int) -> None:
+        """后台线程：分批将已淘汰的轮次与已有摘要一起请求模型，得到新的摘要。"""
+        while True:
+            with self._lock:
+                if generation != self._generation:
+                    return
+                if not self._evicted:
+                    self._summarizing = False
+                    return
+                input_model = self.input_model
+                # 摘要至多占历史上限的一半，为最近的轮次留出空间
+                limit = max(min(int(conversation_config["summary_max_tokens"]),
+                                self._high_water(input_model) // 2), 1)
+                prompt = SUMMARY_PROMPT.format(limit=limit)
+                budget = max(chunk_token_budget(input_model, prompt) - self._summary_tokens, 1)
+                batch: List[_Turn] = []
+                used = 0
+                for turn in self._evicted:
+                    if batch and used + turn.tokens > budget:
+                        break
+                    batch.append(turn)
+                    used += turn.tokens
+                summary = self._summary
+
+            parts = [f"已有摘要：\n{summary or '（无）'}", "新增对话："]
+            for turn in batch:
+                # 单轮超出预算时按比例截断
+                share = budget * turn.tokens // max(used, 1)
+                for message in turn.messages:
+                    role = "用户" if message["role"] == "user" else "助手"
+                    parts.append(f"{role}：{_clip(message['content'], turn.tokens, share)}")
+            try:
+                result = chat_llm("\n\n".join(parts), input_model, prompt, lane=LANE_BATCH,
+                                  session=self.session).strip()
+            except Exception as e:
+                print(f"对话摘要失败，丢弃 {len(batch)} 轮较早的对话: {e}")
+                result = ""
+
+            with self._lock:
+                # 会话已清空，状态归新一代所有
+                if generation != self._generation:
+                    return
+                for turn in batch:
+                    # 等待期间可能已因积压被丢弃
+                    if self._evicted and self._evicted[0] is turn:
+                        self._evicted_tokens -= self._evicted.popleft().tokens
+                if result and input_model == self.input_model:
+                    tokens = count_tokens(result, input_model)
+                    self._summary = _clip(result, tokens, limit)
+                    self._summary_tokens = min(tokens, limit)
+
+    def clear(self) -> None:
+        """清空历史与摘要，进行中的摘要结果作废。"""
+        with self._lock:
+            self._generation += 1
+            self._turns.clear()
+            self._evicted.clear()
+            self._tokens = self._evicted_tokens = self._summary_tokens = 0
+            self._summary = ""
+            self._summarizing = False
+
+
+class ConversationStore:
+    """按会话标识保存多轮对话状态，会话数与闲置时长均有上限，超出时按最久未使用淘汰。"""
+
+    def __init__(self, max_sessions: int, idle_ttl: float):
+        """
+        Args:
+            max_sessions (int): 最多保留的会话数。
+            idle_ttl (float): 会话闲置超过该秒数后被清除。
+        """
+        self.max_sessions = max(int(max_sessions), 1)
+        self.idle_ttl = idle_ttl
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[str, Conversation]" = OrderedDict()
+
+    def get(self, session: str) -> Conversation:
+        """
+        获取会话的对话状态，不存在时创建。
+
+        Args:
+            session (str): 界面会话标识。
+
+        Returns:
+            Conversation: 对话状态。
+        """
+        now = time.monotonic()
+        with self._lock:
+            # 按最近使用排序，闲置超时的会话集中在头部
+            while self._sessions:
+                oldest = next(iter(self._sessions.values()))
+                if now - oldest.last_used <= self.idle_ttl:
+                    break
+                self._sessions.popitem(last=False)
+            conversation = self._sessions.get(session)
+            if conversation is None:
+                conversation = self._sessions[session] = Conversation(session)
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            else:
+                self._sessions.move_to_end(session)
+            conversation.last_used = now
+            return conversation
+
+    def discard(self, session: str) -> None:
+        """清除会话的对话状态。"""
+        with self._lock:
+            conversation = self._sessions.pop(session, None)
+        if conversation:
+            conversation.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+
+_store: Optional[ConversationStore] = None
+_store_lock = threading.Lock()
+
+
+def get_conversation_store() -> ConversationStore:
+    """
+    获取进程级共享的多轮对话状态存储。
+
+    Returns:
+        ConversationStore: 存储实例。
+    """
+    global _store
+
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ConversationStore(conversation_config["max_sessions"], conversation_config["idle_ttl"])
+    return _store
@@ -0,0 +1,291 @@
+import hashlib
+import heapq
+import itertools
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+
+from config.model_config import model_dict
+from config.runtime_config import dispatch_config
+from tool.token_count import count_tokens
+
+# 派发策略：按输入顺序、预估开销大的优先（缩短总耗时）、预估开销小的优先（尽快看到部分结果）
+POLICY_FIFO = "fifo"
+POLICY_LJF = "ljf"
+POLICY_SJF = "sjf"
+POLICIES = (POLICY_FIFO, POLICY_LJF, POLICY_SJF)
+
+
+def resolve_policy(policy: Optional[str]) -> str:
+    """
+    解析派发策略，None 时取 `dispatch_config`。
+
+    Raises:
+        ValueError: 未知策略。
+    """
+    policy = (policy or dispatch_config["policy"]).lower()
+    if policy not in POLICIES:
+        raise ValueError(f"未知派发策略: {policy}，可选 {'/'.join(POLICIES)}")
+    return policy
+
+
+def _stats_key(input_model: str, prompt: Optional[str]) -> str:
+    """(模型, 提示词) 的统计键。"""
+    return hashlib.sha256(f"{input_model}\0{prompt or ''}".encode("utf-8")).hexdigest()
+
+
+class OutputStats:
+    """输出长度的线性回归样本和：输出 token 数 y 关于输入 token 数 x，按 `max_samples` 衰减旧样本。"""
+
+    def __init__(self, n: float = 0.0, sx: float = 0.0, sy: float = 0.0, sxy: float = 0.0, sxx: float = 0.0):
+        self.n, self.sx, self.sy, self.sxy, self.sxx = n, sx, sy, sxy, sxx
+
+    def observe(self, x: float, y: float) -> None:
+        """加入一个样本；样本数超过上限时等比缩小各项和，使近期运行的权重更高。"""
+        limit = dispatch_config["max_samples"]
+        if self.n >= limit:
+            self.scale((limit - 1) / self.n)
+        self.add(x, y)
+
+    def add(self, x: float, y: float) -> None:
+        """加入一个样本，不做衰减（用于累积本任务的增量）。"""
+        self.n += 1
+        self.sx += x
+        self.sy += y
+        self.sxy += x * y
+        self.sxx += x * x
+
+    def scale(self, factor: float) -> None:
+        """各项和等比缩放。"""
+        self.n, self.sx, self.sy, self.sxy, self.sxx = (
+            value * factor for value in (self.n, self.sx, self.sy, self.sxy, self.sxx))
+
+    def predict(self, x: float) -> Optional[float]:
+        """
+        预测输入 `x` 个 token 时的输出 token 数。
+
+        Returns:
+            Optional[float]: 预测值，样本不足 `min_samples` 时为 None；输入长度无差异时退化为平均输出比例。
+        """
+        if self.n < dispatch_config["min_samples"] or self.sx <= 0:
+            return None
+        denominator = self.n * self.sxx - self.sx * self.sx
+        if denominator <= 1e-9 * self.n * self.sxx:
+            return x * self.sy / self.sx
+        slope = (self.n * self.sxy - self.sx * self.sy) / denominator
+        intercept = (self.sy - slope * self.sx) / self.n
+        return max(intercept + slope * x, 0.0)
+
+    def as_row(self) -> Tuple[float, ...]:
+        return self.n, self.sx, self.sy, self.sxy, self.sxx
+
+
+class OutputStatsStore:
+    """基于 SQLite 的输出长度统计，按 (模型, 提示词) 跨任务、跨进程累积。"""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): SQLite 文件路径，目录不存在时自动创建。
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS output_stats ("
+            "key TEXT PRIMARY KEY, n REAL NOT NULL, sx REAL NOT NULL, sy REAL NOT NULL, "
+            "sxy REAL NOT NULL, sxx REAL NOT NULL, updated REAL NOT NULL)"
+        )
+
+    def load(self, key: str) -> OutputStats:
+        """读取统计，不存在时返回空统计。"""
+        with self._lock:
+            row = self._conn.execute("SELECT n, sx, sy, sxy, sxx FROM output_stats WHERE key = ?", (key,)).fetchone()
+        return OutputStats(*row) if row else OutputStats()
+
+    def add(self, key: str, delta: OutputStats) -> None:
+        """
+        在一个写事务中将本任务的样本增量累加到已存统计，超出 `max_samples` 时等比衰减。
+
+        按增量累加而非覆盖，同一 (模型, 提示词) 的并发任务或多个进程互不丢失样本。
+
+        Args:
+            key (str): 统计键。
+            delta (OutputStats): 本任务新增样本的各项和（未衰减）。
+        """
+        limit = dispatch_config["max_samples"]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT INTO output_stats (key, n, sx, sy, sxy, sxx, updated) VALUES (?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET n = n + excluded.n, sx = sx + excluded.sx, "
+                    "sy = sy + excluded.sy, sxy = sxy + excluded.sxy, sxx = sxx + excluded.sxx, "
+                    "updated = excluded.updated",
+                    (key, *delta.as_row(), time.time()),
+                )
+                self._conn.execute(
+                    "UPDATE output_stats SET n = n * (? / n), sx = sx * (? / n), sy = sy * (? / n), "
+                    "sxy = sxy * (? / n), sxx = sxx * (? / n) WHERE key = ? AND n > ?",
+                    (float(limit),) * 5 + (key, limit),
+                )
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+
+_store: Optional[OutputStatsStore] = None
+_store_lock = threading.Lock()
+
+
+def get_output_stats_store() -> Optional[OutputStatsStore]:
+    """
+    获取进程级共享的输出长度统计；`dispatch_config["learn"]` 为 False 时返回 None。
+
+    Returns:
+        Optional[OutputStatsStore]: 统计存储实例。
+    """
+    global _store
+
+    if not dispatch_config["learn"]:
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = OutputStatsStore(dispatch_config["path"])
+    return _store
+
+
+class CostEstimator:
+    """
+    单个批量任务的开销预估：开销 = 输入 token 数 + 预测输出 token 数。
+
+    输出长度从以往运行中同一 (模型, 提示词) 的样本学习，样本不足时按 `default_output_ratio` 估算；
+    本任务完成的项实时加入样本，任务结束时将新增样本累加到统计存储。
+    """
+
+    def __init__(self, input_model: str, prompt: Optional[str]):
+        """
+        Args:
+            input_model (str): 模型名称。
+            prompt (Optional[str]): 系统提示词。
+        """
+        self.input_model = input_model
+        self._key = _stats_key(input_model, prompt)
+        self._store = get_output_stats_store()
+        self._stats = self._store.load(self._key) if self._store else OutputStats()
+        # 本任务新增样本，任务结束时累加写回
+        self._delta = OutputStats()
+        self._lock = threading.Lock()
+
+    def input_tokens(self, text: str) -> int:
+        """输入 token 数。"""
+        return count_tokens(text, self.input_model)
+
+    def predict_output(self, input_tokens: int) -> float:
+        """预测输出 token 数，不超过模型的 `max_tokens`。"""
+        with self._lock:
+            predicted = self._stats.predict(input_tokens)
+        if predicted is None:
+            predicted = input_tokens * dispatch_config["default_output_ratio"]
+        return min(predicted, float(model_dict[self.input_model]["max_tokens"]))
+
+    def cost(self, text: str) -> float:
+        """
+        Args:
+            text (str): 单项输入。
+
+        Returns:
+            float: 预估开销（token）。
+        """
+        tokens = self.input_tokens(text)
+        return tokens + self.predict_output(tokens)
+
+    def observe(self, text: str, output: str) -> None:
+        """
+        以一项成功完成的输入与输出更新样本。
+
+        Args:
+            text (str): 单项输入。
+            output (str): 该项的输出。
+        """
+        x, y = self.input_tokens(text), count_tokens(output, self.input_model)
+        with self._lock:
+            self._stats.observe(x, y)
+            self._delta.add(x, y)
+
+    def save(self) -> None:
+        """将本任务新增的样本累加到统计存储。"""
+        with self._lock:
+            if not self._store or not self._delta.n:
+                return
+            delta, self._delta = self._delta, OutputStats()
+        self._store.add(self._key, delta)
+
+
+class DispatchQueue:
+    """
+    待派发工作的优先队列：FIFO 按入队顺序，LJF 开销大者优先，SJF 开销小者优先，同开销按入队顺序。
+
+    线程安全，工作线程中产生的后续工作（如打包回退的单项）同样经此排队。
+    """
+
+    def __init__(self, policy: str):
+        """
+        Args:
+            policy (str): 派发策略，见 `POLICIES`。
+        """
+        self.policy = policy
+        self._heap: List[Tuple[float, int, Callable[..., Any], tuple]] = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def push(self, cost: float, fn: Callable[..., Any], *args: Any) -> None:
+        """
+        加入一项工作。
+
+        Args:
+            cost (float): 预估开销，FIFO 策略下忽略。
+            fn (Callable[..., Any]): 工作函数。
+            *args: 工作函数的参数。
+        """
+        priority = {POLICY_FIFO: 0.0, POLICY_LJF: -cost, POLICY_SJF: cost}[self.policy]
+        with self._lock:
+            heapq.heappush(self._heap, (priority, next(self._seq), fn, args))
+
+    def pop(self) -> Optional[Tuple[Callable[..., Any], tuple]]:
+        """取出优先级最高的工作 (函数, 参数)，队列为空时返回 None。"""
+        with self._lock:
+            if not self._heap:
+                return None
+            _, _, fn, args = heapq.heappop(self._heap)
+        return fn, args
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._heap)
+
+
+def order_items(items: Iterable[Tuple[int, str]], estimator: CostEstimator, policy: str) -> List[Tuple[int, str]]:
+    """
+    按派发策略对 (索引, 输入) 排序，供一次性创建全部任务的异步引擎使用。
+
+    Args:
+        items (Iterable[Tuple[int, str]]): (索引, 输入) 序列。
+        estimator (CostEstimator): 开销预估。
+        policy (str): 派发策略。
+
+    Returns:
+        List[Tuple[int, str]]: 排序后的列表；FIFO 保持原顺序。
+    """
+    items = list(items)
+    if policy == POLICY_FIFO:
+        return items
+    costs = {index: estimator.cost(item) for index, item in items}
+    return sorted(items, key=lambda entry: costs[entry[0]], reverse=policy == POLICY_LJF)
@@ -0,0 +1,262 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Collection, Dict, Iterator, List, Optional
+
+from config.model_config import model_dict, supplier_dict
+from config.runtime_config import endpoint_config
+from tool.retry import ERROR_AUTH, ERROR_NETWORK, ERROR_SERVER, ERROR_THROTTLE, classify_retry
+
+# 路由策略
+ROUTING_LEAST_OUTSTANDING = "least_outstanding"
+ROUTING_WEIGHTED = "weighted"
+
+# 计入熔断的错误类别：与端点自身状态相关，换一个端点可能成功
+BREAKER_ERRORS = frozenset({ERROR_AUTH, ERROR_THROTTLE, ERROR_SERVER, ERROR_NETWORK})
+
+# 熔断器状态
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+def supplier_keys(supplier: str) -> List[str]:
+    """
+    供应商配置的 API 密钥列表：`api` 可为单个密钥或密钥列表（密钥池）。
+
+    Args:
+        supplier (str): 供应商名称，对应 `supplier_dict` 的键。
+
+    Returns:
+        List[str]: 至少包含一个密钥的列表。
+    """
+    api = supplier_dict[supplier]["api"]
+    return list(api) if isinstance(api, (list, tuple)) else [api]
+
+
+class Endpoint:
+    """一个上游端点：(供应商, API 密钥) 组合，附带路由权重、在途数与熔断状态。"""
+
+    def __init__(self, supplier: str, api_key: str, index: int = 0, weight: float = 1.0):
+        """
+        Args:
+            supplier (str): 供应商名称。
+            api_key (str): 使用的 API 密钥。
+            index (int): 密钥在供应商密钥池中的序号。
+            weight (float): 路由权重。
+        """
+        self.supplier = supplier
+        self.api_key = api_key
+        self.url = supplier_dict[supplier]["url"]
+        self.id = supplier if index == 0 else f"{supplier}#{index}"
+        self.weight = max(float(weight), 0.01)
+        self.outstanding = 0
+        self.picks = 0
+        self.current = 0.0
+        self.state = STATE_CLOSED
+        self.failures = 0
+        self.open_until = 0.0
+        self.probing = False
+
+    def available(self, now: float) -> bool:
+        """是否可接收请求：熔断打开期间不可用，到期后仅放行一个探测请求。"""
+        if self.state == STATE_CLOSED:
+            return True
+        return now >= self.open_until and not self.probing
+
+
+class EndpointPool:
+    """
+    单个模型的端点池：按最少在途请求（按权重折算）或平滑加权轮询选择端点，并为每个端点维护熔断器。
+
+    端点连续失败达到阈值后熔断一段时间，期间请求自动改投其他端点；到期后放行一个探测请求，
+    成功则恢复，失败则再次熔断。所有端点均熔断时仍选择最早恢复者，避免请求直接失败。
+    """
+
+    def __init__(self, endpoints: List[Endpoint], routing: str = ROUTING_LEAST_OUTSTANDING,
+                 failure_threshold: int = 3, open_seconds: float = 30.0):
+        """
+        Args:
+            endpoints (List[Endpoint]): 端点列表，至少一个。
+            routing (str): 路由策略，`ROUTING_LEAST_OUTSTANDING` 或 `ROUTING_WEIGHTED`。
+            failure_threshold (int): 触发熔断的连续失败次数。
+            open_seconds (float): 熔断持续时间（秒）。
+        """
+        self.endpoints = endpoints
+        self.routing = routing
+        self.failure_threshold = max(int(failure_threshold), 1)
+        self.open_seconds = open_seconds
+        self._lock = threading.Lock()
+
+    def _choose_locked(self, candidates: List[Endpoint]) -> Endpoint:
+        """按路由策略从候选端点中选择一个，需持有锁调用。"""
+        if self.routing == ROUTING_WEIGHTED:
+            # 平滑加权轮询：各端点按权重累加，选中者减去总权重
+            total = sum(endpoint.weight for endpoint in candidates)
+            for endpoint in candidates:
+                endpoint.current += endpoint.weight
+            chosen = max(candidates, key=lambda endpoint: endpoint.current)
+            chosen.current -= total
+            return chosen
+        # 最少在途：按权重折算，平局时选被选次数最少者以轮转
+        return min(candidates, key=lambda endpoint: (endpoint.outstanding / endpoint.weight, endpoint.picks))
+
+    def acquire(self, exclude: Collection[str] = ()) -> Endpoint:
+        """
+        选择端点并计入在途请求，结束后需调用 `release`。
+
+        Args:
+            exclude (Collection[str]): 本次请求已尝试过的端点 ID。
+
+        Returns:
+            Endpoint: 选中的端点；候选均被排除时退回全部端点中选择。
+        """
+        with self._lock:
+            now = time.monotonic()
+            pool = [endpoint for endpoint in self.endpoints if endpoint.id not in exclude] or self.endpoints
+            candidates = [endpoint for endpoint in pool if endpoint.available(now)]
+            if candidates:
+                endpoint = self._choose_locked(candidates)
+            else:
+                endpoint = min(pool, key=lambda endpoint: endpoint.open_until)
+            if endpoint.state == STATE_OPEN and now >= endpoint.open_until:
+                endpoint.state = STATE_HALF_OPEN
+            if endpoint.state == STATE_HALF_OPEN:
+                endpoint.probing = True
+            endpoint.outstanding += 1
+            endpoint.picks += 1
+            return endpoint
+
+    def release(self, endpoint: Endpoint, exc: Optional[BaseException] = None) -> None:
+        """
+        结束一次请求并更新熔断状态。
+
+        Args:
+            endpoint (Endpoint): `acquire` 返回的端点。
+            exc (Optional[BaseException]): 请求失败时的异常，None 表示成功或被调用方主动结束。
+        """
+        kind = classify_retry(exc) if exc is not None else None
+        with self._lock:
+            endpoint.outstanding -= 1
+            probing, endpoint.probing = endpoint.probing, False
+            if kind is None:
+                endpoint.state = STATE_CLOSED
+                endpoint.failures = 0
+            elif kind in BREAKER_ERRORS:
+                endpoint.failures += 1
+                if probing or endpoint.failures >= self.failure_threshold:
+                    endpoint.state = STATE_OPEN
+                    endpoint.open_until = time.monotonic() + self.open_seconds
+
+    @contextmanager
+    def use(self, exclude: Collection[str] = ()) -> Iterator[Endpoint]:
+        """
+        在上下文内占用一个端点，退出时按是否抛出异常更新熔断状态。
+
+        Args:
+            exclude (Collection[str]): 本次请求已尝试过的端点 ID。
+
+        Yields:
+            Endpoint: 选中的端点。
+        """
+        endpoint = self.acquire(exclude)
+        try:
+            yield endpoint
+        except Exception as e:
+            self.release(endpoint, e)
+            raise
+        except BaseException:
+            # 调用方关闭流或任务被取消，不计入熔断
+            self.release(endpoint)
+            raise
+        else:
+            self.release(endpoint)
+
+    def can_failover(self, exc: BaseException, tried: Collection[str]) -> bool:
+        """
+        请求失败后是否应改投其他端点：错误与端点相关，且仍有未尝试的可用端点。
+
+        Args:
+            exc (BaseException): 请求抛出的异常。
+            tried (Collection[str]): 已尝试过的端点 ID。
+
+        Returns:
+            bool: 是否改投。
+        """
+        if classify_retry(exc) not in BREAKER_ERRORS:
+            return False
+        with self._lock:
+            now = time.monotonic()
+            return any(endpoint.id not in tried and endpoint.available(now) for endpoint in self.endpoints)
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """
+        读取各端点状态，用于展示与调试。
+
+        Returns:
+            List[Dict[str, Any]]: 每个端点的 `id`、`weight`、`outstanding`、`state` 与连续失败数 `failures`。
+        """
+        with self._lock:
+            return [
+                {
+                    "id": endpoint.id,
+                    "weight": endpoint.weight,
+                    "outstanding": endpoint.outstanding,
+                    "state": endpoint.state,
+                    "failures": endpoint.failures,
+                }
+                for endpoint in self.endpoints
+            ]
+
+
+def model_endpoints(input_model: str) -> List[Endpoint]:
+    """
+    展开模型的端点列表：`model_dict` 中的 `endpoints`（供应商名或含 `supplier`/`weight` 的字典）
+    优先于 `supplier`，每个供应商的密钥池中的每个密钥各为一个端点，并继承该项的权重。
+
+    Args:
+        input_model (str): 模型名称，对应 `model_dict` 的键。
+
+    Returns:
+        List[Endpoint]: 端点列表。
+    """
+    specs = model_dict[input_model].get("endpoints") or [model_dict[input_model]["supplier"]]
+    endpoints: List[Endpoint] = []
+    for spec in specs:
+        if isinstance(spec, str):
+            spec = {"supplier": spec}
+        weight = float(spec.get("weight", 1.0))
+        endpoints.extend(Endpoint(spec["supplier"], key, index, weight)
+                         for index, key in enumerate(supplier_keys(spec["supplier"])))
+    return endpoints
+
+
+_pools: Dict[str, EndpointPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_endpoint_pool(input_model: str) -> EndpointPool:
+    """
+    获取模型的进程级共享端点池，首次访问时按 `model_dict`、`supplier_dict` 与 `endpoint_config` 创建。
+
+    Args:
+        input_model (str): 模型名称。
+
+    Returns:
+        EndpointPool: 该模型的端点池。
+    """
+    pool = _pools.get(input_model)
+    if pool is not None:
+        return pool
+
+    with _pools_lock:
+        pool = _pools.get(input_model)
+        if pool is None:
+            pool = EndpointPool(
+                model_endpoints(input_model),
+                routing=endpoint_config["routing"],
+                failure_threshold=endpoint_config["failure_threshold"],
+                open_seconds=endpoint_config["open_seconds"],
+            )
+            _pools[input_model] = pool
+    return pool
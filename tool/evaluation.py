@@ -0,0 +1,392 @@
+import csv
+import difflib
+import importlib
+import itertools
+import json
+import threading
+import time
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+from config.function_config import function_dict
+from config.model_config import model_dict
+from tool.chat_batch import iter_chat_llm_batch
+from tool.token_count import count_tokens
+
+# 评分函数：(模型输出, 参考答案) -> [0, 1] 分数
+Scorer = Callable[[str, str], float]
+
+# 汇总表中用于挑选最快配置的指标，及其是否越小越好
+RANK_METRICS = {
+    "latency_p50": True,
+    "latency_p95": True,
+    "tokens_per_sec": False,
+}
+
+
+def _similarity(output: str, reference: str) -> float:
+    """输出与参考答案的字符级相似度（difflib 比率）。"""
+    return difflib.SequenceMatcher(None, output, reference, autojunk=False).ratio()
+
+
+def _contains(output: str, reference: str) -> float:
+    """输出是否包含参考答案。"""
+    return float(reference.strip() in output)
+
+
+def _exact(output: str, reference: str) -> float:
+    """去除首尾空白后是否与参考答案完全一致。"""
+    return float(output.strip() == reference.strip())
+
+
+SCORERS: Dict[str, Scorer] = {
+    "similarity": _similarity,
+    "contains": _contains,
+    "exact": _exact,
+}
+
+
+def get_scorer(name: str) -> Scorer:
+    """
+    按名称获取评分函数：内置名称见 `SCORERS`，也可为 `模块:函数` 形式的自定义函数。
+
+    Args:
+        name (str): 评分函数名称。
+
+    Returns:
+        Scorer: 接收 (模型输出, 参考答案)、返回 [0, 1] 分数的函数。
+
+    Raises:
+        ValueError: 名称既非内置评分函数，也不是 `模块:函数` 形式。
+    """
+    if name in SCORERS:
+        return SCORERS[name]
+    if ":" not in name:
+        raise ValueError(f"未知评分函数: {name}，可选 {', '.join(SCORERS)} 或 模块:函数")
+    module, attr = name.split(":", 1)
+    return getattr(importlib.import_module(module), attr)
+
+
+def load_dataset(lines: Iterable[str], input_format: str = "text", field: str = "text",
+                 reference_field: str = "reference") -> List[Dict[str, Optional[str]]]:
+    """
+    读取评测数据集：text 格式每个非空行为一条输入，jsonl 格式每行一个 JSON（字符串或对象）。
+
+    Args:
+        lines (Iterable[str]): 输入行，如打开的文件。
+        input_format (str): `text` 或 `jsonl`。
+        field (str): jsonl 对象中的输入字段名。
+        reference_field (str): jsonl 对象中的参考答案字段名，缺失时该条不参与质量评分。
+
+    Returns:
+        List[Dict[str, Optional[str]]]: 每条包含 `text` 与 `reference`（可为 None）。
+    """
+    dataset: List[Dict[str, Optional[str]]] = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if input_format == "jsonl":
+            record = json.loads(line)
+            if isinstance(record, str):
+                dataset.append({"text": record, "reference": None})
+            else:
+                reference = record.get(reference_field)
+                dataset.append({"text": str(record[field]),
+                                "reference": str(reference) if reference is not None else None})
+        else:
+            dataset.append({"text": line, "reference": None})
+    return dataset
+
+
+def make_grid(models: Sequence[str], top_ps: Sequence[float], temperatures: Sequence[float],
+              functions: Sequence[str], prompts: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
+    """
+    展开参数网格：模型 × top_p × temperature × 提示词的全组合。
+
+    Args:
+        models (Sequence[str]): 模型名称列表。
+        top_ps (Sequence[float]): top_p 取值列表。
+        temperatures (Sequence[float]): temperature 取值列表。
+        functions (Sequence[str]): 提示词名称列表，取自 `function_dict` 或 `prompts`。
+        prompts (Optional[Dict[str, str]]): 额外的自定义提示词（名称 -> 提示词），优先于 `function_dict`。
+
+    Returns:
+        List[Dict[str, Any]]: 每个单元格包含 `cell`（序号）、`model`、`top_p`、`temperature`、`function` 与 `prompt`。
+    """
+    prompts = {**function_dict, **(prompts or {})}
+    return [
+        {"cell": i, "model": model, "top_p": top_p, "temperature": temperature,
+         "function": function, "prompt": prompts[function]}
+        for i, (model, top_p, temperature, function)
+        in enumerate(itertools.product(models, top_ps, temperatures, functions))
+    ]
+
+
+def _quantile(values: List[float], q: float) -> Optional[float]:
+    """样本分位数，无样本时为 None。"""
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+def run_cell(cell: Dict[str, Any], dataset: List[Dict[str, Optional[str]]], scorer: Optional[Scorer] = None,
+             use_cache: bool = False, max_concurrent: Optional[int] = None,
+             session: Optional[str] = None) -> tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    以批量引擎对数据集执行一个单元格，逐项记录输出、耗时、token 用量与得分。
+
+    Args:
+        cell (Dict[str, Any]): `make_grid` 产生的单元格。
+        dataset (List[Dict[str, Optional[str]]]): `load_dataset` 产生的数据集。
+        scorer (Optional[Scorer]): 评分函数，None 表示不评分。
+        use_cache (bool): 是否读取响应缓存；评测默认关闭，以测得真实延迟。
+        max_concurrent (Optional[int]): 该单元格的并发数，以模型配置为上限。
+        session (Optional[str]): 调度会话标识，各单元格在全局调度器中轮转。
+
+    Returns:
+        tuple[List[Dict[str, Any]], Dict[str, Any]]: (逐项结果行, 单元格汇总，见 `summarize_cell`)。
+    """
+    elapsed: Dict[int, float] = {}
+
+    def on_item(event: Dict[str, object]) -> None:
+        # 仅完成态通知携带耗时
+        if "elapsed" in event:
+            elapsed[int(event["index"])] = float(event["elapsed"])
+
+    start = time.monotonic()
+    rows: List[Dict[str, Any]] = []
+    for index, output, error in iter_chat_llm_batch(
+            [item["text"] for item in dataset],
+            cell["model"],
+            cell["prompt"],
+            cell["top_p"],
+            cell["temperature"],
+            ordered=False,
+            on_item=on_item,
+            max_concurrent=max_concurrent,
+            use_cache=use_cache,
+            session=session,
+    ):
+        item = dataset[index]
+        reference = item["reference"]
+        rows.append({
+            "cell": cell["cell"],
+            "model": cell["model"],
+            "top_p": cell["top_p"],
+            "temperature": cell["temperature"],
+            "function": cell["function"],
+            "index": index,
+            "input": item["text"],
+            "output": output,
+            "error": error,
+            "latency": round(elapsed.get(index, 0.0), 3),
+            "input_tokens": count_tokens(cell["prompt"], cell["model"]) + count_tokens(item["text"], cell["model"]),
+            "output_tokens": 0 if error else count_tokens(output, cell["model"]),
+            "score": scorer(output, reference) if scorer and reference is not None and not error else None,
+        })
+    rows.sort(key=lambda row: row["index"])
+    return rows, summarize_cell(cell, rows, time.monotonic() - start)
+
+
+def summarize_cell(cell: Dict[str, Any], rows: List[Dict[str, Any]], wall: float) -> Dict[str, Any]:
+    """
+    汇总单元格指标。
+
+    Args:
+        cell (Dict[str, Any]): 单元格。
+        rows (List[Dict[str, Any]]): 该单元格的逐项结果行。
+        wall (float): 单元格总耗时（秒）。
+
+    Returns:
+        Dict[str, Any]: 单元格参数，以及 `items`、`errors`、`error_rate`、`latency_p50`/`latency_p95`（秒，成功项）、
+        `tokens_per_sec`（成功项输出 token 总数 / 其耗时总和）、`input_tokens`、`output_tokens`、
+        `quality`（有参考答案的成功项平均得分，无则为 None）与 `wall_seconds`。
+    """
+    succeeded = [row for row in rows if not row["error"]]
+    latencies = [row["latency"] for row in succeeded]
+    busy = sum(latencies)
+    scores = [row["score"] for row in succeeded if row["score"] is not None]
+    return {
+        "cell": cell["cell"],
+        "model": cell["model"],
+        "top_p": cell["top_p"],
+        "temperature": cell["temperature"],
+        "function": cell["function"],
+        "items": len(rows),
+        "errors": len(rows) - len(succeeded),
+        "error_rate": round((len(rows) - len(succeeded)) / len(rows), 4) if rows else None,
+        "latency_p50": _quantile(latencies, 0.5),
+        "latency_p95": _quantile(latencies, 0.95),
+        "tokens_per_sec": round(sum(row["output_tokens"] for row in succeeded) / busy, 1) if busy else None,
+        "input_tokens": sum(row["input_tokens"] for row in rows),
+        "output_tokens": sum(row["output_tokens"] for row in rows),
+        "quality": round(sum(scores) / len(scores), 4) if scores else None,
+        "wall_seconds": round(wall, 2),
+    }
+
+
+def run_evaluation(
+        dataset: List[Dict[str, Optional[str]]],
+        cells: List[Dict[str, Any]],
+        scorer: Optional[Scorer] = None,
+        use_cache: bool = False,
+        max_concurrent: Optional[int] = None,
+        max_cells: Optional[int] = None,
+        on_cell: Optional[Callable[[Dict[str, Any]], None]] = None,
+        isolate_suppliers: bool = True,
+) -> tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    并发执行整个参数网格：各单元格经批量引擎提交，实际并发由全局调度器按供应商容量、
+    自适应并发与 RPM/TPM 限额统一约束，各单元格以独立会话轮转派发。
+
+    单项延迟自开始处理起计，包含在调度器中排队的时间；同一供应商的单元格同时执行时会相互排队，
+    延迟取决于与谁并行而非配置本身。因此默认按供应商分组，组内单元格依次执行，不同供应商的组并发执行。
+
+    Args:
+        dataset (List[Dict[str, Optional[str]]]): 数据集。
+        cells (List[Dict[str, Any]]): 参数网格。
+        scorer (Optional[Scorer]): 评分函数。
+        use_cache (bool): 是否读取响应缓存。
+        max_concurrent (Optional[int]): 每个单元格的并发数，以模型配置为上限。
+        max_cells (Optional[int]): 同时执行的单元格数（按供应商分组时为同时执行的组数），默认全部同时执行。
+        on_cell (Optional[Callable[[Dict[str, Any]], None]]): 单元格完成回调，参数为其汇总。
+        isolate_suppliers (bool): 同一供应商的单元格是否依次执行；关闭后全部并发，更快但延迟指标相互干扰。
+
+    Returns:
+        tuple[List[Dict[str, Any]], List[Dict[str, Any]]]: (全部逐项结果行, 按单元格序号排列的汇总)。
+    """
+    rows: List[Dict[str, Any]] = []
+    summaries: List[Dict[str, Any]] = []
+    lock = threading.Lock()
+
+    def run(cell: Dict[str, Any]) -> None:
+        cell_rows, summary = run_cell(cell, dataset, scorer, use_cache, max_concurrent,
+                                      session=f"eval-{cell['cell']}")
+        with lock:
+            rows.extend(cell_rows)
+            summaries.append(summary)
+        if on_cell:
+            on_cell(summary)
+
+    def run_group(group: List[Dict[str, Any]]) -> None:
+        for cell in group:
+            run(cell)
+
+    if isolate_suppliers:
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        for cell in cells:
+            groups.setdefault(model_dict[cell["model"]]["supplier"], []).append(cell)
+        batches = list(groups.values())
+    else:
+        batches = [[cell] for cell in cells]
+
+    with ThreadPoolExecutor(max_workers=max(min(max_cells or len(batches), len(batches)), 1)) as executor:
+        for future in [executor.submit(run_group, group) for group in batches]:
+            future.result()
+
+    rows.sort(key=lambda row: (row["cell"], row["index"]))
+    summaries.sort(key=lambda summary: summary["cell"])
+    return rows, summaries
+
+
+def pick_best(summaries: List[Dict[str, Any]], quality_threshold: Optional[float] = None,
+              max_error_rate: float = 0.0, rank_by: str = "latency_p50") -> Optional[Dict[str, Any]]:
+    """
+    挑选满足质量阈值与错误率上限的最快配置。
+
+    Args:
+        summaries (List[Dict[str, Any]]): 单元格汇总。
+        quality_threshold (Optional[float]): 最低平均得分，None 表示不限；设置后无得分的单元格不参与挑选。
+        max_error_rate (float): 允许的最大错误率。
+        rank_by (str): 排序指标，见 `RANK_METRICS`。
+
+    Returns:
+        Optional[Dict[str, Any]]: 最佳单元格的汇总，无满足条件者时为 None。
+    """
+    ascending = RANK_METRICS[rank_by]
+    candidates = [
+        summary for summary in summaries
+        if summary[rank_by] is not None
+        and (summary["error_rate"] or 0) <= max_error_rate
+        and (quality_threshold is None
+             or (summary["quality"] is not None and summary["quality"] >= quality_threshold))
+    ]
+    if not candidates:
+        return None
+    return min(candidates, key=lambda summary: summary[rank_by] if ascending else -summary[rank_by])
+
+
+# 汇总表的列：(键, 表头)
+_SUMMARY_COLUMNS = [
+    ("cell", "#"), ("model", "模型"), ("top_p", "top_p"), ("temperature", "temp"), ("function", "提示词"),
+    ("items", "条数"), ("error_rate", "错误率"), ("latency_p50", "p50(s)"), ("latency_p95", "p95(s)"),
+    ("tokens_per_sec", "tok/s"), ("input_tokens", "输入tok"), ("output_tokens", "输出tok"),
+    ("quality", "质量"), ("wall_seconds", "总耗时(s)"),
+]
+
+
+def format_summary_table(summaries: List[Dict[str, Any]], best: Optional[Dict[str, Any]] = None) -> str:
+    """
+    将单元格汇总渲染为对齐的文本表格，最佳配置以 `*` 标记。
+
+    Args:
+        summaries (List[Dict[str, Any]]): 单元格汇总。
+        best (Optional[Dict[str, Any]]): `pick_best` 的结果。
+
+    Returns:
+        str: 表格文本。
+    """
+    def cell_text(value: Any) -> str:
+        if value is None:
+            return "-"
+        return f"{value:.3g}" if isinstance(value, float) else str(value)
+
+    def width(text: str) -> int:
+        # 全角字符按两列计算，保证中英混排时对齐
+        return sum(2 if unicodedata.east_asian_width(char) in "WF" else 1 for char in text)
+
+    header = [title for _, title in _SUMMARY_COLUMNS]
+    body = [[cell_text(summary[key]) for key, _ in _SUMMARY_COLUMNS] for summary in summaries]
+    widths = [max(width(row[i]) for row in [header] + body) for i in range(len(header))]
+    lines = []
+    for row, summary in zip([header] + body, [None] + summaries):
+        mark = "*" if best is not None and summary is best else " "
+        lines.append(mark + " " + "  ".join(text + " " * (size - width(text)) for text, size in zip(row, widths)).rstrip())
+    return "\n".join(lines)
+
+
+# 结果文件的列顺序
+RESULT_COLUMNS = ["cell", "model", "top_p", "temperature", "function", "index", "input", "output", "error",
+                  "latency", "input_tokens", "output_tokens", "score"]
+
+
+def write_results(rows: List[Dict[str, Any]], path: str) -> None:
+    """
+    按列写出逐项结果，格式由扩展名决定：`.parquet`（需安装 pyarrow）、`.jsonl`，其余为 CSV。
+
+    Args:
+        rows (List[Dict[str, Any]]): 逐项结果行。
+        path (str): 输出路径。
+
+    Raises:
+        ImportError: 写出 Parquet 但未安装 pyarrow。
+    """
+    if path.endswith(".parquet"):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("写出 Parquet 需要安装 pyarrow：pip install pyarrow") from e
+        pq.write_table(pa.table({column: [row[column] for row in rows] for column in RESULT_COLUMNS}), path)
+    elif path.endswith(".jsonl"):
+        with open(path, "w", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps({column: row[column] for column in RESULT_COLUMNS}, ensure_ascii=False) + "\n")
+    else:
+        with open(path, "w", encoding="utf-8-sig", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=RESULT_COLUMNS, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(rows)
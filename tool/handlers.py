@@ -0,0 +1,451 @@
+import threading
+import queue
+import time
+from typing import Any, Callable, Iterator, Optional, Tuple
+
+import config.model_config as model_config
+from config.function_config import function_dict
+from config.runtime_config import compare_config, stream_config
+from tool.chat import chat_llm_stream
+from tool.chat_batch import chat_llm_batch, chat_llm_batch_asyncio, resume_batch_job
+from tool.compare import compare_stream
+from tool.conversation import get_conversation_store
+from tool.dispatch import POLICY_FIFO, POLICY_LJF, POLICY_SJF
+from tool.job_journal import get_job_journal, make_job_id
+from tool.output_buffer import SegmentBuffer
+from tool.retry import format_error_counts
+from tool.stream_adapter import coalesce_stream
+from tool.text_process import iter_text_split
+from tool.token_count import chunk_token_budget, get_token_counter
+
+# ==== Shared Defaults ====
+DEFAULT_TOP_P = 0.7
+DEFAULT_TEMPERATURE = 0.9
+
+model_choices = list(model_config.model_dict.keys())
+
+# BatchAgent 执行引擎：线程池（默认）或 asyncio 协程
+BA_engines = {
+    "线程": chat_llm_batch,
+    "异步": chat_llm_batch_asyncio,
+}
+
+# BatchAgent 派发策略，见 `tool.dispatch`
+BA_policies = {
+    "按顺序": POLICY_FIFO,
+    "大项优先": POLICY_LJF,
+    "小项优先": POLICY_SJF,
+}
+
+
+def format_progress_md(status: dict | None = None) -> str:
+    """
+    渲染批量进度面板的 Markdown 文本。
+
+    Args:
+        status (Optional[dict]): 进度字典，包含 `total`、`processed` 与可选的 `concurrency`、`queue_wait`、`retries`、`failures`、`hedges`、`packing`、`metrics` 等键。
+
+    Returns:
+        str: 进度面板 Markdown 字符串。
+    """
+    total = (status or {}).get("total", 0)
+    processed = (status or {}).get("processed", 0)
+    concurrency = (status or {}).get("concurrency")
+    queue_wait = (status or {}).get("queue_wait")
+    retries = format_error_counts((status or {}).get("retries"))
+    failures = format_error_counts((status or {}).get("failures"))
+    hedges = (status or {}).get("hedges")
+    packing = (status or {}).get("packing")
+    metrics = format_metrics((status or {}).get("metrics"))
+    return (
+        f"**批量处理进度{processed}/{total}**"
+        + (f"　当前并发 {concurrency}" if concurrency is not None else "")
+        + (f"　平均排队 {queue_wait:.1f}s" if queue_wait is not None else "")
+        + (f"　重试 {retries}" if retries else "")
+        + (f"　失败 {failures}" if failures else "")
+        + (f"　对冲胜出 {hedges['wins']}/{hedges['launched']}，约节省 {hedges['saved']:.1f}s"
+           if hedges and hedges["launched"] else "")
+        + (f"　打包 {packing['packed']} 项/{packing['packs']} 次请求"
+           + (f"，回退 {packing['fallbacks']}" if packing["fallbacks"] else "")
+           if packing and packing["packs"] else "")
+        + (f"\n\n{metrics}" if metrics else "")
+    )
+
+
+def format_metrics(summary: dict | None) -> str:
+    """
+    渲染实时指标摘要，如 "TTFT p50 0.8s / p95 2.1s　吞吐 350 tok/s"。
+
+    Args:
+        summary (Optional[dict]): `MetricsRegistry.summary` 的返回值。
+
+    Returns:
+        str: 渲染结果，无样本时为空字符串。
+    """
+    summary = summary or {}
+    parts = []
+    if summary.get("ttft_p50") is not None:
+        parts.append(f"TTFT p50 {summary['ttft_p50']:.2f}s / p95 {summary['ttft_p95']:.2f}s")
+    if summary.get("tokens_per_sec") is not None:
+        parts.append(f"吞吐 {summary['tokens_per_sec']:.0f} tok/s")
+    if summary.get("coalesce_rate"):
+        parts.append(f"合并 {summary['coalesce_rate']:.0%}")
+    return "　".join(parts)
+
+
+def format_compare_stats(snapshot: dict | None = None) -> str:
+    """
+    渲染单路对比的指标，如 "TTFT 0.42s　52 tok/s　总耗时 6.3s"。
+
+    Args:
+        snapshot (Optional[dict]): `CompareStream.snapshot` 的返回值，None 表示尚未提交。
+
+    Returns:
+        str: 指标文本。
+    """
+    if not snapshot:
+        return "TTFT --　-- tok/s　总耗时 --"
+    parts = [f"TTFT {snapshot['ttft']:.2f}s" if snapshot["ttft"] is not None else "等待首 token"]
+    if snapshot["tokens_per_sec"] is not None:
+        parts.append(f"{snapshot['tokens_per_sec']:.0f} tok/s")
+    parts.append(f"{'总耗时' if snapshot['done'] else '已用'} {snapshot['elapsed']:.1f}s")
+    if snapshot["error"]:
+        parts.append("失败")
+    return "　".join(parts)
+
+
+def MFG_respond(
+        input_text: str,
+        input_model: str,
+        input_function: str = "NONE",
+        self_prompt_text: Optional[str] = None,
+        input_top_p: float = 0.7,
+        input_temperature: float = 0.9,
+        session: Optional[str] = None,
+        multi_turn: bool = False,
+) -> Iterator[str]:
+    """
+    使用指定功能或自定义提示词进行对话，并以流式方式返回模型输出。
+
+    Args:
+        input_text (str): 用户输入的文本。
+        input_model (str): 模型名称，需存在于 `model_config.model_dict` 中。
+        input_function (str): 预设功能键，用于从 `function_dict` 选择系统提示词。
+        self_prompt_text (Optional[str]): 自定义系统提示词，若提供则覆盖预设功能提示词。
+        input_top_p (float): nucleus sampling 参数，范围 [0, 1]。
+        input_temperature (float): 输出多样性温度，范围 [0, 1]。
+        session (Optional[str]): 界面会话标识，请求以交互优先级经全局调度器派发。
+        multi_turn (bool): 是否连续对话：按会话保留历史并随请求发送（见 `tool.conversation`），
+            需提供 `session`；完整结束的一轮才会记入历史。
+
+    Yields:
+        str: 累积的模型输出文本（按刷新节拍逐步追加）。
+    """
+    prompt = function_dict[input_function]
+    if self_prompt_text:
+        prompt = self_prompt_text
+
+    if not (multi_turn and session):
+        yield from coalesce_stream(chat_llm_stream(
+            input_text, input_model, prompt, input_top_p, input_temperature, session=session,
+        ))
+        return
+
+    conversation = get_conversation_store().get(session)
+    history, history_tokens = conversation.context(input_model, prompt, input_text)
+    output = ""
+    for output in coalesce_stream(chat_llm_stream(
+            input_text, input_model, prompt, input_top_p, input_temperature, session=session,
+            history=history, history_tokens=history_tokens,
+    )):
+        yield output
+    conversation.append(input_model, input_text, output)
+
+
+def MFG_clear(session: Optional[str] = None) -> Tuple[str, str]:
+    """
+    清空 MultiFunctionGPT 标签页的输入与输出，并清除该会话的对话历史。
+
+    Args:
+        session (Optional[str]): 界面会话标识。
+
+    Returns:
+        tuple[str, str]: 置空后的输入文本与输出文本。
+    """
+    if session:
+        get_conversation_store().discard(session)
+    return "", ""
+
+
+def MFG_init() -> Tuple[str, str, float, float]:
+    """
+    初始化 MultiFunctionGPT 标签页，设置默认输入与采样参数。
+
+    Returns:
+        tuple[str, str, float, float]: 空输入、空输出、默认 `top_p` 与 `temperature`。
+    """
+    return "", "", DEFAULT_TOP_P, DEFAULT_TEMPERATURE
+
+
+def BA_respond(
+        prompt: str,
+        text: str,
+        function: str,
+        input_model: str,
+        input_top_p: float = 0.7,
+        input_temperature: float = 0.9,
+        engine: str = "线程",
+        use_cache: bool = True,
+        session: Optional[str] = None,
+        pack: bool = False,
+        policy: Optional[str] = None,
+) -> Iterator[Tuple[str, str]]:
+    """
+    批量代理入口：根据功能类型将输入文本切分为列表并并发处理。
+
+    每次提交生成新的任务 ID 并逐项写入任务日志；中断后可经 `BA_resume` 续跑，仅重新处理未完成与失败的项。
+
+    Args:
+        prompt (str): 自定义系统提示词，若提供则覆盖预设功能提示词。
+        text (str): 需要批量处理的原始文本（多行或长文本）。
+        function (str): 批量功能类型，支持 "列表任务" 或 "长任务"。
+        input_model (str): 模型名称，需存在于 `model_config.model_dict` 中。
+        input_top_p (float): nucleus sampling 参数，范围 [0, 1]。
+        input_temperature (float): 输出多样性温度，范围 [0, 1]。
+        engine (str): 执行引擎，"线程" 使用线程池，"异步" 使用 asyncio 协程引擎。
+        use_cache (bool): 是否使用响应缓存；未变化的段落直接回放缓存结果。
+        session (Optional[str]): 界面会话标识，各项以批量优先级经全局调度器派发，与其他会话轮转。
+        pack (bool): 列表任务是否将短条目打包为一次请求（见 `chat_llm_batch`）；打包仅由线程引擎支持。
+        policy (Optional[str]): 派发策略，`BA_policies` 的标签或策略名，默认取 `dispatch_config`。
+
+    Yields:
+        tuple[str, str]: (输出文本, 右下角进度面板 HTML)。输出文本在处理结束时返回最终结果，进度面板会实时刷新。
+    """
+    if function == "列表任务":
+        text_list = text.split("\n")
+        text_list = [i.strip() for i in text_list if i.strip() != ""]
+    elif function == "长任务":
+        # 按 token 预算流式切分：扣除系统提示词与预留输出后的输入上限，切分与执行并行
+        text_list = iter_text_split(text, chunk_token_budget(input_model, prompt), get_token_counter(input_model))
+    else:
+        text_list = [text]
+
+    job_id = make_job_id()
+    batch_fn = BA_engines.get(engine, chat_llm_batch)
+    # 打包仅对列表任务生效，且由线程引擎执行
+    pack_kwargs = {}
+    if pack and function == "列表任务":
+        batch_fn, pack_kwargs = chat_llm_batch, {"pack": True}
+
+    def run(on_progress, on_item) -> str:
+        return batch_fn(
+            text_list,
+            input_model,
+            prompt,
+            input_top_p,
+            input_temperature,
+            on_progress=on_progress,
+            on_item=on_item,
+            use_cache=use_cache,
+            job_id=job_id,
+            session=session,
+            policy=BA_policies.get(policy, policy),
+            **pack_kwargs,
+        )
+
+    known_total = len(text_list) if isinstance(text_list, list) else 0
+    yield from _BA_stream(run, known_total)
+
+
+def BA_resume(job_id: Optional[str], engine: str = "线程",
+              session: Optional[str] = None) -> Iterator[Tuple[str, str]]:
+    """
+    续跑任务日志中未完成的批量任务，仅调度未完成与失败的项。
+
+    Args:
+        job_id (Optional[str]): 任务 ID，来自可续跑任务列表。
+        engine (str): 执行引擎，同 `BA_respond`。
+        session (Optional[str]): 界面会话标识，同 `BA_respond`。
+
+    Yields:
+        tuple[str, str]: (输出文本, 进度面板 Markdown)，同 `BA_respond`。
+    """
+    if not job_id:
+        yield "", format_progress_md()
+        return
+
+    batch_fn = BA_engines.get(engine, chat_llm_batch)
+
+    def run(on_progress, on_item) -> str:
+        return resume_batch_job(job_id, on_progress=on_progress, on_item=on_item, batch_fn=batch_fn,
+                                session=session)
+
+    yield from _BA_stream(run, 0)
+
+
+def BA_list_jobs() -> list[Tuple[str, str]]:
+    """
+    列出可续跑的批量任务，供下拉框展示。
+
+    Returns:
+        list[tuple[str, str]]: (展示标签, 任务 ID) 列表，按最近更新时间倒序。
+    """
+    journal = get_job_journal()
+    if journal is None:
+        return []
+    return [
+        (f"{time.strftime('%m-%d %H:%M', time.localtime(job['updated']))} | {job['model']} | "
+         f"{job['done']}/{job['total']} | {job['title']}", job["job_id"])
+        for job in journal.list_resumable()
+    ]
+
+
+def _BA_stream(run: Callable[[Callable, Callable], str], known_total: int) -> Iterator[Tuple[str, str]]:
+    """
+    在后台线程执行批量任务，并按刷新节拍产出 (输出文本, 进度面板)。
+
+    Args:
+        run (Callable[[Callable, Callable], str]): 接收 (on_progress, on_item) 并返回最终结果的执行函数。
+        known_total (int): 已知的项总数；惰性切分时为 0，随进度更新。
+
+    Yields:
+        tuple[str, str]: (输出文本, 进度面板 Markdown)。
+    """
+    progress_queue: queue.Queue[str | None] = queue.Queue()
+    final_result: dict = {"text": None}
+    last_status: dict = {"total": known_total, "processed": 0}
+    # 按索引分段的输出缓冲：回调只修改对应分段，合并推迟到界面刷新时
+    output_buffer = SegmentBuffer(known_total)
+
+    def on_progress(status: dict) -> None:
+        last_status.update(status)
+        progress_queue.put(format_progress_md(status))
+
+    def worker() -> None:
+        try:
+            final_result["text"] = run(on_progress, output_buffer.apply)
+        except Exception as e:
+            final_result["text"] = f"错误: {str(e)}"
+        finally:
+            # 通知生成器结束
+            progress_queue.put(None)  # type: ignore
+
+    threading.Thread(target=worker, daemon=True).start()
+
+    # 初始面板
+    current_output: str = ""
+    current_progress: str = format_progress_md(last_status)
+    yield current_output, current_progress
+
+    # 实时刷新面板与输出：按刷新节拍推送，输出仅在有分段变化时惰性合并
+    flush_interval = stream_config["flush_interval"]
+    last_flush = 0.0
+    updated = False
+    while True:
+        try:
+            md = progress_queue.get(timeout=flush_interval)
+            if md is None:
+                break
+            current_progress = md
+            updated = True
+        except queue.Empty:
+            pass
+
+        if time.monotonic() - last_flush < flush_interval:
+            continue
+
+        if output_buffer.dirty:
+            current_output = output_buffer.render()
+            updated = True
+
+        if updated:
+            last_flush = time.monotonic()
+            updated = False
+            yield current_output, current_progress
+
+    # 返回最终结果与最终面板
+    final_text = final_result["text"] or ""
+    yield final_text, format_progress_md({
+        **last_status,
+        "processed": last_status["total"],
+    })
+
+
+def BA_clear() -> Tuple[str, str, str, str]:
+    """
+    清空 BatchAgent 标签页的输入、提示词与输出。
+
+    Returns:
+        tuple[str, str, str, str]: 空输入、空提示词、空输出、默认进度面板。
+    """
+    return "", "", "", format_progress_md()
+
+
+def MC_respond_single(
+        input_text: str,
+        input_model: str,
+        prompt_text: str,
+        input_top_p: float,
+        input_temperature: float,
+        session: Optional[str] = None,
+) -> Iterator[Tuple[str, str]]:
+    """
+    单模型比较：对输入文本执行一次流式对话并逐步返回结果与指标。
+
+    Args:
+        input_text (str): 用户输入文本。
+        input_model (str): 模型名称。
+        prompt_text (str): 系统提示词。
+        input_top_p (float): nucleus sampling 参数。
+        input_temperature (float): 输出多样性温度。
+        session (Optional[str]): 界面会话标识，请求以交互优先级经全局调度器派发。
+
+    Yields:
+        tuple[str, str]: (累积的模型输出文本, 指标文本)。
+    """
+    for (snapshot,) in compare_stream(input_text, prompt_text, [(input_model, input_top_p, input_temperature)],
+                                      session=session):
+        yield snapshot["text"], format_compare_stats(snapshot)
+
+
+def MC_respond_compare(
+        input_text: str,
+        prompt_text: str,
+        session: Optional[str],
+        *panels: Any,
+) -> Iterator[Tuple[str, ...]]:
+    """
+    多模型并行比较：同时对 N 路（模型, top_p, temperature）进行流式生成，逐步返回各自的累积输出与指标。
+
+    Args:
+        input_text (str): 用户输入文本。
+        prompt_text (str): 系统提示词。
+        session (Optional[str]): 界面会话标识，各路以交互优先级经全局调度器派发。
+        *panels: 依次为每一路的模型名称、top_p 与 temperature，路数由参数个数决定。
+
+    Yields:
+        tuple[str, ...]: 每一路依次为 (累积输出文本, 指标文本)。
+    """
+    configs = [tuple(panels[i:i + 3]) for i in range(0, len(panels), 3)]
+    for snapshots in compare_stream(input_text, prompt_text, configs, session=session):
+        yield tuple(value for snapshot in snapshots for value in (snapshot["text"], format_compare_stats(snapshot)))
+
+
+def MC_clear() -> Tuple[str, ...]:
+    """
+    清空 ModelComparison 标签页的输入、提示词与各路输出。
+
+    Returns:
+        tuple[str, ...]: 空输入、空提示词，以及每一路的空输出与默认指标文本（路数取 `compare_config["panels"]`）。
+    """
+    return ("", "") + ("", format_compare_stats()) * compare_config["panels"]
+
+
+def MC_clear_single() -> Tuple[str, str]:
+    """
+    清空单个模型的输出框与指标。
+
+    Returns:
+        tuple[str, str]: 空字符串与默认指标文本。
+    """
+    return "", format_compare_stats()
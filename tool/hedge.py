@@ -0,0 +1,401 @@
+import asyncio
+import inspect
+import queue
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Iterator, List, Optional
+
+from config.runtime_config import hedge_config
+from tool.chat import StreamCancelled, StreamHandle
+from tool.token_count import count_tokens
+
+# 对冲竞速中的事件类型
+_CHUNK = "chunk"
+_DONE = "done"
+_ERROR = "error"
+
+# 参与统计的最近样本数
+_SAMPLE_WINDOW = 256
+
+
+class HedgeStats:
+    """对冲统计：发起次数、对冲胜出次数与估算节省的时长，线程安全，随进度推送。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.launched = 0
+        self.wins = 0
+        self.saved = 0.0
+
+    def record_launch(self) -> None:
+        """记录一次对冲发起。"""
+        with self._lock:
+            self.launched += 1
+
+    def record_win(self, saved: float) -> None:
+        """
+        记录一次对冲胜出。
+
+        Args:
+            saved (float): 相比等待原请求估算节省的秒数。
+        """
+        with self._lock:
+            self.wins += 1
+            self.saved += saved
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns:
+            Dict[str, Dict[str, Any]]: `hedges` -> 包含 `launched`、`wins` 与 `saved`（秒）的字典。
+        """
+        with self._lock:
+            return {"hedges": {"launched": self.launched, "wins": self.wins, "saved": round(self.saved, 2)}}
+
+
+class _Attempt:
+    """竞速中的一路请求：记录模型、起止时间与已收到的输出。"""
+
+    def __init__(self, input_model: str):
+        self.input_model = input_model
+        self.start = time.monotonic()
+        self.first_token: Optional[float] = None
+        self.parts: List[str] = []
+        self.error: Optional[BaseException] = None
+
+    @property
+    def text(self) -> str:
+        return "".join(self.parts)
+
+    def rate(self, now: float) -> Optional[float]:
+        """首 token 之后的生成速率（token/秒），尚未开始生成时为 None。"""
+        if self.first_token is None or now <= self.first_token:
+            return None
+        return count_tokens(self.text, self.input_model) / (now - self.first_token)
+
+
+class Hedger:
+    """
+    单个批量任务的对冲器：从本任务已完成的请求中学习首 token 延迟（TTFT）分布与生成速率，
+    对首 token 等待超过分位数阈值、或生成速率远低于中位数的项再发一份副本（可改投备用模型），
+    先完整结束者胜出，另一路随即取消；对冲次数受预算比例约束。
+
+    线程引擎中各路请求在对冲器自有的有界线程池中消费，任务结束时以 `close()`（或 `with` 语句）等待其退出。
+    """
+
+    def __init__(self, input_model: str, alternate_model: Optional[str] = None,
+                 stats: Optional[HedgeStats] = None, max_concurrent: int = 1):
+        """
+        Args:
+            input_model (str): 原请求使用的模型。
+            alternate_model (Optional[str]): 对冲请求使用的模型，默认与原请求相同。
+            stats (Optional[HedgeStats]): 由调用方持有的统计，默认新建。
+            max_concurrent (int): 任务的并发数；每个在途项至多原请求与对冲请求两路，线程池以其 2 倍为上限。
+        """
+        self.input_model = input_model
+        self.alternate_model = alternate_model or input_model
+        self.stats = stats or HedgeStats()
+        self.max_concurrent = max(int(max_concurrent), 1)
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._ttft: Deque[float] = deque(maxlen=_SAMPLE_WINDOW)
+        self._rates: Deque[float] = deque(maxlen=_SAMPLE_WINDOW)
+        self._items = 0
+
+    def __enter__(self) -> "Hedger":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """等待各路请求线程退出并关闭线程池；落败的一路已被中止，不会长时间阻塞。"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=True)
+
+    def _submit(self, fn: Callable[..., None], *args: Any) -> None:
+        """在对冲器的有界线程池中执行一路请求，线程池首次使用时创建。"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=2 * self.max_concurrent,
+                                                    thread_name_prefix="hedge")
+            executor = self._executor
+        executor.submit(fn, *args)
+
+    def begin_item(self) -> None:
+        """登记一个开始处理的项，用于计算对冲预算。"""
+        with self._lock:
+            self._items += 1
+
+    def _record(self, attempt: _Attempt, now: float) -> None:
+        """以完整结束的请求更新 TTFT 与速率样本。"""
+        if attempt.first_token is None:
+            return
+        rate = attempt.rate(now)
+        with self._lock:
+            self._ttft.append(attempt.first_token - attempt.start)
+            if rate:
+                self._rates.append(rate)
+
+    def ttft_threshold(self) -> Optional[float]:
+        """
+        首 token 等待阈值：TTFT 样本的 `ttft_percentile` 分位数，不低于 `min_delay`。
+
+        Returns:
+            Optional[float]: 阈值（秒），样本不足时为 None。
+        """
+        with self._lock:
+            if len(self._ttft) < hedge_config["min_samples"]:
+                return None
+            samples = sorted(self._ttft)
+        index = min(int(len(samples) * hedge_config["ttft_percentile"]), len(samples) - 1)
+        return max(samples[index], hedge_config["min_delay"])
+
+    def median_rate(self) -> Optional[float]:
+        """
+        Returns:
+            Optional[float]: 生成速率样本的中位数（token/秒），样本不足时为 None。
+        """
+        with self._lock:
+            if len(self._rates) < hedge_config["min_samples"]:
+                return None
+            return statistics.median(self._rates)
+
+    def _due(self, attempt: _Attempt, now: float) -> bool:
+        """原请求是否已落入长尾：首 token 超时未到，或生成速率远低于中位数。"""
+        if attempt.first_token is None:
+            threshold = self.ttft_threshold()
+            return threshold is not None and now - attempt.start >= threshold
+        if now - attempt.first_token < hedge_config["slow_after"]:
+            return False
+        median = self.median_rate()
+        rate = attempt.rate(now)
+        return median is not None and rate is not None and rate < median * hedge_config["slow_ratio"]
+
+    def _take_budget(self) -> bool:
+        """占用一次对冲预算，超出预算时返回 False。"""
+        with self._lock:
+            if self.stats.launched >= max(int(self._items * hedge_config["budget_ratio"]), 1):
+                return False
+            self.stats.record_launch()
+            return True
+
+    def run(self, start_stream: Callable[[str, StreamHandle], Iterator[str]],
+            on_delta: Optional[Callable[[str], None]] = None) -> str:
+        """
+        以对冲方式执行一次流式请求。
+
+        各路请求在对冲器的线程池中消费；决出胜者（或全部失败）后，协调方经中止句柄直接关闭其余各路的响应流，
+        停滞的一路也会立即归还线程、调度槽位与连接。
+
+        Args:
+            start_stream (Callable[[str, StreamHandle], Iterator[str]]): 按模型名发起一次流式请求，
+                并将响应流登记到给定的中止句柄。
+            on_delta (Optional[Callable[[str], None]]): 原请求的增量回调；发起对冲后不再推送增量。
+
+        Returns:
+            str: 胜出请求的完整输出。
+
+        Raises:
+            Exception: 所有请求均失败时抛出原请求的异常。
+        """
+        race = _Race(self)
+        events: "queue.Queue[tuple[int, str, Any]]" = queue.Queue()
+        cancel = threading.Event()
+        handles: List[StreamHandle] = []
+
+        def pump(index: int, input_model: str, handle: StreamHandle) -> None:
+            try:
+                stream = start_stream(input_model, handle)
+                try:
+                    for chunk in stream:
+                        if cancel.is_set():
+                            return
+                        events.put((index, _CHUNK, chunk))
+                finally:
+                    close = getattr(stream, "close", None)
+                    if close:
+                        close()
+                events.put((index, _DONE, None))
+            except StreamCancelled:
+                pass
+            except Exception as e:
+                events.put((index, _ERROR, e))
+
+        def launch(index: int, input_model: str) -> None:
+            handle = StreamHandle()
+            handles.append(handle)
+            self._submit(pump, index, input_model, handle)
+
+        launch(0, self.input_model)
+        try:
+            while True:
+                try:
+                    index, kind, payload = events.get(timeout=race.poll_timeout())
+                except queue.Empty:
+                    pass
+                else:
+                    if kind == _CHUNK:
+                        if race.on_chunk(index, payload) and on_delta:
+                            on_delta(payload)
+                    elif kind == _DONE:
+                        return race.finish(index)
+                    else:
+                        race.fail(index, payload)
+                model = race.maybe_hedge()
+                if model:
+                    launch(1, model)
+        finally:
+            cancel.set()
+            # 与 `run_async` 取消任务相同：直接关闭其余各路的响应流，不等待其下一个增量
+            for handle in handles:
+                handle.cancel()
+
+    async def run_async(self, start_stream: Callable[[str], AsyncIterator[str]],
+                        on_delta: Optional[Callable[[str], Any]] = None) -> str:
+        """`run` 的协程版本：各路请求为独立任务，落败一路直接取消。"""
+        race = _Race(self)
+        events: "asyncio.Queue[tuple[int, str, Any]]" = asyncio.Queue()
+        tasks: List["asyncio.Task[None]"] = []
+
+        async def pump(index: int, input_model: str) -> None:
+            try:
+                async for chunk in start_stream(input_model):
+                    events.put_nowait((index, _CHUNK, chunk))
+                events.put_nowait((index, _DONE, None))
+            except Exception as e:
+                events.put_nowait((index, _ERROR, e))
+
+        tasks.append(asyncio.create_task(pump(0, self.input_model)))
+        try:
+            while True:
+                try:
+                    index, kind, payload = await asyncio.wait_for(events.get(), race.poll_timeout())
+                except asyncio.TimeoutError:
+                    pass
+                else:
+                    if kind == _CHUNK:
+                        if race.on_chunk(index, payload) and on_delta:
+                            result = on_delta(payload)
+                            if inspect.isawaitable(result):
+                                await result
+                    elif kind == _DONE:
+                        return race.finish(index)
+                    else:
+                        race.fail(index, payload)
+                model = race.maybe_hedge()
+                if model:
+                    tasks.append(asyncio.create_task(pump(1, model)))
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class _Race:
+    """一次对冲竞速的状态：原请求与至多一路对冲请求，供同步与协程两种驱动共用。"""
+
+    def __init__(self, hedger: Hedger):
+        self.hedger = hedger
+        self.attempts = [_Attempt(hedger.input_model)]
+        self._next_check = 0.0
+
+    @property
+    def hedged(self) -> bool:
+        return len(self.attempts) > 1
+
+    def poll_timeout(self) -> Optional[float]:
+        """等待下一事件的超时：仍可能对冲时定期唤醒检查，否则一直等待。"""
+        if self.hedged or self.attempts[0].error is not None:
+            return None
+        return hedge_config["poll_interval"]
+
+    def on_chunk(self, index: int, chunk: str) -> bool:
+        """
+        登记一路请求的增量。
+
+        Returns:
+            bool: 是否应向调用方推送该增量（仅原请求且尚未对冲时）。
+        """
+        if not chunk:
+            return False
+        attempt = self.attempts[index]
+        if attempt.first_token is None:
+            attempt.first_token = time.monotonic()
+        attempt.parts.append(chunk)
+        return index == 0 and not self.hedged
+
+    def fail(self, index: int, error: BaseException) -> None:
+        """登记一路请求失败；所有已发起的请求均失败时抛出原请求的异常。"""
+        self.attempts[index].error = error
+        if index == 0 and not self.hedged:
+            raise error
+        if all(attempt.error is not None for attempt in self.attempts):
+            raise self.attempts[0].error
+
+    def finish(self, index: int) -> str:
+        """以先完整结束的一路为胜者，更新样本与统计并返回其输出。"""
+        now = time.monotonic()
+        winner = self.attempts[index]
+        self.hedger._record(winner, now)
+        if index > 0:
+            self.hedger.stats.record_win(self._saved(winner, now))
+        return winner.text
+
+    def _saved(self, winner: _Attempt, now: float) -> float:
+        """
+        对冲胜出时估算节省的时长：原请求已在生成时按其速率推算完成同样输出所需的时间；
+        尚无首 token 时至少还需对冲请求的生成时长，以此作为下限；原请求已失败时不计。
+        """
+        primary = self.attempts[0]
+        if primary.error is not None or winner.first_token is None:
+            return 0.0
+        rate = primary.rate(now)
+        if rate:
+            tokens = count_tokens(winner.text, primary.input_model)
+            return max(primary.first_token + tokens / rate - now, 0.0)
+        return now - winner.first_token
+
+    def maybe_hedge(self) -> Optional[str]:
+        """
+        按间隔检查原请求是否需要对冲。
+
+        Returns:
+            Optional[str]: 需要发起对冲时返回对冲使用的模型，否则为 None。
+        """
+        if self.poll_timeout() is None:
+            return None
+        now = time.monotonic()
+        if now < self._next_check:
+            return None
+        self._next_check = now + hedge_config["poll_interval"]
+        if not self.hedger._due(self.attempts[0], now) or not self.hedger._take_budget():
+            return None
+        self.attempts.append(_Attempt(self.hedger.alternate_model))
+        return self.hedger.alternate_model
+
+
+def make_hedger(input_model: str, hedge: Optional[bool] = None, hedge_model: Optional[str] = None,
+                stats: Optional[HedgeStats] = None, max_concurrent: int = 1) -> Optional[Hedger]:
+    """
+    按参数与 `hedge_config` 创建批量任务的对冲器。
+
+    Args:
+        input_model (str): 原请求使用的模型。
+        hedge (Optional[bool]): 是否启用，None 时取 `hedge_config["enabled"]`。
+        hedge_model (Optional[str]): 对冲使用的模型，None 时取 `hedge_config["alternate_model"]`，均为空则用原模型。
+        stats (Optional[HedgeStats]): 由调用方持有的统计。
+        max_concurrent (int): 任务的并发数，决定线程引擎中对冲线程池的上限。
+
+    Returns:
+        Optional[Hedger]: 对冲器，未启用时为 None。
+    """
+    if hedge is None:
+        hedge = hedge_config["enabled"]
+    if not hedge:
+        return None
+    return Hedger(input_model, hedge_model or hedge_config["alternate_model"] or input_model, stats, max_concurrent)
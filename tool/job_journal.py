@@ -0,0 +1,229 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from config.runtime_config import journal_config
+
+# 单项状态
+STATUS_PENDING = "pending"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+def _hash_text(text: str) -> str:
+    """计算文本的 SHA-256 十六进制摘要。"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def make_job_id() -> str:
+    """
+    生成新的任务 ID：每次提交各不相同，相同输入的并发或重复提交互不干扰，仅续跑时沿用原 ID。
+
+    Returns:
+        str: 16 位十六进制任务 ID。
+    """
+    return uuid.uuid4().hex[:16]
+
+
+class JobJournal:
+    """
+    批量任务日志：以 SQLite 持久化每个任务的参数与各项的输入哈希、状态和输出。
+
+    单项完成即落盘，进程中断后可仅调度未完成与失败的项，并直接从日志重建有序结果。
+    """
+
+    def __init__(self, path: str, retention: float = 0):
+        """
+        Args:
+            path (str): SQLite 文件路径，目录不存在时自动创建。
+            retention (float): 已完成任务的保留时间（秒），0 表示永久保留。
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.retention = retention
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "job_id TEXT PRIMARY KEY, model TEXT NOT NULL, prompt TEXT, top_p REAL, temperature REAL, "
+            "title TEXT, total INTEGER NOT NULL DEFAULT 0, status TEXT NOT NULL, "
+            "created REAL NOT NULL, updated REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS items ("
+            "job_id TEXT NOT NULL, idx INTEGER NOT NULL, input_hash TEXT NOT NULL, input TEXT NOT NULL, "
+            "status TEXT NOT NULL, output TEXT, updated REAL NOT NULL, PRIMARY KEY (job_id, idx))"
+        )
+
+    def begin_job(self, job_id: str, input_model: str, prompt: Optional[str], input_top_p: float,
+                  input_temperature: float) -> None:
+        """
+        登记任务（已存在时仅标记为运行中），并清理超出保留期的已完成任务。
+
+        Args:
+            job_id (str): 任务 ID。
+            input_model (str): 模型名称。
+            prompt (Optional[str]): 系统提示词。
+            input_top_p (float): nucleus sampling 参数。
+            input_temperature (float): 输出多样性温度。
+        """
+        now = time.time()
+        with self._lock:
+            if self.retention:
+                expired = [row[0] for row in self._conn.execute(
+                    "SELECT job_id FROM jobs WHERE status = ? AND updated < ?", (STATUS_DONE, now - self.retention))]
+                self._conn.executemany("DELETE FROM items WHERE job_id = ?", [(j,) for j in expired])
+                self._conn.executemany("DELETE FROM jobs WHERE job_id = ?", [(j,) for j in expired])
+
+            self._conn.execute(
+                "INSERT INTO jobs (job_id, model, prompt, top_p, temperature, title, status, created, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(job_id) DO UPDATE SET status = excluded.status, updated = excluded.updated",
+                (job_id, input_model, prompt, input_top_p, input_temperature, "", STATUS_PENDING, now, now),
+            )
+
+    def restore_item(self, job_id: str, index: int, text: str) -> Optional[str]:
+        """
+        查询单项的已完成结果；未完成或输入已变化时登记为待处理。
+
+        Args:
+            job_id (str): 任务 ID。
+            index (int): 项在原始列表中的索引。
+            text (str): 项的输入文本。
+
+        Returns:
+            Optional[str]: 已完成项的输出文本，仅在该项已成功完成且输入未变化时返回，否则为 None。
+        """
+        input_hash = _hash_text(text)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT input_hash, status, output FROM items WHERE job_id = ? AND idx = ?", (job_id, index)).fetchone()
+            if row is not None and row[0] == input_hash and row[1] == STATUS_DONE:
+                return row[2] or ""
+            self._conn.execute(
+                "INSERT OR REPLACE INTO items (job_id, idx, input_hash, input, status, output, updated) "
+                "VALUES (?, ?, ?, ?, ?, NULL, ?)",
+                (job_id, index, input_hash, text, STATUS_PENDING, time.time()),
+            )
+            if index == 0:
+                # 以首项开头作为便于识别的任务标题
+                self._conn.execute("UPDATE jobs SET title = ? WHERE job_id = ?", (text[:40], job_id))
+            return None
+
+    def complete_item(self, job_id: str, index: int, output: str) -> None:
+        """记录单项成功完成及其输出。"""
+        self._set_item(job_id, index, STATUS_DONE, output)
+
+    def fail_item(self, job_id: str, index: int, output: str) -> None:
+        """记录单项最终失败及其错误信息，续跑时会重新调度。"""
+        self._set_item(job_id, index, STATUS_FAILED, output)
+
+    def _set_item(self, job_id: str, index: int, status: str, output: str) -> None:
+        """更新单项状态与输出。"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE items SET status = ?, output = ?, updated = ? WHERE job_id = ? AND idx = ?",
+                (status, output, time.time(), job_id, index),
+            )
+
+    def finish_job(self, job_id: str, total: int) -> str:
+        """
+        结束任务：截断多余的旧项，依据各项状态确定任务状态。
+
+        Args:
+            job_id (str): 任务 ID。
+            total (int): 本次运行的项总数。
+
+        Returns:
+            str: 任务状态，全部成功为 `done`，存在失败或未完成项为 `failed`。
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM items WHERE job_id = ? AND idx >= ?", (job_id, total))
+            (unfinished,) = self._conn.execute(
+                "SELECT COUNT(*) FROM items WHERE job_id = ? AND status != ?", (job_id, STATUS_DONE)).fetchone()
+            status = STATUS_DONE if unfinished == 0 else STATUS_FAILED
+            self._conn.execute(
+                "UPDATE jobs SET total = ?, status = ?, updated = ? WHERE job_id = ?",
+                (total, status, time.time(), job_id),
+            )
+            return status
+
+    def load_results(self, job_id: str) -> List[Tuple[int, str]]:
+        """
+        从日志按索引顺序读取全部项的输出。
+
+        Returns:
+            List[Tuple[int, str]]: (索引, 输出文本) 列表；未完成项输出为空串。
+        """
+        with self._lock:
+            return [(idx, output or "") for idx, output in self._conn.execute(
+                "SELECT idx, output FROM items WHERE job_id = ? ORDER BY idx", (job_id,))]
+
+    def load_inputs(self, job_id: str) -> List[str]:
+        """按索引顺序读取任务的全部输入文本，用于续跑。"""
+        with self._lock:
+            return [row[0] for row in self._conn.execute(
+                "SELECT input FROM items WHERE job_id = ? ORDER BY idx", (job_id,))]
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        读取任务参数。
+
+        Returns:
+            Optional[Dict[str, Any]]: 包含 `model`、`prompt`、`top_p`、`temperature` 等键的字典，不存在时为 None。
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT job_id, model, prompt, top_p, temperature, title, total, status, updated "
+                "FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        keys = ("job_id", "model", "prompt", "top_p", "temperature", "title", "total", "status", "updated")
+        return dict(zip(keys, row))
+
+    def list_resumable(self) -> List[Dict[str, Any]]:
+        """
+        列出可续跑的任务（未完成或存在失败项），按最近更新时间倒序。
+
+        Returns:
+            List[Dict[str, Any]]: 任务摘要，含 `job_id`、`model`、`title`、`done`、`total`、`updated`。
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT j.job_id, j.model, j.title, j.updated, "
+                "COUNT(i.idx), COALESCE(SUM(i.status = ?), 0) "
+                "FROM jobs j LEFT JOIN items i ON i.job_id = j.job_id "
+                "WHERE j.status != ? GROUP BY j.job_id ORDER BY j.updated DESC",
+                (STATUS_DONE, STATUS_DONE),
+            ).fetchall()
+        return [{"job_id": job_id, "model": model, "title": title, "updated": updated, "total": total, "done": done}
+                for job_id, model, title, updated, total, done in rows]
+
+
+_journal: Optional[JobJournal] = None
+_journal_lock = threading.Lock()
+
+
+def get_job_journal() -> Optional[JobJournal]:
+    """
+    获取进程级共享任务日志；`journal_config["enabled"]` 为 False 时返回 None。
+
+    Returns:
+        Optional[JobJournal]: 任务日志实例。
+    """
+    global _journal
+
+    if not journal_config["enabled"]:
+        return None
+    if _journal is None:
+        with _journal_lock:
+            if _journal is None:
+                _journal = JobJournal(journal_config["path"], retention=journal_config["retention"])
+    return _journal
@@ -0,0 +1,370 @@
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Deque, Dict, List, Optional, Sequence, Tuple
+
+from config.runtime_config import metrics_config
+from tool.retry import classify_retry
+
+# 各类指标的直方图分桶上界
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+INTER_TOKEN_BUCKETS = (0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0)
+RATE_BUCKETS = (1.0, 5.0, 10.0, 20.0, 50.0, 100.0, 200.0, 500.0, 1000.0)
+
+# 直方图指标：名称 -> (说明, 分桶)
+HISTOGRAMS = {
+    "llm_queue_wait_seconds": ("调度排队时长", LATENCY_BUCKETS),
+    "llm_ttft_seconds": ("首 token 延迟", LATENCY_BUCKETS),
+    "llm_inter_token_seconds": ("单次请求的平均 token 间隔", INTER_TOKEN_BUCKETS),
+    "llm_tokens_per_second": ("单次请求的输出速率", RATE_BUCKETS),
+    "llm_request_duration_seconds": ("请求总时长（含限额等待与排队）", LATENCY_BUCKETS),
+}
+
+# 计数器指标：名称 -> 说明
+COUNTERS = {
+    "llm_requests_total": "完成的请求数",
+    "llm_output_tokens_total": "输出 token 总数",
+    "llm_errors_total": "按错误类别的失败请求数",
+    "llm_retries_total": "按错误类别的批量重试次数",
+    "llm_stream_calls_total": "未命中缓存的流式请求数（含合并到在途请求的）",
+    "llm_coalesced_total": "合并到在途相同请求、未单独请求上游的流式请求数",
+}
+
+# 标签：(模型, 供应商[, 错误类别])
+Labels = Tuple[str, ...]
+
+
+class Histogram:
+    """累积分桶直方图，附带最近样本池用于计算实时分位数。"""
+
+    def __init__(self, buckets: Sequence[float], reservoir: int = 512):
+        """
+        Args:
+            buckets (Sequence[float]): 递增的分桶上界，不含 +Inf。
+            reservoir (int): 保留的最近样本数。
+        """
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.recent: Deque[float] = deque(maxlen=reservoir)
+
+    def observe(self, value: float) -> None:
+        """记录一个样本，需由调用方加锁。"""
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+        self.recent.append(value)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """最近样本的分位数，无样本时为 None；需由调用方加锁。"""
+        if not self.recent:
+            return None
+        samples = sorted(self.recent)
+        return samples[min(int(len(samples) * q), len(samples) - 1)]
+
+
+class MetricsRegistry:
+    """进程级指标注册表：按 (模型, 供应商) 聚合直方图与计数器，线程安全。"""
+
+    def __init__(self, reservoir: int = 512, rate_window: float = 30.0):
+        """
+        Args:
+            reservoir (int): 每个直方图保留的最近样本数，用于实时分位数。
+            rate_window (float): 聚合输出速率的统计窗口（秒）。
+        """
+        self.reservoir = reservoir
+        self.rate_window = rate_window
+        self._lock = threading.Lock()
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        # 模型 -> 最近完成请求的 (完成时间, 输出 token 数)，用于聚合吞吐
+        self._completions: Dict[str, Deque[Tuple[float, int]]] = {}
+        self._first_seen: Dict[str, float] = {}
+
+    def _observe_locked(self, name: str, labels: Labels, value: float) -> None:
+        """记录直方图样本，需持有锁调用。"""
+        key = (name, labels)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = Histogram(HISTOGRAMS[name][1], self.reservoir)
+            self._histograms[key] = histogram
+        histogram.observe(value)
+
+    def _inc_locked(self, name: str, labels: Labels, value: float = 1) -> None:
+        """累加计数器，需持有锁调用。"""
+        key = (name, labels)
+        self._counters[key] = self._counters.get(key, 0) + value
+
+    def request(self, input_model: str, supplier: str) -> "RequestRecorder":
+        """
+        开始记录一次上游请求。
+
+        Args:
+            input_model (str): 模型名称。
+            supplier (str): 实际请求的供应商。
+
+        Returns:
+            RequestRecorder: 请求记录器，请求结束时调用 `finish` 或 `fail`。
+        """
+        with self._lock:
+            self._first_seen.setdefault(input_model, time.monotonic())
+        return RequestRecorder(self, input_model, supplier)
+
+    def record_retry(self, input_model: str, supplier: str, kind: str) -> None:
+        """
+        记录一次批量重试。
+
+        Args:
+            input_model (str): 模型名称。
+            supplier (str): 模型所属供应商。
+            kind (str): 错误类别，见 `tool.retry`。
+        """
+        with self._lock:
+            self._inc_locked("llm_retries_total", (input_model, supplier, kind))
+
+    def record_coalesce(self, input_model: str, supplier: str, joined: bool) -> None:
+        """
+        记录一次流式请求是否合并到在途的相同请求。
+
+        Args:
+            input_model (str): 模型名称。
+            supplier (str): 模型所属供应商。
+            joined (bool): 是否加入了在途请求（未单独请求上游）。
+        """
+        labels = (input_model, supplier)
+        with self._lock:
+            self._inc_locked("llm_stream_calls_total", labels)
+            if joined:
+                self._inc_locked("llm_coalesced_total", labels)
+
+    def _finish(self, recorder: "RequestRecorder", output_tokens: int, streamed: bool) -> None:
+        """登记一次成功请求的各项指标。"""
+        now = time.monotonic()
+        labels = (recorder.input_model, recorder.supplier)
+        with self._lock:
+            self._inc_locked("llm_requests_total", labels)
+            self._inc_locked("llm_output_tokens_total", labels, output_tokens)
+            self._observe_locked("llm_request_duration_seconds", labels, now - recorder.start)
+            if recorder.queue_wait is not None:
+                self._observe_locked("llm_queue_wait_seconds", labels, recorder.queue_wait)
+            # 非流式请求以派发时刻作为生成起点
+            begin = recorder.first_token if streamed else recorder.dispatched
+            if streamed and recorder.first_token is not None and recorder.dispatched is not None:
+                self._observe_locked("llm_ttft_seconds", labels, recorder.first_token - recorder.dispatched)
+            if streamed and recorder.chunks > 1:
+                self._observe_locked("llm_inter_token_seconds", labels,
+                                     (recorder.last_token - recorder.first_token) / (recorder.chunks - 1))
+            if begin is not None and now > begin and output_tokens:
+                self._observe_locked("llm_tokens_per_second", labels, output_tokens / (now - begin))
+            completions = self._completions.setdefault(recorder.input_model, deque())
+            completions.append((now, output_tokens))
+            while completions and completions[0][0] < now - self.rate_window:
+                completions.popleft()
+
+    def _fail(self, recorder: "RequestRecorder", exc: BaseException) -> None:
+        """登记一次失败请求。"""
+        with self._lock:
+            self._inc_locked("llm_errors_total", (recorder.input_model, recorder.supplier, classify_retry(exc)))
+
+    def summary(self, input_model: str) -> Dict[str, Optional[float]]:
+        """
+        模型的实时摘要：最近请求的 TTFT 分位数与统计窗口内的聚合输出速率（所有供应商合计）。
+
+        Args:
+            input_model (str): 模型名称。
+
+        Returns:
+            Dict[str, Optional[float]]: `ttft_p50`、`ttft_p95`（秒）、`tokens_per_sec` 与在途请求合并率
+            `coalesce_rate`，无样本时为 None。
+        """
+        now = time.monotonic()
+        with self._lock:
+            ttft: List[float] = []
+            for (name, labels), histogram in self._histograms.items():
+                if name == "llm_ttft_seconds" and labels[0] == input_model:
+                    ttft.extend(histogram.recent)
+            completions = self._completions.get(input_model)
+            tokens = sum(n for finished, n in completions or () if finished >= now - self.rate_window)
+            span = min(self.rate_window, now - self._first_seen.get(input_model, now))
+            calls = coalesced = 0.0
+            for (name, labels), value in self._counters.items():
+                if labels[0] == input_model:
+                    if name == "llm_stream_calls_total":
+                        calls += value
+                    elif name == "llm_coalesced_total":
+                        coalesced += value
+
+        ttft.sort()
+        return {
+            "ttft_p50": ttft[len(ttft) // 2] if ttft else None,
+            "ttft_p95": ttft[min(int(len(ttft) * 0.95), len(ttft) - 1)] if ttft else None,
+            "tokens_per_sec": tokens / span if completions and span > 0 else None,
+            "coalesce_rate": coalesced / calls if calls else None,
+        }
+
+    def quantile(self, name: str, input_model: str, q: float) -> Optional[float]:
+        """
+        模型某项直方图指标最近样本的分位数（所有供应商合计）。
+
+        Args:
+            name (str): 直方图名称，见 `HISTOGRAMS`。
+            input_model (str): 模型名称。
+            q (float): 分位数，范围 [0, 1]。
+
+        Returns:
+            Optional[float]: 分位数值，无样本时为 None。
+        """
+        with self._lock:
+            samples = sorted(value for (metric, labels), histogram in self._histograms.items()
+                             if metric == name and labels[0] == input_model for value in histogram.recent)
+        return samples[min(int(len(samples) * q), len(samples) - 1)] if samples else None
+
+    def render_prometheus(self) -> str:
+        """
+        以 Prometheus 文本格式导出全部指标。
+
+        Returns:
+            str: 文本格式的指标。
+        """
+        with self._lock:
+            histograms = {key: (list(h.counts), h.sum, h.count, h.buckets) for key, h in self._histograms.items()}
+            counters = dict(self._counters)
+
+        lines: List[str] = []
+        for name, (help_text, _) in HISTOGRAMS.items():
+            series = sorted((labels, value) for (metric, labels), value in histograms.items() if metric == name)
+            if not series:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, (counts, total, count, buckets) in series:
+                base = _format_labels(labels)
+                cumulative = 0
+                for bound, n in zip(buckets, counts):
+                    cumulative += n
+                    lines.append(f'{name}_bucket{{{base},le="{bound:g}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{{base},le="+Inf"}} {count}')
+                lines.append(f"{name}_sum{{{base}}} {total:.6f}")
+                lines.append(f"{name}_count{{{base}}} {count}")
+        for name, help_text in COUNTERS.items():
+            series = sorted((labels, value) for (metric, labels), value in counters.items() if metric == name)
+            if not series:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for labels, value in series:
+                lines.append(f"{name}{{{_format_labels(labels)}}} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    """转义 Prometheus 标签值。"""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels) -> str:
+    """按 (模型, 供应商[, 错误类别]) 渲染标签。"""
+    names = ("model", "supplier", "class")
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, labels))
+
+
+class RequestRecorder:
+    """单次上游请求的计时记录：派发、首 token、逐块到达与结束。"""
+
+    def __init__(self, registry: MetricsRegistry, input_model: str, supplier: str):
+        self.registry = registry
+        self.input_model = input_model
+        self.supplier = supplier
+        self.start = time.monotonic()
+        self.dispatched: Optional[float] = None
+        self.queue_wait: Optional[float] = None
+        self.first_token: Optional[float] = None
+        self.last_token: Optional[float] = None
+        self.chunks = 0
+
+    def dispatch(self, queue_wait: float) -> None:
+        """
+        标记请求已被调度器派发。
+
+        Args:
+            queue_wait (float): 调度排队时长（秒）。
+        """
+        self.dispatched = time.monotonic()
+        self.queue_wait = queue_wait
+
+    def chunk(self) -> None:
+        """标记收到一个流式增量。"""
+        now = time.monotonic()
+        if self.first_token is None:
+            self.first_token = now
+        self.last_token = now
+        self.chunks += 1
+
+    def finish(self, output_tokens: int, streamed: bool = True) -> None:
+        """
+        登记请求成功完成。
+
+        Args:
+            output_tokens (int): 输出 token 数。
+            streamed (bool): 是否为流式请求；非流式请求不记录 TTFT 与 token 间隔。
+        """
+        self.registry._finish(self, output_tokens, streamed)
+
+    def fail(self, exc: BaseException) -> None:
+        """
+        登记请求失败。
+
+        Args:
+            exc (BaseException): 请求抛出的异常。
+        """
+        self.registry._fail(self, exc)
+
+
+_registry = MetricsRegistry(reservoir=metrics_config["reservoir"], rate_window=metrics_config["rate_window"])
+
+
+def get_metrics() -> MetricsRegistry:
+    """获取进程级共享指标注册表。"""
+    return _registry
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """仅提供 `GET /metrics` 的 HTTP 处理器。"""
+
+    def do_GET(self) -> None:
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = get_metrics().render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        # 抓取请求频繁，不输出访问日志
+        pass
+
+
+def start_metrics_server(host: Optional[str] = None, port: Optional[int] = None) -> ThreadingHTTPServer:
+    """
+    在守护线程中启动 Prometheus 指标服务，提供 `/metrics`。
+
+    Args:
+        host (Optional[str]): 监听地址，默认取 `metrics_config`。
+        port (Optional[int]): 监听端口，默认取 `metrics_config`。
+
+    Returns:
+        ThreadingHTTPServer: 已启动的服务，可调用 `shutdown()` 停止。
+    """
+    server = ThreadingHTTPServer((host or metrics_config["host"], port or metrics_config["port"]), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
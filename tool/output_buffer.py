@@ -0,0 +1,99 @@
+import threading
+from typing import Dict
+
+
+class SegmentBuffer:
+    """
+    按索引分段的输出缓冲：每个批量项对应一个分段，仅修改发生变化的分段。
+
+    流式增量以列表形式追加到对应分段，合并推迟到 `render()` 时进行：仅折叠上次
+    渲染后变化过的分段，避免逐个增量重复拼接分段；但每次有变化的渲染仍会连接全部
+    分段，单次开销与当前输出总长度成正比，应控制渲染频率。
+    """
+
+    def __init__(self, size: int = 0, separator: str = "\n\n"):
+        """
+        Args:
+            size (int): 初始分段数量，即已知的批量项总数；访问更大的索引时自动扩展。
+            separator (str): 渲染时分段之间的分隔符。
+        """
+        self._parts: list[list[str]] = [[] for _ in range(size)]
+        self._segments: list[str] = [""] * size
+        self._changed: set[int] = set()
+        self._separator = separator
+        self._rendered = ""
+        self._lock = threading.Lock()
+
+    @property
+    def dirty(self) -> bool:
+        """自上次渲染以来是否有分段发生变化。"""
+        return bool(self._changed)
+
+    def _ensure(self, index: int) -> None:
+        """扩展分段数量以容纳给定索引（批量项总数未知时使用），需持有锁调用。"""
+        missing = index + 1 - len(self._parts)
+        if missing > 0:
+            self._parts.extend([] for _ in range(missing))
+            self._segments.extend([""] * missing)
+
+    def append(self, index: int, delta: str) -> None:
+        """
+        向指定分段追加增量文本。
+
+        Args:
+            index (int): 分段索引。
+            delta (str): 新增文本。
+        """
+        if not delta:
+            return
+        with self._lock:
+            self._ensure(index)
+            self._parts[index].append(delta)
+            self._changed.add(index)
+
+    def set(self, index: int, text: str) -> None:
+        """
+        以完整文本替换指定分段（完成、失败或重试重置时使用）。
+
+        Args:
+            index (int): 分段索引。
+            text (str): 分段完整文本。
+        """
+        with self._lock:
+            self._ensure(index)
+            self._parts[index] = [text] if text else []
+            self._changed.add(index)
+
+    def apply(self, event: Dict[str, object]) -> None:
+        """
+        应用 `chat_llm_batch` 的单项回调负载。
+
+        Args:
+            event (Dict[str, object]): 包含 `index`、`text` 与 `replace` 的回调负载。
+        """
+        index = int(event.get("index", 0))
+        text_val = str(event.get("text", ""))
+        if event.get("replace", True):
+            self.set(index, text_val)
+        else:
+            self.append(index, text_val)
+
+    def render(self) -> str:
+        """
+        生成按索引排序的合并视图，跳过空分段；无变化时直接返回缓存结果。
+
+        Returns:
+            str: 以分隔符连接的有序输出文本。
+        """
+        with self._lock:
+            if not self._changed:
+                return self._rendered
+            for index in self._changed:
+                parts = self._parts[index]
+                if len(parts) > 1:
+                    # 折叠为单个字符串，后续追加只需拼接新增部分
+                    parts[:] = ["".join(parts)]
+                self._segments[index] = parts[0] if parts else ""
+            self._changed.clear()
+            self._rendered = self._separator.join(seg for seg in self._segments if seg)
+            return self._rendered
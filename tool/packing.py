@@ -0,0 +1,227 @@
+import re
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from config.runtime_config import packing_config
+from tool.token_count import chunk_token_budget, count_tokens
+
+# 条目分隔标记：单独一行的 <<<编号>>>，编号从 1 开始
+_MARKER = "<<<{}>>>"
+_MARKER_RE = re.compile(r"^[ \t]*<<<\s*(\d+)\s*>>>[ \t]*$", re.MULTILINE)
+
+# 追加在系统提示词之后的打包说明；不含条目数，使各打包请求的系统提示词保持一致
+PACK_INSTRUCTION = (
+    "输入包含多个相互独立的条目，每个条目以单独一行的 <<<编号>>> 开头。"
+    "请按上述要求分别处理每个条目，不要合并、省略或改动编号；"
+    "输出时每个条目的结果同样以单独一行的 <<<编号>>> 开头，按编号顺序依次给出，除此之外不要输出任何其他内容。"
+)
+
+
+def pack_prompt(prompt: Optional[str]) -> str:
+    """
+    打包请求的系统提示词：原提示词后追加分隔说明。
+
+    Args:
+        prompt (Optional[str]): 原系统提示词。
+
+    Returns:
+        str: 打包请求使用的系统提示词。
+    """
+    return f"{prompt}\n\n{PACK_INSTRUCTION}" if prompt else PACK_INSTRUCTION
+
+
+def _format_entry(number: int, item: str) -> str:
+    """单个条目的打包文本。"""
+    return f"{_MARKER.format(number)}\n{item}"
+
+
+def pack_items(items: Sequence[str]) -> str:
+    """
+    以编号分隔标记拼接多个条目。
+
+    Args:
+        items (Sequence[str]): 条目文本。
+
+    Returns:
+        str: 打包后的用户输入。
+    """
+    return "\n".join(_format_entry(number, item) for number, item in enumerate(items, 1))
+
+
+def parse_packed(text: str, count: int) -> Dict[int, str]:
+    """
+    将打包请求的输出拆分回各条目。
+
+    编号越界的段落与首个标记之前的内容被忽略；同一编号出现多次或内容为空的条目视为缺失，由调用方单独重试。
+
+    Args:
+        text (str): 模型的完整输出。
+        count (int): 打包的条目数。
+
+    Returns:
+        Dict[int, str]: 条目位置（从 0 开始）-> 该条目的输出。
+    """
+    markers = list(_MARKER_RE.finditer(text))
+    results: Dict[int, str] = {}
+    duplicated = set()
+    for i, match in enumerate(markers):
+        position = int(match.group(1)) - 1
+        if not 0 <= position < count:
+            continue
+        end = markers[i + 1].start() if i + 1 < len(markers) else len(text)
+        if position in results:
+            duplicated.add(position)
+        results[position] = text[match.end():end].strip()
+    return {position: result for position, result in results.items() if result and position not in duplicated}
+
+
+class PackDemux:
+    """流式拆分打包输出：按行识别分隔标记，将增量归属到对应条目，供逐项实时展示。"""
+
+    def __init__(self, count: int):
+        """
+        Args:
+            count (int): 打包的条目数。
+        """
+        self.count = count
+        self.reset()
+
+    def reset(self) -> None:
+        """丢弃已接收的内容（重试时调用）。"""
+        self._pending = ""
+        self._current: Optional[int] = None
+
+    def feed(self, chunk: str) -> List[Tuple[int, str]]:
+        """
+        接收一段增量，返回其中已完整的行归属的条目增量。
+
+        Args:
+            chunk (str): 模型输出的增量文本。
+
+        Returns:
+            List[Tuple[int, str]]: (条目位置, 增量文本) 列表；未完整的末行留待下次处理。
+        """
+        self._pending += chunk
+        lines = self._pending.split("\n")
+        self._pending = lines.pop()
+        deltas: List[Tuple[int, str]] = []
+        for line in lines:
+            match = _MARKER_RE.match(line)
+            if match and 0 < int(match.group(1)) <= self.count:
+                self._current = int(match.group(1)) - 1
+            elif self._current is not None:
+                deltas.append((self._current, line + "\n"))
+        return deltas
+
+
+class PackStats:
+    """打包统计：打包请求数、经打包处理的条目数与回退为单独请求的条目数，线程安全，随进度推送。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.packs = 0
+        self.packed = 0
+        self.fallbacks = 0
+
+    def record_pack(self, items: int) -> None:
+        """记录一次打包请求及其条目数。"""
+        with self._lock:
+            self.packs += 1
+            self.packed += items
+
+    def record_fallback(self) -> None:
+        """记录一个输出缺失或格式错误、回退为单独请求的条目。"""
+        with self._lock:
+            self.fallbacks += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        """
+        Returns:
+            Dict[str, Dict[str, int]]: `packing` -> 包含 `packs`、`packed` 与 `fallbacks` 的字典。
+        """
+        with self._lock:
+            return {"packing": {"packs": self.packs, "packed": self.packed, "fallbacks": self.fallbacks}}
+
+
+class Packer:
+    """
+    按 token 预算将连续的短条目分组：每组的条目输入 token 合计不超过预算，条目数不超过 `max_items`，
+    超过 `max_item_tokens` 的条目不参与打包。
+    """
+
+    def __init__(self, input_model: str, prompt: Optional[str], stats: Optional[PackStats] = None):
+        """
+        Args:
+            input_model (str): 模型名称，用于 token 计数与预算。
+            prompt (Optional[str]): 原系统提示词。
+            stats (Optional[PackStats]): 由调用方持有的统计，默认新建。
+        """
+        self.input_model = input_model
+        self.prompt = pack_prompt(prompt)
+        # 打包输出与输入长度相当，预算同时受模型输出上限约束（见 `chunk_token_budget`）
+        self.budget = min(packing_config["max_pack_tokens"], chunk_token_budget(input_model, self.prompt))
+        self.stats = stats or PackStats()
+        self._pending: List[Tuple[int, str]] = []
+        self._pending_tokens = 0
+
+    def accepts(self, item: str) -> Optional[int]:
+        """
+        Returns:
+            Optional[int]: 条目可打包时返回其打包后的 token 数，否则为 None。
+        """
+        tokens = count_tokens(item, self.input_model)
+        if tokens > packing_config["max_item_tokens"]:
+            return None
+        tokens += count_tokens(_MARKER.format(packing_config["max_items"]), self.input_model) + 1
+        return tokens if tokens <= self.budget else None
+
+    def add(self, index: int, item: str, tokens: int) -> List[List[Tuple[int, str]]]:
+        """
+        加入一个可打包的条目。
+
+        Args:
+            index (int): 条目在原始列表中的索引。
+            item (str): 条目文本。
+            tokens (int): `accepts` 返回的 token 数。
+
+        Returns:
+            List[List[Tuple[int, str]]]: 因此已满、需立即提交的各组 (索引, 条目)，通常为空。
+        """
+        groups = []
+        if self._pending and self._pending_tokens + tokens > self.budget:
+            groups.append(self.flush())
+        self._pending.append((index, item))
+        self._pending_tokens += tokens
+        if len(self._pending) >= packing_config["max_items"]:
+            groups.append(self.flush())
+        return groups
+
+    @property
+    def pending(self) -> int:
+        """当前未满一组中的条目数。"""
+        return len(self._pending)
+
+    def flush(self) -> List[Tuple[int, str]]:
+        """
+        取出当前未满的一组。
+
+        Returns:
+            List[Tuple[int, str]]: (索引, 条目) 列表，可能为空。
+        """
+        pending, self._pending, self._pending_tokens = self._pending, [], 0
+        return pending
+
+
+def make_packer(input_model: str, prompt: Optional[str], pack: bool) -> Optional[Packer]:
+    """
+    按开关创建任务级打包器。
+
+    Args:
+        input_model (str): 模型名称。
+        prompt (Optional[str]): 原系统提示词。
+        pack (bool): 是否启用打包。
+
+    Returns:
+        Optional[Packer]: 打包器，未启用时为 None。
+    """
+    return Packer(input_model, prompt) if pack else None
@@ -0,0 +1,232 @@
+import asyncio
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from config.model_config import model_dict, supplier_dict
+from config.runtime_config import rate_limit_config
+from tool.endpoint_pool import Endpoint, supplier_keys
+from tool.retry import DeadlineExceeded, remaining
+from tool.token_count import MESSAGE_OVERHEAD_TOKENS, count_tokens
+
+
+class TokenBucket:
+    """
+    每分钟限额的令牌桶：容量为一分钟的限额，按 限额/60 每秒匀速补充。
+
+    采用预扣方式：请求先扣除令牌（允许余额为负），再等待余额回正所需的时长，
+    多个调用方按预扣先后依次获得放行，且可同时对多个桶预扣后取最长等待。
+    """
+
+    def __init__(self, per_minute: float):
+        """
+        Args:
+            per_minute (float): 每分钟限额（请求数或 token 数）。
+        """
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill_locked(self) -> None:
+        """按流逝时间补充令牌，需持有锁调用。"""
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        """
+        预扣令牌并返回需等待的秒数；单次预扣不超过桶容量，避免永远无法满足。
+
+        Args:
+            amount (float): 预扣数量。
+
+        Returns:
+            float: 余额回正前需等待的秒数，0 表示可立即放行。
+        """
+        with self._lock:
+            self._refill_locked()
+            self._tokens -= min(float(amount), self.capacity)
+            return max(0.0, -self._tokens / self.rate)
+
+    def adjust(self, delta: float) -> None:
+        """
+        按实际用量修正余额：`delta` 为正表示追加扣除，为负表示退还。
+
+        Args:
+            delta (float): 实际用量与预扣数量之差。
+        """
+        with self._lock:
+            self._refill_locked()
+            self._tokens = min(self.capacity, self._tokens - delta)
+
+    @property
+    def available(self) -> float:
+        """当前可用令牌数（可能为负，表示已被预扣的欠额）。"""
+        with self._lock:
+            self._refill_locked()
+            return self._tokens
+
+
+class Reservation:
+    """一次请求的限额预扣：等待放行，并在请求结束后按实际 token 用量修正 TPM 桶。"""
+
+    def __init__(self, delay: float, request_buckets: List[TokenBucket], token_buckets: List[TokenBucket],
+                 estimate: int):
+        """
+        Args:
+            delay (float): 放行前需等待的秒数。
+            request_buckets (List[TokenBucket]): 已预扣的 RPM 桶。
+            token_buckets (List[TokenBucket]): 已预扣的 TPM 桶。
+            estimate (int): 预扣的 token 数。
+        """
+        self.delay = delay
+        self.estimate = estimate
+        self._request_buckets = request_buckets
+        self._token_buckets = token_buckets
+        self._settled = False
+
+    def _check_deadline(self, deadline: Optional[float]) -> None:
+        """放行时间晚于截止时间时放弃请求并抛出超时。"""
+        try:
+            left = remaining(deadline)
+        except DeadlineExceeded:
+            self.abandon()
+            raise
+        if left is not None and self.delay > left:
+            self.abandon()
+            raise DeadlineExceeded("等待速率限额超时")
+
+    def abandon(self) -> None:
+        """放弃尚未发出的请求：退还预扣的请求数与 token，避免欠额累积而拖慢后续请求。仅在未结算时生效。"""
+        if self._settled:
+            return
+        for bucket in self._request_buckets:
+            bucket.adjust(-1)
+        self.settle(0)
+
+    def wait(self, deadline: Optional[float] = None) -> None:
+        """
+        阻塞等待放行。
+
+        Args:
+            deadline (Optional[float]): 截止时间（`time.monotonic()`），None 表示不限。
+
+        Raises:
+            DeadlineExceeded: 截止时间前无法放行。
+        """
+        self._check_deadline(deadline)
+        if self.delay > 0:
+            time.sleep(self.delay)
+
+    async def wait_async(self, deadline: Optional[float] = None) -> None:
+        """在事件循环中等待放行，参数同 `wait`。"""
+        self._check_deadline(deadline)
+        if self.delay > 0:
+            await asyncio.sleep(self.delay)
+
+    def settle(self, actual_tokens: int) -> None:
+        """
+        按实际 token 用量修正 TPM 桶，仅首次调用生效。
+
+        Args:
+            actual_tokens (int): 本次请求实际消耗的 token 数（输入 + 输出）。
+        """
+        if self._settled:
+            return
+        self._settled = True
+        for bucket in self._token_buckets:
+            bucket.adjust(actual_tokens - self.estimate)
+
+
+_buckets: Dict[Tuple[str, ...], TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def _get_bucket(key: Tuple[str, ...], per_minute: float) -> TokenBucket:
+    """获取进程内共享的令牌桶，首次访问时创建。"""
+    bucket = _buckets.get(key)
+    if bucket is None:
+        with _buckets_lock:
+            bucket = _buckets.get(key)
+            if bucket is None:
+                bucket = TokenBucket(per_minute)
+                _buckets[key] = bucket
+    return bucket
+
+
+def get_buckets(input_model: str, endpoint: Optional[Endpoint] = None) -> Tuple[List[TokenBucket], List[TokenBucket]]:
+    """
+    获取模型请求需经过的 RPM 与 TPM 桶。
+
+    `supplier_dict` 中的 `rpm`/`tpm` 为账号级限额，按 (供应商, API 密钥) 共享；
+    `model_dict` 中的 `rpm`/`tpm` 为模型级限额，按 (供应商, API 密钥, 模型) 共享。未配置则不限。
+    密钥池中的每个密钥各自计算限额。
+
+    Args:
+        input_model (str): 模型名称，对应 `model_dict` 的键。
+        endpoint (Optional[Endpoint]): 请求使用的端点，默认为模型供应商的第一个密钥。
+
+    Returns:
+        Tuple[List[TokenBucket], List[TokenBucket]]: (RPM 桶列表, TPM 桶列表)。
+    """
+    if endpoint is not None:
+        supplier, api_key = endpoint.supplier, endpoint.api_key
+    else:
+        supplier = model_dict[input_model]["supplier"]
+        api_key = supplier_keys(supplier)[0]
+    account = (supplier, api_key)
+    scopes = [(account, supplier_dict[supplier]), (account + (input_model,), model_dict[input_model])]
+
+    request_buckets: List[TokenBucket] = []
+    token_buckets: List[TokenBucket] = []
+    for scope, config in scopes:
+        if config.get("rpm"):
+            request_buckets.append(_get_bucket(scope + ("rpm",), config["rpm"]))
+        if config.get("tpm"):
+            token_buckets.append(_get_bucket(scope + ("tpm",), config["tpm"]))
+    return request_buckets, token_buckets
+
+
+def estimate_request_tokens(input_model: str, prompt: Optional[str], input_text: str,
+                            history_tokens: int = 0) -> Tuple[int, int]:
+    """
+    预估单次请求的 token 消耗：输入按模型计数器计算，输出按输入长度预估并限制在 `max_tokens` 内。
+
+    Args:
+        input_model (str): 模型名称。
+        prompt (Optional[str]): 系统提示词。
+        input_text (str): 用户输入文本。
+        history_tokens (int): 多轮对话历史消息的 token 数（含消息开销），由调用方提供。
+
+    Returns:
+        Tuple[int, int]: (输入 token 数, 预估总 token 数)。
+    """
+    input_tokens = (count_tokens(prompt or "", input_model) + count_tokens(input_text, input_model)
+                    + 2 * MESSAGE_OVERHEAD_TOKENS + history_tokens)
+    # 输出长度按本轮输入预估，历史消息只计入输入
+    output_tokens = min(int(model_dict[input_model]["max_tokens"]),
+                        max(input_tokens - history_tokens, int(rate_limit_config["min_output_tokens"])))
+    return input_tokens, input_tokens + output_tokens
+
+
+def reserve_request(input_model: str, estimate: int, endpoint: Optional[Endpoint] = None) -> Reservation:
+    """
+    为一次请求同时预扣 RPM 与 TPM 桶，返回需等待最长者的预扣记录。
+
+    Args:
+        input_model (str): 模型名称。
+        estimate (int): 预估 token 数。
+        endpoint (Optional[Endpoint]): 请求使用的端点，决定计入哪个密钥的限额。
+
+    Returns:
+        Reservation: 预扣记录，调用方需先 `wait` 再发起请求，结束后 `settle`。
+    """
+    request_buckets, token_buckets = get_buckets(input_model, endpoint)
+    delay = 0.0
+    for bucket in request_buckets:
+        delay = max(delay, bucket.reserve(1))
+    for bucket in token_buckets:
+        delay = max(delay, bucket.reserve(estimate))
+    return Reservation(delay, request_buckets, token_buckets, estimate)
@@ -0,0 +1,222 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Sequence
+
+from config.runtime_config import cache_config
+
+
+def make_cache_key(
+        input_model: str,
+        prompt: Optional[str],
+        input_text: str,
+        input_top_p: float,
+        input_temperature: float,
+        history: Optional[Sequence[Dict[str, str]]] = None,
+) -> str:
+    """
+    生成内容寻址的缓存键：对模型、系统提示词、历史消息、输入文本与采样参数整体取 SHA-256。
+
+    Args:
+        input_model (str): 模型名称。
+        prompt (Optional[str]): 系统提示词。
+        input_text (str): 用户输入文本。
+        input_top_p (float): nucleus sampling 参数。
+        input_temperature (float): 输出多样性温度。
+        history (Optional[Sequence[Dict[str, str]]]): 多轮对话的历史消息；为空时与单轮请求的键一致。
+
+    Returns:
+        str: 十六进制哈希字符串。
+    """
+    key = [input_model, prompt or "", input_text, float(input_top_p), float(input_temperature)]
+    if history:
+        key.append([[message["role"], message["content"]] for message in history])
+    payload = json.dumps(key, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    基于 SQLite 的持久化响应缓存，支持 TTL 过期与按条目数/字节数的 LRU 淘汰。
+
+    单连接加锁访问，可在线程池与异步引擎中共享。
+    """
+
+    def __init__(self, path: str, max_entries: int = 50000, max_bytes: int = 512 * 1024 * 1024,
+                 ttl: float = 0):
+        """
+        Args:
+            path (str): SQLite 文件路径，目录不存在时自动创建。
+            max_entries (int): 最大条目数。
+            max_bytes (int): 缓存文本最大总字节数。
+            ttl (float): 条目有效期（秒），0 表示永不过期。
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._transaction():
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, text TEXT NOT NULL, size INTEGER NOT NULL, "
+                "created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS responses_created ON responses (created)")
+            # 条目数与总字节数由触发器增量维护，写入时无需全表统计；多进程共用同一文件时同样准确
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses_meta ("
+                "id INTEGER PRIMARY KEY CHECK (id = 1), count INTEGER NOT NULL, bytes INTEGER NOT NULL)"
+            )
+            self._conn.execute(
+                "INSERT OR IGNORE INTO responses_meta (id, count, bytes) "
+                "SELECT 1, COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            )
+            self._conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS responses_insert AFTER INSERT ON responses BEGIN "
+                "UPDATE responses_meta SET count = count + 1, bytes = bytes + new.size WHERE id = 1; END"
+            )
+            self._conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS responses_delete AFTER DELETE ON responses BEGIN "
+                "UPDATE responses_meta SET count = count - 1, bytes = bytes - old.size WHERE id = 1; END"
+            )
+            self._conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS responses_resize AFTER UPDATE OF size ON responses BEGIN "
+                "UPDATE responses_meta SET bytes = bytes - old.size + new.size WHERE id = 1; END"
+            )
+
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        """在一个写事务中执行，多条语句只提交一次。"""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        查询缓存，命中时刷新访问时间；过期条目视为未命中并删除。
+
+        Args:
+            key (str): 缓存键。
+
+        Returns:
+            Optional[str]: 缓存的完整响应文本，未命中返回 None。
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT text, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            text, created = row
+            if self.ttl and now - created > self.ttl:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            return text
+
+    def put(self, key: str, text: str) -> None:
+        """
+        写入缓存并执行淘汰。
+
+        Args:
+            key (str): 缓存键。
+            text (str): 完整响应文本。
+        """
+        now = time.time()
+        size = len(text.encode("utf-8"))
+        with self._lock, self._transaction():
+            # 以 UPSERT 覆盖已有条目，使字节数变化经触发器计入（REPLACE 的隐式删除不触发触发器）
+            self._conn.execute(
+                "INSERT INTO responses (key, text, size, created, accessed) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET text = excluded.text, size = excluded.size, "
+                "created = excluded.created, accessed = excluded.accessed",
+                (key, text, size, now, now),
+            )
+            self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        """删除过期条目，超出容量限制时再按访问时间从旧到新淘汰，需持有锁调用。"""
+        if self.ttl:
+            self._conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+
+        count, total = self._conn.execute("SELECT count, bytes FROM responses_meta WHERE id = 1").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+
+        excess_count = max(count - self.max_entries, 0)
+        excess_bytes = max(total - self.max_bytes, 0)
+        victims: list[str] = []
+        freed = 0
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed"):
+            if len(victims) >= excess_count and freed >= excess_bytes:
+                break
+            victims.append(key)
+            freed += size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", [(k,) for k in victims])
+
+    def clear(self) -> None:
+        """清空全部缓存条目。"""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+
+    def close(self) -> None:
+        """关闭数据库连接。"""
+        with self._lock:
+            self._conn.close()
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """
+    获取进程级共享缓存实例；`cache_config["enabled"]` 为 False 时返回 None。
+
+    Returns:
+        Optional[ResponseCache]: 缓存实例。
+    """
+    global _cache
+
+    if not cache_config["enabled"]:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache(
+                    cache_config["path"],
+                    max_entries=cache_config["max_entries"],
+                    max_bytes=cache_config["max_bytes"],
+                    ttl=cache_config["ttl"],
+                )
+    return _cache
+
+
+def replay_stream(text: str, chunk_chars: Optional[int] = None) -> Iterator[str]:
+    """
+    将缓存的完整文本切为小块回放，使命中结果仍以流式方式驱动回调与界面。
+
+    Args:
+        text (str): 完整响应文本。
+        chunk_chars (Optional[int]): 单块字符数，默认取 `cache_config["replay_chunk_chars"]`。
+
+    Yields:
+        str: 文本片段。
+    """
+    size = max(int(chunk_chars or cache_config["replay_chunk_chars"]), 1)
+    for start in range(0, len(text), size):
+        yield text[start:start + size]
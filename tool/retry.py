@@ -0,0 +1,243 @@
+import email.utils
+import random
+import threading
+import time
+from typing import Dict, Optional
+
+from config.runtime_config import retry_config
+
+# 错误类别
+ERROR_AUTH = "auth"
+ERROR_BAD_REQUEST = "bad_request"
+ERROR_THROTTLE = "throttle"
+ERROR_SERVER = "server"
+ERROR_NETWORK = "network"
+ERROR_DEADLINE = "deadline"
+ERROR_OTHER = "other"
+
+# 重试无法成功的类别：立即失败，不占用工作槽位
+FAIL_FAST = frozenset({ERROR_AUTH, ERROR_BAD_REQUEST, ERROR_DEADLINE})
+
+# 进度展示用的类别名称
+ERROR_LABELS = {
+    ERROR_AUTH: "鉴权",
+    ERROR_BAD_REQUEST: "请求无效",
+    ERROR_THROTTLE: "限流",
+    ERROR_SERVER: "服务端",
+    ERROR_NETWORK: "网络",
+    ERROR_DEADLINE: "超时",
+    ERROR_OTHER: "其他",
+}
+
+
+def format_error_counts(counts: Optional[Dict[str, int]]) -> str:
+    """
+    将按错误类别的计数渲染为 "限流×3 服务端×1" 形式。
+
+    Args:
+        counts (Optional[Dict[str, int]]): 错误类别 -> 次数。
+
+    Returns:
+        str: 渲染结果，无计数时为空字符串。
+    """
+    return " ".join(f"{ERROR_LABELS.get(kind, kind)}×{n}" for kind, n in (counts or {}).items() if n)
+
+
+class DeadlineExceeded(Exception):
+    """请求或任务超出截止时间；不视为上游拥塞，也不再重试。"""
+
+
+def classify_retry(exc: BaseException) -> str:
+    """
+    按重试策略对异常归类；按 `status_code` 属性与异常类名判断，无需导入 openai/httpx。
+
+    Args:
+        exc (BaseException): 请求抛出的异常。
+
+    Returns:
+        str: 错误类别，见 `ERROR_*` 常量。
+    """
+    if isinstance(exc, DeadlineExceeded):
+        return ERROR_DEADLINE
+    status = getattr(exc, "status_code", None)
+    if isinstance(status, int):
+        if status in (401, 403):
+            return ERROR_AUTH
+        if status == 429:
+            return ERROR_THROTTLE
+        if status >= 500:
+            return ERROR_SERVER
+        if status in (408, 409):
+            return ERROR_NETWORK
+        if 400 <= status < 500:
+            # 含上下文超长、参数非法、模型不存在等
+            return ERROR_BAD_REQUEST
+    name = type(exc).__name__
+    if isinstance(exc, (TimeoutError, ConnectionError)) or "Timeout" in name or "Connection" in name:
+        return ERROR_NETWORK
+    return ERROR_OTHER
+
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    """
+    读取 429 响应头中的 `retry-after-ms` 或 `retry-after`（秒数或 HTTP 日期）。
+
+    Args:
+        exc (BaseException): 请求抛出的异常。
+
+    Returns:
+        Optional[float]: 建议等待的秒数，无法解析时为 None。
+    """
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return max(float(value) / 1000, 0.0)
+        except ValueError:
+            pass
+
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(when.timestamp() - time.time(), 0.0)
+
+
+def remaining(deadline: Optional[float]) -> Optional[float]:
+    """
+    距截止时间的剩余秒数。
+
+    Args:
+        deadline (Optional[float]): 以 `time.monotonic()` 计的截止时间，None 表示不限。
+
+    Returns:
+        Optional[float]: 剩余秒数，不限时为 None。
+
+    Raises:
+        DeadlineExceeded: 已超过截止时间。
+    """
+    if deadline is None:
+        return None
+    left = deadline - time.monotonic()
+    if left <= 0:
+        raise DeadlineExceeded("已超过截止时间")
+    return left
+
+
+def item_deadline(item_timeout: Optional[float], job_deadline: Optional[float]) -> Optional[float]:
+    """
+    单项截止时间：从当前起 `item_timeout` 秒与任务截止时间中较早者。
+
+    Args:
+        item_timeout (Optional[float]): 单项总时限（秒），0 或 None 表示不限。
+        job_deadline (Optional[float]): 任务截止时间（`time.monotonic()`），None 表示不限。
+
+    Returns:
+        Optional[float]: 单项截止时间，均不限时为 None。
+    """
+    candidates = [job_deadline] if job_deadline is not None else []
+    if item_timeout:
+        candidates.append(time.monotonic() + item_timeout)
+    return min(candidates) if candidates else None
+
+
+class RetryStats:
+    """按错误类别统计重试与最终失败次数，线程安全，随进度推送。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.retries: Dict[str, int] = {}
+        self.failures: Dict[str, int] = {}
+
+    def record_retry(self, kind: str) -> None:
+        """记录一次重试。"""
+        with self._lock:
+            self.retries[kind] = self.retries.get(kind, 0) + 1
+
+    def record_failure(self, kind: str) -> None:
+        """记录一次最终失败。"""
+        with self._lock:
+            self.failures[kind] = self.failures.get(kind, 0) + 1
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        """
+        Returns:
+            Dict[str, Dict[str, int]]: `retries` 与 `failures` 两个 类别 -> 次数 的字典。
+        """
+        with self._lock:
+            return {"retries": dict(self.retries), "failures": dict(self.failures)}
+
+
+class RetryState:
+    """
+    单项的重试状态：按错误类别决定是否重试及等待时长。
+
+    鉴权与请求无效错误立即失败；429 优先遵循 Retry-After；其余可重试错误采用去相关抖动退避
+    （每次在 [base, 上次等待 × 3] 内随机取值并受上限约束），避免大量并发项同步重试；
+    等待后将超过截止时间的不再重试。
+    """
+
+    def __init__(self, deadline: Optional[float] = None, stats: Optional[RetryStats] = None,
+                 max_attempts: Optional[int] = None, base_delay: Optional[float] = None,
+                 max_delay: Optional[float] = None):
+        """
+        Args:
+            deadline (Optional[float]): 单项截止时间（`time.monotonic()`），None 表示不限。
+            stats (Optional[RetryStats]): 任务级统计，None 表示不统计。
+            max_attempts (Optional[int]): 最大尝试次数，默认取 `retry_config`。
+            base_delay (Optional[float]): 退避基准（秒），默认取 `retry_config`。
+            max_delay (Optional[float]): 单次退避上限（秒），默认取 `retry_config`。
+        """
+        self.deadline = deadline
+        self.stats = stats
+        self.max_attempts = max_attempts or retry_config["max_attempts"]
+        self.base_delay = base_delay if base_delay is not None else retry_config["base_delay"]
+        self.max_delay = max_delay if max_delay is not None else retry_config["max_delay"]
+        self.attempt = 0
+        # 最近一次失败的错误类别
+        self.kind: Optional[str] = None
+        self._delay = self.base_delay
+
+    def next_delay(self, exc: BaseException) -> Optional[float]:
+        """
+        登记一次失败并给出重试前的等待秒数。
+
+        Args:
+            exc (BaseException): 本次尝试抛出的异常。
+
+        Returns:
+            Optional[float]: 等待秒数；None 表示不再重试。
+        """
+        kind = classify_retry(exc)
+        self.attempt += 1
+        self.kind = kind
+
+        delay: Optional[float] = None
+        if kind not in FAIL_FAST and self.attempt < self.max_attempts:
+            self._delay = min(self.max_delay, random.uniform(self.base_delay, max(self._delay, self.base_delay) * 3))
+            delay = self._delay
+            if kind == ERROR_THROTTLE:
+                after = retry_after(exc)
+                if after is not None:
+                    delay = after
+            if self.deadline is not None and time.monotonic() + delay >= self.deadline:
+                # 等待后已无剩余时间，按超时处理
+                kind, delay = ERROR_DEADLINE, None
+
+        if self.stats:
+            if delay is None:
+                self.stats.record_failure(kind)
+            else:
+                self.stats.record_retry(kind)
+        return delay
@@ -0,0 +1,294 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, Optional
+
+from config.model_config import model_dict
+from config.runtime_config import scheduler_config
+from tool.concurrency import RequestProbe, get_limiter
+from tool.retry import DeadlineExceeded, classify_retry, remaining
+
+# 优先级通道，按顺序派发：交互请求优先于批量请求
+LANE_INTERACTIVE = "interactive"
+LANE_BATCH = "batch"
+LANES = (LANE_INTERACTIVE, LANE_BATCH)
+
+# 未提供会话标识时归入的默认会话
+DEFAULT_SESSION = "default"
+
+
+def supplier_capacity(supplier: str) -> int:
+    """
+    供应商的派发容量：优先取 `scheduler_config["supplier_capacity"]`，否则为该供应商下所有模型的
+    `max_concurrent` 之和。
+
+    Args:
+        supplier (str): 供应商名称，对应 `supplier_dict` 的键。
+
+    Returns:
+        int: 同时在途的请求数上限，至少为 1。
+    """
+    configured = scheduler_config["supplier_capacity"].get(supplier)
+    if configured:
+        return max(int(configured), 1)
+    total = sum(int(cfg.get("max_concurrent", 10))
+                for cfg in model_dict.values() if cfg.get("supplier") == supplier)
+    return max(total, 1)
+
+
+class Ticket:
+    """一次排队中的请求：记录所属通道、会话与入队/派发时间。"""
+
+    def __init__(self, input_model: str, lane: str, session: str):
+        self.input_model = input_model
+        self.supplier = model_dict[input_model]["supplier"]
+        self.lane = lane
+        self.session = session
+        self.enqueued = time.monotonic()
+        self.started: Optional[float] = None
+        self._event = threading.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._future: Optional["asyncio.Future[None]"] = None
+
+    @property
+    def wait_time(self) -> float:
+        """排队等待时长（秒）；尚未派发时为已等待的时长。"""
+        return (self.started or time.monotonic()) - self.enqueued
+
+    def _grant(self) -> None:
+        """标记已派发并唤醒等待方。"""
+        self.started = time.monotonic()
+        self._event.set()
+        if self._future is not None:
+            self._loop.call_soon_threadsafe(_wake_future, self._future)
+
+
+def _wake_future(future: "asyncio.Future[None]") -> None:
+    """唤醒等待中的协程；已取消的等待者直接忽略。"""
+    if not future.done():
+        future.set_result(None)
+
+
+class _SupplierQueue:
+    """单个供应商的派发状态：在途数与按通道、会话分组的等待队列。"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.running = 0
+        # 通道 -> (会话 -> 该会话的 FIFO 队列)；会话顺序即轮转顺序
+        self.lanes: Dict[str, "OrderedDict[str, Deque[Ticket]]"] = {lane: OrderedDict() for lane in LANES}
+        # 各通道排队时长的指数移动平均
+        self.wait_ewma: Dict[str, float] = {lane: 0.0 for lane in LANES}
+        self.dispatched: Dict[str, int] = {lane: 0 for lane in LANES}
+
+
+class Scheduler:
+    """
+    全局请求调度器：所有界面会话与批量任务的上游请求在此排队，按供应商容量派发。
+
+    派发顺序为：先按通道优先级（交互优先于批量），同一通道内各会话轮转，会话内先进先出；
+    派发时同时占用模型的自适应并发槽位，槽位已满的模型暂时跳过，由后续释放触发重新派发。
+    """
+
+    def __init__(self, ewma_alpha: float = 0.2):
+        """
+        Args:
+            ewma_alpha (float): 排队时长指数移动平均系数。
+        """
+        self.ewma_alpha = ewma_alpha
+        self._lock = threading.Lock()
+        self._suppliers: Dict[str, _SupplierQueue] = {}
+
+    def _queue_locked(self, supplier: str) -> _SupplierQueue:
+        """获取供应商派发状态，首次访问时创建，需持有锁调用。"""
+        state = self._suppliers.get(supplier)
+        if state is None:
+            state = _SupplierQueue(supplier_capacity(supplier))
+            self._suppliers[supplier] = state
+        return state
+
+    def _dispatch_locked(self, state: _SupplierQueue) -> None:
+        """在容量范围内按通道优先级与会话轮转派发等待中的请求，需持有锁调用。"""
+        while state.running < state.capacity:
+            ticket = self._next_ticket_locked(state)
+            if ticket is None:
+                return
+            state.running += 1
+            state.dispatched[ticket.lane] += 1
+            state.wait_ewma[ticket.lane] += self.ewma_alpha * (
+                    (time.monotonic() - ticket.enqueued) - state.wait_ewma[ticket.lane])
+            ticket._grant()
+
+    @staticmethod
+    def _next_ticket_locked(state: _SupplierQueue) -> Optional[Ticket]:
+        """取出下一个可派发的请求并占用其模型并发槽位；均不可派发时返回 None。"""
+        for lane in LANES:
+            sessions = state.lanes[lane]
+            for session in list(sessions):
+                pending = sessions[session]
+                if not get_limiter(pending[0].input_model).try_acquire():
+                    continue
+                ticket = pending.popleft()
+                if pending:
+                    # 轮转：本会话移到队尾，下次优先派发其他会话
+                    sessions.move_to_end(session)
+                else:
+                    del sessions[session]
+                return ticket
+        return None
+
+    def _enqueue(self, ticket: Ticket) -> None:
+        """请求入队并尝试立即派发。"""
+        with self._lock:
+            state = self._queue_locked(ticket.supplier)
+            state.lanes[ticket.lane].setdefault(ticket.session, deque()).append(ticket)
+            self._dispatch_locked(state)
+
+    def _withdraw(self, ticket: Ticket) -> None:
+        """撤回尚未派发的请求；已派发则按正常完成释放。"""
+        with self._lock:
+            if ticket.started is None:
+                sessions = self._suppliers[ticket.supplier].lanes[ticket.lane]
+                pending = sessions.get(ticket.session)
+                if pending is not None and ticket in pending:
+                    pending.remove(ticket)
+                    if not pending:
+                        del sessions[ticket.session]
+                return
+        self.release(ticket)
+
+    def acquire(self, input_model: str, lane: str = LANE_INTERACTIVE, session: Optional[str] = None,
+                deadline: Optional[float] = None) -> Ticket:
+        """
+        排队并阻塞直至被派发。
+
+        Args:
+            input_model (str): 模型名称。
+            lane (str): 优先级通道，`LANE_INTERACTIVE` 或 `LANE_BATCH`。
+            session (Optional[str]): 会话标识，同一通道内各会话轮转派发。
+            deadline (Optional[float]): 截止时间（`time.monotonic()`），到期仍未派发则撤回排队。
+
+        Returns:
+            Ticket: 已派发的请求，结束后需调用 `release`。
+
+        Raises:
+            DeadlineExceeded: 截止时间前未被派发。
+        """
+        timeout = remaining(deadline)
+        ticket = Ticket(input_model, lane, session or DEFAULT_SESSION)
+        self._enqueue(ticket)
+        if not ticket._event.wait(timeout):
+            self._withdraw(ticket)
+            raise DeadlineExceeded("排队超时")
+        return ticket
+
+    async def acquire_async(self, input_model: str, lane: str = LANE_INTERACTIVE,
+                            session: Optional[str] = None, deadline: Optional[float] = None) -> Ticket:
+        """`acquire` 的异步版本：排队期间不阻塞事件循环，被取消或超时时撤回排队。"""
+        timeout = remaining(deadline)
+        ticket = Ticket(input_model, lane, session or DEFAULT_SESSION)
+        ticket._loop = asyncio.get_running_loop()
+        ticket._future = ticket._loop.create_future()
+        self._enqueue(ticket)
+        try:
+            await asyncio.wait_for(ticket._future, timeout)
+        except asyncio.TimeoutError:
+            self._withdraw(ticket)
+            raise DeadlineExceeded("排队超时") from None
+        except asyncio.CancelledError:
+            self._withdraw(ticket)
+            raise
+        return ticket
+
+    def release(self, ticket: Ticket) -> None:
+        """释放已派发请求占用的供应商容量与模型并发槽位，并继续派发。"""
+        get_limiter(ticket.input_model).release()
+        with self._lock:
+            state = self._suppliers[ticket.supplier]
+            state.running -= 1
+            self._dispatch_locked(state)
+
+    @contextmanager
+    def slot(self, input_model: str, lane: str = LANE_INTERACTIVE, session: Optional[str] = None,
+             deadline: Optional[float] = None) -> Iterator[RequestProbe]:
+        """
+        排队、派发并执行一次请求，退出时将结果反馈给模型的自适应限制器并释放。
+
+        Yields:
+            RequestProbe: 计时探针，请求代码应在收到首 token 时调用 `first_token()`。
+        """
+        ticket = self.acquire(input_model, lane, session, deadline)
+        limiter = get_limiter(input_model)
+        probe = RequestProbe(ticket.wait_time)
+        try:
+            yield probe
+        except Exception as e:
+            limiter.on_error(classify_retry(e))
+            raise
+        else:
+            limiter.on_success(probe.ttft)
+        finally:
+            self.release(ticket)
+
+    @asynccontextmanager
+    async def slot_async(self, input_model: str, lane: str = LANE_INTERACTIVE, session: Optional[str] = None,
+                         deadline: Optional[float] = None) -> AsyncIterator[RequestProbe]:
+        """`slot` 的异步版本。"""
+        ticket = await self.acquire_async(input_model, lane, session, deadline)
+        limiter = get_limiter(input_model)
+        probe = RequestProbe(ticket.wait_time)
+        try:
+            yield probe
+        except Exception as e:
+            limiter.on_error(classify_retry(e))
+            raise
+        else:
+            limiter.on_success(probe.ttft)
+        finally:
+            self.release(ticket)
+
+    def queue_wait(self, input_model: str, lane: str) -> float:
+        """
+        读取模型所属供应商在指定通道上的平均排队时长（指数移动平均，秒）。
+
+        Args:
+            input_model (str): 模型名称。
+            lane (str): 优先级通道。
+
+        Returns:
+            float: 平均排队时长，尚无样本时为 0。
+        """
+        with self._lock:
+            state = self._suppliers.get(model_dict[input_model]["supplier"])
+            return state.wait_ewma[lane] if state else 0.0
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """
+        读取各供应商的派发状态。
+
+        Returns:
+            Dict[str, Dict[str, Any]]: 供应商 -> 包含 `capacity`、`running`、各通道排队数 `queued`、
+            平均排队时长 `wait` 与累计派发数 `dispatched` 的字典。
+        """
+        with self._lock:
+            return {
+                supplier: {
+                    "capacity": state.capacity,
+                    "running": state.running,
+                    "queued": {lane: sum(len(q) for q in sessions.values())
+                               for lane, sessions in state.lanes.items()},
+                    "wait": dict(state.wait_ewma),
+                    "dispatched": dict(state.dispatched),
+                }
+                for supplier, state in self._suppliers.items()
+            }
+
+
+_scheduler = Scheduler(ewma_alpha=scheduler_config["ewma_alpha"])
+
+
+def get_scheduler() -> Scheduler:
+    """获取进程级共享调度器。"""
+    return _scheduler
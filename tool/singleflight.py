@@ -0,0 +1,242 @@
+import asyncio
+import threading
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+from config.model_config import model_dict
+from config.runtime_config import coalesce_config
+from tool.metrics import get_metrics
+from tool.retry import remaining
+
+
+class UpstreamAborted(ConnectionError):
+    """驱动合并上游的订阅者被中断（如任务取消），上游流随之终止；按网络错误归类，可重试。"""
+
+
+class _Flight:
+    """一次在途的上游流：缓存已产出的全部增量，由等待新增量的订阅者轮流驱动上游生成器。"""
+
+    def __init__(self, upstream: Iterator[str], deadline: Optional[float]):
+        """
+        Args:
+            upstream (Iterator[str]): 上游流式生成器，首次驱动时才发起请求。
+            deadline (Optional[float]): 发起者的截止时间，上游请求按它限时。
+        """
+        self.upstream = upstream
+        self.deadline = deadline
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[Exception] = None
+        self.subscribers = 0
+        self._driving = False
+        self._cond = threading.Condition()
+
+    def covers(self, deadline: Optional[float]) -> bool:
+        """上游的截止时间不早于订阅者的截止时间时才可加入，合并不会使请求提前超时。"""
+        return self.deadline is None or (deadline is not None and deadline <= self.deadline)
+
+    def read(self, position: int, deadline: Optional[float]) -> Optional[List[str]]:
+        """
+        读取 `position` 之后的增量；尚无新增量时，若无人驱动上游则由当前订阅者驱动，否则等待。
+
+        Args:
+            position (int): 订阅者已读取的增量数。
+            deadline (Optional[float]): 订阅者自己的截止时间，等待期间超时抛出 `DeadlineExceeded`。
+
+        Returns:
+            Optional[List[str]]: 新增量；上游正常结束且已读完时为 None。
+
+        Raises:
+            Exception: 上游失败时，各订阅者读完已有增量后抛出同一异常。
+        """
+        while True:
+            with self._cond:
+                while self._driving and position >= len(self.chunks) and not self.done:
+                    self._cond.wait(remaining(deadline))
+                if position < len(self.chunks):
+                    return self.chunks[position:]
+                if self.done:
+                    if self.error is not None:
+                        raise self.error
+                    return None
+                self._driving = True
+            self._advance()
+
+    def _advance(self) -> None:
+        """在锁外驱动上游产出一个增量，结果登记后唤醒所有等待者。"""
+        chunk: Optional[str] = None
+        finished = False
+        error: Optional[Exception] = None
+        try:
+            chunk = next(self.upstream)
+        except StopIteration:
+            finished = True
+        except Exception as e:
+            finished, error = True, e
+        except BaseException:
+            # 驱动者被中断时上游生成器已随之终止，其余订阅者收到可重试的错误
+            finished, error = True, UpstreamAborted("合并的上游请求已中断")
+            raise
+        finally:
+            with self._cond:
+                self._driving = False
+                if chunk is not None:
+                    self.chunks.append(chunk)
+                if finished:
+                    self.done, self.error = True, error
+                self._cond.notify_all()
+
+
+class _AsyncFlight:
+    """`_Flight` 的异步版本，仅在异步引擎的事件循环中使用；每次有新增量或结束时替换事件以唤醒等待者。"""
+
+    def __init__(self, upstream: AsyncIterator[str], deadline: Optional[float]):
+        self.upstream = upstream
+        self.deadline = deadline
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[Exception] = None
+        self.subscribers = 0
+        self._driving = False
+        self._changed = asyncio.Event()
+
+    def covers(self, deadline: Optional[float]) -> bool:
+        """同 `_Flight.covers`。"""
+        return self.deadline is None or (deadline is not None and deadline <= self.deadline)
+
+    async def read(self, position: int, deadline: Optional[float]) -> Optional[List[str]]:
+        """同 `_Flight.read`。"""
+        while True:
+            while self._driving and position >= len(self.chunks) and not self.done:
+                try:
+                    await asyncio.wait_for(self._changed.wait(), remaining(deadline))
+                except asyncio.TimeoutError:
+                    pass
+            if position < len(self.chunks):
+                return self.chunks[position:]
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return None
+            self._driving = True
+            await self._advance()
+
+    async def _advance(self) -> None:
+        """同 `_Flight._advance`。"""
+        chunk: Optional[str] = None
+        finished = False
+        error: Optional[Exception] = None
+        try:
+            chunk = await self.upstream.__anext__()
+        except StopAsyncIteration:
+            finished = True
+        except Exception as e:
+            finished, error = True, e
+        except BaseException:
+            finished, error = True, UpstreamAborted("合并的上游请求已中断")
+            raise
+        finally:
+            self._driving = False
+            if chunk is not None:
+                self.chunks.append(chunk)
+            if finished:
+                self.done, self.error = True, error
+            self._changed.set()
+            self._changed = asyncio.Event()
+
+
+class SingleFlight:
+    """
+    在途请求合并：同一键的请求同时在途时只发起一次上游流，增量分发给全部订阅者。
+
+    后加入者先回放已缓存的前缀再跟随实时增量；上游失败时所有订阅者收到同一异常；
+    全部订阅者提前退出时关闭上游流，归还调度槽位与连接。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[str, _Flight] = {}
+        self._async_flights: Dict[str, _AsyncFlight] = {}
+
+    def _join(self, flights: Dict, key: str, deadline: Optional[float], create: Callable) -> tuple:
+        """加入在途请求或登记新的请求，返回 (请求, 是否为加入)。"""
+        with self._lock:
+            flight = flights.get(key)
+            joined = flight is not None and flight.covers(deadline)
+            if not joined:
+                # 已有的在途请求截止过早时另起一路，后续请求加入截止更晚的这一路
+                flight = create()
+                flights[key] = flight
+            flight.subscribers += 1
+        return flight, joined
+
+    def _leave(self, flights: Dict, key: str, flight) -> bool:
+        """退出订阅；请求已结束或已无订阅者时从登记表移除，返回是否需要关闭上游。"""
+        with self._lock:
+            flight.subscribers -= 1
+            if (flight.done or not flight.subscribers) and flights.get(key) is flight:
+                del flights[key]
+            return not flight.subscribers and not flight.done
+
+    def stream(
+            self,
+            key: str,
+            input_model: str,
+            deadline: Optional[float],
+            factory: Callable[[], Iterator[str]],
+    ) -> Iterator[str]:
+        """
+        订阅键为 `key` 的流式请求，无在途请求时以 `factory()` 发起。
+
+        Args:
+            key (str): 请求键，见 `tool.response_cache.make_cache_key`。
+            input_model (str): 模型名称，用于记录合并指标。
+            deadline (Optional[float]): 订阅者的截止时间。
+            factory (Callable[[], Iterator[str]]): 创建上游流式生成器。
+
+        Yields:
+            str: 上游的增量文本，后加入者从头回放。
+        """
+        flight, joined = self._join(self._flights, key, deadline, lambda: _Flight(factory(), deadline))
+        get_metrics().record_coalesce(input_model, model_dict[input_model]["supplier"], joined)
+        position = 0
+        try:
+            while True:
+                chunks = flight.read(position, deadline)
+                if chunks is None:
+                    return
+                position += len(chunks)
+                yield from chunks
+        finally:
+            if self._leave(self._flights, key, flight):
+                flight.upstream.close()
+
+    async def stream_async(
+            self,
+            key: str,
+            input_model: str,
+            deadline: Optional[float],
+            factory: Callable[[], AsyncIterator[str]],
+    ) -> AsyncIterator[str]:
+        """`stream` 的异步版本，异步请求之间合并，不与同步请求合并。"""
+        flight, joined = self._join(self._async_flights, key, deadline, lambda: _AsyncFlight(factory(), deadline))
+        get_metrics().record_coalesce(input_model, model_dict[input_model]["supplier"], joined)
+        position = 0
+        try:
+            while True:
+                chunks = await flight.read(position, deadline)
+                if chunks is None:
+                    return
+                position += len(chunks)
+                for chunk in chunks:
+                    yield chunk
+        finally:
+            if self._leave(self._async_flights, key, flight):
+                await flight.upstream.aclose()
+
+
+_singleflight: Optional[SingleFlight] = SingleFlight() if coalesce_config["enabled"] else None
+
+
+def get_singleflight() -> Optional[SingleFlight]:
+    """返回进程级的在途请求合并器，配置关闭时为 None。"""
+    return _singleflight
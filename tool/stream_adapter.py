@@ -0,0 +1,103 @@
+import time
+from typing import Iterable, Iterator, Optional
+
+from config.runtime_config import stream_config
+
+
+class StreamCoalescer:
+    """
+    流式增量合并器：以列表缓存增量，按时间间隔或字符数节拍统一刷新。
+
+    用于将逐 token 的高频输出降频为固定帧率的界面更新，结束时需调用 `flush()` 强制刷新。
+    """
+
+    def __init__(self, interval: Optional[float] = None, max_chars: Optional[int] = None):
+        """
+        Args:
+            interval (Optional[float]): 最小刷新间隔（秒），默认取 `stream_config["flush_interval"]`。
+            max_chars (Optional[int]): 待刷新字符数阈值，默认取 `stream_config["flush_chars"]`。
+        """
+        self.interval = stream_config["flush_interval"] if interval is None else interval
+        self.max_chars = stream_config["flush_chars"] if max_chars is None else max_chars
+        self._text = ""
+        self._pending: list[str] = []
+        self._pending_chars = 0
+        self._last_flush = time.monotonic()
+
+    @property
+    def text(self) -> str:
+        """最近一次刷新后的累积文本。"""
+        return self._text
+
+    @property
+    def pending(self) -> bool:
+        """是否存在尚未刷新的增量。"""
+        return bool(self._pending)
+
+    def due(self) -> bool:
+        """是否到达刷新节拍（存在待刷新内容且超过时间或字符阈值）。"""
+        if not self._pending:
+            return False
+        if self.max_chars and self._pending_chars >= self.max_chars:
+            return True
+        return time.monotonic() - self._last_flush >= self.interval
+
+    def time_until_due(self) -> Optional[float]:
+        """距离下一次刷新节拍的秒数：已到节拍时为 0，无待刷新内容时为 None。"""
+        if not self._pending:
+            return None
+        if self.max_chars and self._pending_chars >= self.max_chars:
+            return 0.0
+        return max(self.interval - (time.monotonic() - self._last_flush), 0.0)
+
+    def push(self, chunk: str) -> bool:
+        """
+        缓存一段增量文本。
+
+        Args:
+            chunk (str): 新增文本，空串将被忽略。
+
+        Returns:
+            bool: 是否已到达刷新节拍。
+        """
+        if chunk:
+            self._pending.append(chunk)
+            self._pending_chars += len(chunk)
+        return self.due()
+
+    def flush(self) -> str:
+        """
+        将缓存增量并入累积文本并重置节拍。
+
+        Returns:
+            str: 刷新后的累积文本。
+        """
+        if self._pending:
+            self._text += "".join(self._pending)
+            self._pending.clear()
+            self._pending_chars = 0
+        self._last_flush = time.monotonic()
+        return self._text
+
+
+def coalesce_stream(
+        chunks: Iterable[str],
+        interval: Optional[float] = None,
+        max_chars: Optional[int] = None,
+) -> Iterator[str]:
+    """
+    将增量流转换为按节拍刷新的累积文本流，流结束时强制刷新一次。
+
+    Args:
+        chunks (Iterable[str]): 增量文本流，如 `chat_llm_stream` 的返回值。
+        interval (Optional[float]): 最小刷新间隔（秒）。
+        max_chars (Optional[int]): 待刷新字符数阈值。
+
+    Yields:
+        str: 截至当前节拍的累积文本。
+    """
+    coalescer = StreamCoalescer(interval, max_chars)
+    for chunk in chunks:
+        if coalescer.push(chunk):
+            yield coalescer.flush()
+    yield coalescer.flush()
@@ -1,7 +1,15 @@
+import mmap
 import re
+from typing import Callable, IO, Iterator, Optional, Union
 
+# 反向句界查找：贪婪匹配回溯到窗口内最后一个句子结束符
+_LAST_SENTENCE_END = re.compile(r'.*[。？！.?!]', re.S)
 
-def text_split(text: str, max_length: int = 10240) -> list[str]:
+TextSource = Union[str, IO[str], IO[bytes], mmap.mmap]
+
+
+def text_split(text: str, max_length: int = 10240,
+               counter: Optional[Callable[[str], int]] = None) -> list[str]:
     """
     智能文本切分：依据自然段与句界进行长度约束的切分。
 
@@ -10,94 +18,147 @@ def text_split(text: str, max_length: int = 10240) -> list[str]:
 
     Args:
         text (str): 需要切分的原始文本。
-        max_length (int): 单段最大长度上限，默认 10240。
+        max_length (int): 单段最大长度上限，默认 10240；单位由 `counter` 决定。
+        counter (Optional[Callable[[str], int]]): 长度计量函数，默认按字符数；
+            传入 `tool.token_count.get_token_counter(model)` 即按 token 预算切分。
 
     Returns:
         list[str]: 切分后的文本块列表，按原始顺序排列。
     """
+    return list(iter_text_split(text, max_length, counter))
+
+
+def iter_text_split(source: TextSource, max_length: int = 10240,
+                    counter: Optional[Callable[[str], int]] = None,
+                    encoding: str = "utf-8") -> Iterator[str]:
+    """
+    流式文本切分：规则同 `text_split`，逐块惰性产出，时间复杂度与输入长度呈线性。
+
+    支持字符串、文本/二进制文件对象与 mmap，文件输入按行读取，无需整体载入内存；
+    调用方可在切分尚未结束时即开始处理已产出的块。
+
+    Args:
+        source (TextSource): 原始文本、文件对象或 mmap。
+        max_length (int): 单段最大长度上限；单位由 `counter` 决定。
+        counter (Optional[Callable[[str], int]]): 长度计量函数，默认按字符数。
+        encoding (str): 二进制输入的解码方式。
+
+    Yields:
+        str: 切分后的文本块，按原始顺序产出。
+    """
+    count = counter or len
 
     # 预留 10% 安全缓冲，避免超长边界导致模型截断
     max_length = max_length * 0.9
+    separator_length = count('\n')
 
-    # 按换行符分割成段落
-    paragraphs = text.split('\n')
-    chunks = []
-    current_chunk = ""
+    # 当前块以段落列表保存，产出时一次性拼接；长度按段累加
+    current_parts: list[str] = []
+    current_length = 0
 
-    for paragraph in paragraphs:
+    for paragraph in _iter_paragraphs(source, encoding):
         if not paragraph.strip():
             continue
 
+        paragraph_length = count(paragraph)
+
         # 尝试将当前段落合并到当前块
-        potential_chunk = current_chunk + ('\n' if current_chunk else '') + paragraph
+        potential_length = current_length + (separator_length if current_parts else 0) + paragraph_length
 
-        if len(potential_chunk) <= max_length:
+        if potential_length <= max_length:
             # 合并后不超过长度限制，直接合并
-            current_chunk = potential_chunk
-        else:
-            # 合并后超过长度限制，需要处理
-            if current_chunk:
-                chunks.append(current_chunk)
+            current_parts.append(paragraph)
+            current_length = potential_length
+            continue
 
-            if len(paragraph) <= max_length:
-                # 段落长度符合要求
-                current_chunk = paragraph
-            else:
-                # 段落过长，需要进一步切分
-                sub_chunks = _split_long_paragraph(paragraph, max_length)
+        # 合并后超过长度限制，先产出当前块
+        if current_parts:
+            yield '\n'.join(current_parts)
+            current_parts = []
+            current_length = 0
 
-                # 将除最后一个子块外的所有子块加入结果
-                if len(sub_chunks) > 1:
-                    chunks.extend(sub_chunks[:-1])
+        if paragraph_length <= max_length:
+            # 段落长度符合要求
+            current_parts.append(paragraph)
+            current_length = paragraph_length
+            continue
 
-                # 将最后一个子块作为新的current_chunk，等待与下一段落合并
-                current_chunk = sub_chunks[-1] if sub_chunks else ""
+        # 段落过长，需要进一步切分；按该段的字符/长度比例换算为字符窗口
+        char_window = max(int(max_length * len(paragraph) / paragraph_length), 1)
+        tail = ""
+        for sub_chunk in _iter_long_paragraph(paragraph, char_window):
+            if tail:
+                yield tail
+            tail = sub_chunk
 
-    if current_chunk:
-        chunks.append(current_chunk)
+        # 最后一个子块作为新的当前块，等待与下一段落合并
+        if tail:
+            current_parts.append(tail)
+            current_length = count(tail)
 
-    return chunks
+    if current_parts:
+        yield '\n'.join(current_parts)
 
 
-def _split_long_paragraph(paragraph: str, max_length: int) -> list[str]:
+def _iter_paragraphs(source: TextSource, encoding: str) -> Iterator[str]:
     """
-    切分过长段落：在最大长度内优先以内/外句界进行分割，否则按长度截断。
+    逐段读取输入：字符串按 `\n` 偏移定位，文件对象与 mmap 按行读取。
 
     Args:
-        paragraph (str): 单个段落文本。
-        max_length (int): 单段最大长度上限。
+        source (TextSource): 原始文本、文件对象或 mmap。
+        encoding (str): 二进制输入的解码方式。
 
-    Returns:
-        list[str]: 该段落切分得到的子块列表。
+    Yields:
+        str: 去除换行符的单个段落。
     """
+    if isinstance(source, str):
+        start = 0
+        length = len(source)
+        while start <= length:
+            end = source.find('\n', start)
+            if end == -1:
+                end = length
+            yield source[start:end]
+            start = end + 1
+        return
+
+    if isinstance(source, mmap.mmap):
+        lines = iter(source.readline, b"")
+    else:
+        lines = iter(source)
+
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode(encoding, errors="replace")
+        yield line.rstrip('\r\n')
+
+
+def _iter_long_paragraph(paragraph: str, max_length: int) -> Iterator[str]:
+    """
+    切分过长段落：在最大长度内优先以句界进行分割，否则按长度截断。
 
-    chunks = []
-    remaining = paragraph
-
-    while len(remaining) > max_length:
-        search_text = remaining[:max_length]
+    以偏移量推进窗口，不复制剩余文本；每个窗口仅做一次反向句界查找。
 
-        sentence_pattern = r'[。？！.?!]'
-        matches = list(re.finditer(sentence_pattern, search_text))
+    Args:
+        paragraph (str): 单个段落文本。
+        max_length (int): 单段最大长度上限（字符数）。
 
-        # 默认按最大长度切分，若存在句界则优先用句界位置
-        split_pos = 0
-        if matches:
-            last_match = matches[-1]
-            split_pos_candidate = last_match.end()
-            if split_pos_candidate <= max_length:
-                split_pos = split_pos_candidate
+    Yields:
+        str: 该段落切分得到的子块。
+    """
+    start = 0
+    length = len(paragraph)
 
-        # 确保至少切分一个字符，防止无限循环
-        if split_pos == 0:
-            split_pos = max_length
+    while length - start > max_length:
+        window_end = start + max_length
 
-        chunk = remaining[:split_pos]
-        remaining = remaining[split_pos:]
+        # 默认按最大长度切分，若存在句界则优先用最后一个句界位置
+        match = _LAST_SENTENCE_END.match(paragraph, start, window_end)
+        split_pos = match.end() if match else window_end
 
-        chunks.append(chunk)
+        yield paragraph[start:split_pos]
+        start = split_pos
 
-    if remaining:
-        chunks.append(remaining)
+    if start < length:
+        yield paragraph[start:]
 
-    return chunks
@@ -0,0 +1,140 @@
+import re
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional
+
+from config.model_config import model_dict
+
+# CJK 统一表意文字、扩展 A、兼容表意文字、中日韩符号与全角字符
+_CJK_PATTERN = re.compile(r'[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef]')
+
+# 默认估算比例：每个 CJK 字符 / 其他字符折合的 token 数
+DEFAULT_CJK_RATIO = 0.7
+DEFAULT_OTHER_RATIO = 0.3
+
+# 每条消息的对话模板开销（角色标记、分隔符等）
+MESSAGE_OVERHEAD_TOKENS = 8
+
+TokenCounter = Callable[[str], int]
+
+
+def estimate_tokens(text: str, cjk_ratio: float = DEFAULT_CJK_RATIO,
+                    other_ratio: float = DEFAULT_OTHER_RATIO) -> int:
+    """
+    快速估算文本 token 数：区分 CJK 字符与其他字符分别折算，无需任何分词器。
+
+    Args:
+        text (str): 待估算文本。
+        cjk_ratio (float): 每个 CJK 字符折合的 token 数。
+        other_ratio (float): 每个非 CJK 字符折合的 token 数。
+
+    Returns:
+        int: 估算的 token 数（向上取整）。
+    """
+    if not text:
+        return 0
+    other = len(_CJK_PATTERN.sub('', text))
+    cjk = len(text) - other
+    return int(cjk * cjk_ratio + other * other_ratio) + 1
+
+
+def _build_estimator(config: Dict[str, Any]) -> TokenCounter:
+    """按配置中的比例构造估算器。"""
+    cjk_ratio = float(config.get("cjk_ratio", DEFAULT_CJK_RATIO))
+    other_ratio = float(config.get("other_ratio", DEFAULT_OTHER_RATIO))
+    return lambda text: estimate_tokens(text, cjk_ratio, other_ratio)
+
+
+def _build_tiktoken(config: Dict[str, Any]) -> TokenCounter:
+    """基于 tiktoken 的精确计数器；编码文件需预先缓存于本地（TIKTOKEN_CACHE_DIR）。"""
+    import tiktoken
+
+    encoding = tiktoken.get_encoding(config.get("encoding", "cl100k_base"))
+    return lambda text: len(encoding.encode(text, disallowed_special=())) if text else 0
+
+
+def _build_huggingface(config: Dict[str, Any]) -> TokenCounter:
+    """基于本地 tokenizer.json 的精确计数器（`tokenizers` 库，完全离线）。"""
+    from tokenizers import Tokenizer
+
+    tokenizer = Tokenizer.from_file(config["path"])
+    return lambda text: len(tokenizer.encode(text, add_special_tokens=False).ids) if text else 0
+
+
+# 计数器类型注册表：可通过 `register_token_counter` 扩展
+_counter_factories: Dict[str, Callable[[Dict[str, Any]], TokenCounter]] = {
+    "estimate": _build_estimator,
+    "tiktoken": _build_tiktoken,
+    "huggingface": _build_huggingface,
+}
+
+
+def register_token_counter(kind: str, factory: Callable[[Dict[str, Any]], TokenCounter]) -> None:
+    """
+    注册自定义计数器类型，供 `model_dict[...]["tokenizer"]["type"]` 引用。
+
+    Args:
+        kind (str): 计数器类型名称。
+        factory (Callable[[Dict[str, Any]], TokenCounter]): 接收 tokenizer 配置并返回计数函数的工厂。
+    """
+    _counter_factories[kind] = factory
+    get_token_counter.cache_clear()
+
+
+@lru_cache(maxsize=None)
+def get_token_counter(input_model: Optional[str] = None) -> TokenCounter:
+    """
+    获取模型对应的 token 计数函数（按模型缓存）。
+
+    依据 `model_dict[input_model]["tokenizer"]` 构造，缺省或构造失败（如未安装可选依赖）时
+    回退为 CJK 感知估算器。
+
+    Args:
+        input_model (Optional[str]): 模型名称；为空时返回默认估算器。
+
+    Returns:
+        TokenCounter: 输入文本、返回 token 数的函数。
+    """
+    config = (model_dict.get(input_model, {}) if input_model else {}).get("tokenizer") or {}
+    kind = config.get("type", "estimate")
+    try:
+        return _counter_factories[kind](config)
+    except Exception as e:
+        print(f"分词器 {kind} 不可用，回退为估算: {e}")
+        return _build_estimator(config)
+
+
+def count_tokens(text: str, input_model: Optional[str] = None) -> int:
+    """
+    计算文本在指定模型下的 token 数。
+
+    Args:
+        text (str): 待计数文本。
+        input_model (Optional[str]): 模型名称。
+
+    Returns:
+        int: token 数。
+    """
+    return get_token_counter(input_model)(text)
+
+
+def chunk_token_budget(input_model: str, prompt: Optional[str] = None) -> int:
+    """
+    计算长任务单个切分块可用的输入 token 预算。
+
+    上下文窗口需同时容纳系统提示词、输入块与预留的输出 `max_tokens`；此外改写类任务的
+    输出长度与输入相当，故单块输入同样不超过 `max_tokens`，以免输出被截断。
+
+    Args:
+        input_model (str): 模型名称，需存在于 `model_dict` 中。
+        prompt (Optional[str]): 系统提示词。
+
+    Returns:
+        int: 单块输入 token 上限，至少为 1。
+    """
+    config = model_dict[input_model]
+    max_tokens = int(config["max_tokens"])
+    context_window = int(config.get("context_window", max_tokens * 2))
+    prompt_tokens = count_tokens(prompt or "", input_model) + 2 * MESSAGE_OVERHEAD_TOKENS
+
+    budget = min(max_tokens, context_window - prompt_tokens - max_tokens)
+    return max(budget, 1)